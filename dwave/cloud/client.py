@@ -37,14 +37,19 @@ import collections
 from itertools import chain
 from operator import attrgetter
 
+import six
 from dateutil.parser import parse as parse_datetime
 from six.moves import queue, range
 
 from dwave.cloud.package_info import __packagename__, __version__
 from dwave.cloud.exceptions import *
-from dwave.cloud.config import load_config, legacy_load_config, parse_float
+from dwave.cloud.config import load_config, legacy_load_config, parse_float, parse_boolean
+from dwave.cloud.coders import (
+    load_qp_stream, get_json_codec, EncodingCache, ProcessPoolDecoder)
 from dwave.cloud.solver import Solver
-from dwave.cloud.utils import datetime_to_timestamp, utcnow, TimeoutingHTTPAdapter
+from dwave.cloud.store import ResultStore, SolverCache
+from dwave.cloud.utils import (
+    datetime_to_timestamp, utcnow, TimeoutingHTTPAdapter, gzip_compress)
 
 __all__ = ['Client']
 
@@ -75,6 +80,65 @@ class Client(object):
         permissive_ssl (bool, default=False):
             Disables SSL verification.
 
+        stream_results (bool, default=False):
+            Download problem results as a stream, decoding large answer fields
+            incrementally, which keeps peak memory use close to the size of the
+            decoded results.
+
+        json_codec (str, default=None):
+            JSON library used for request and response bodies, 'orjson', 'ujson'
+            or 'json'. By default, the fastest library installed is used.
+
+        encoding_cache_size (int, default=0):
+            Number of encoded problems cached for resubmission of identical
+            problems (see :class:`~dwave.cloud.coders.EncodingCache`). By
+            default, problems are not cached.
+
+        eager_decode (bool, default=False):
+            Decode problem results as soon as they are received, in the client's
+            decode workers, before the :class:`~dwave.cloud.computation.Future` is
+            resolved. By default, results are decoded on first access, in the
+            accessing thread.
+
+        decode_processes (int, default=0):
+            Number of worker processes used for decoding large results (see
+            :class:`~dwave.cloud.coders.ProcessPoolDecoder`). Use 0 to decode
+            all results in-process. Requires NumPy. Decoded arrays are pickled
+            back from the worker processes (not shared through shared memory).
+            Worker processes import the main module, so scripts must create the
+            client under an ``if __name__ == '__main__':`` guard.
+
+        decode_process_threshold (int, default=4194304):
+            Minimal size (in bytes) of encoded results decoded in worker processes.
+
+        result_store (str/:class:`~dwave.cloud.store.ResultStore`, default=None):
+            Directory (or store) decoded result arrays are written to, and
+            memory-mapped from, keeping resident memory independent of the
+            number of results held. Only results decoded into NumPy arrays
+            (`return_matrix` solvers) are stored, and small arrays (see
+            `min_size` of the store) are kept in memory. Requires NumPy.
+
+        compress_submissions (bool, default=False):
+            Send problem submission bodies gzip-compressed (with
+            ``Content-Encoding: gzip``), if larger than
+            `compress_submissions_threshold`.
+
+        compress_submissions_threshold (int, default=65536):
+            Minimal size (in bytes) of submission bodies compressed.
+
+        solver_cache (bool, default=False):
+            Cache solver definitions on disk (see
+            :class:`~dwave.cloud.store.SolverCache`), so that new clients use
+            them without waiting on the API. Stale definitions are revalidated
+            with a conditional request.
+
+        solver_cache_dir (str, default=None):
+            Directory of the solver cache. By default, the user's cache directory.
+
+        solver_cache_ttl (float, default=3600):
+            Time (in seconds) cached solver definitions are used without
+            revalidation.
+
     Other Parameters:
         Unrecognized keys (str):
             All unrecognized keys are passed through to the appropriate client class constructor
@@ -119,6 +183,7 @@ class Client(object):
     _CANCEL_THREAD_COUNT = 1
     _POLL_THREAD_COUNT = 2
     _LOAD_THREAD_COUNT = 5
+    _DECODE_THREAD_COUNT = 2
 
     # Poll back-off interval [sec]
     _POLL_BACKOFF_MIN = 1
@@ -127,6 +192,9 @@ class Client(object):
     # Poll grouping time frame; two scheduled polls are grouped if closer than [sec]:
     _POLL_GROUP_TIMEFRAME = 2
 
+    # Size of chunks read from streamed result downloads [bytes]
+    _STREAM_CHUNK_SIZE = 2**16
+
     @classmethod
     def from_config(cls, config_file=None, profile=None, client=None,
                     endpoint=None, token=None, solver=None, proxy=None,
@@ -383,7 +451,12 @@ class Client(object):
         return _clients[_client](**config)
 
     def __init__(self, endpoint=None, token=None, solver=None, proxy=None,
-                 permissive_ssl=False, request_timeout=60, polling_timeout=None, **kwargs):
+                 permissive_ssl=False, request_timeout=60, polling_timeout=None,
+                 stream_results=False, json_codec=None, encoding_cache_size=0,
+                 eager_decode=False, decode_processes=0, decode_process_threshold=2**22,
+                 result_store=None, compress_submissions=False,
+                 compress_submissions_threshold=2**16, solver_cache=False,
+                 solver_cache_dir=None, solver_cache_ttl=3600, **kwargs):
         """To setup the connection a pipeline of queues/workers is constructed.
 
         There are five interactions with the server the connection manages:
@@ -395,7 +468,8 @@ class Client(object):
 
         Loading solver information is done synchronously. The other four tasks
         are performed by asynchronously workers. For 2, 3, and 5 the workers
-        gather tasks in batches.
+        gather tasks in batches. With `eager_decode`, downloaded results are
+        also decoded asynchronously, by a separate set of workers.
         """
         if not endpoint or not token:
             raise ValueError("Endpoint URL and/or token not defined")
@@ -407,6 +481,35 @@ class Client(object):
         self.default_solver = solver
         self.request_timeout = parse_float(request_timeout)
         self.polling_timeout = parse_float(polling_timeout)
+        self.stream_results = bool(parse_boolean(stream_results))
+        self.json_codec = get_json_codec(json_codec or None)
+        self.encoding_cache = EncodingCache(maxsize=int(encoding_cache_size or 0))
+        self.eager_decode = bool(parse_boolean(eager_decode))
+        self.compress_submissions = bool(parse_boolean(compress_submissions))
+        self.compress_submissions_threshold = int(compress_submissions_threshold)
+        self.process_decoder = None
+        if int(decode_processes or 0) > 0:
+            self.process_decoder = ProcessPoolDecoder(
+                max_workers=int(decode_processes),
+                threshold=int(decode_process_threshold))
+
+        # Stores created from a directory are owned (and closed) by the client
+        self._own_result_store = isinstance(result_store, six.string_types)
+        if self._own_result_store:
+            result_store = ResultStore(directory=result_store)
+        self.result_store = result_store
+
+        self.solver_cache = None
+        if parse_boolean(solver_cache):
+            # empty ttl (e.g. in a config file) uses the default of the cache
+            options = dict(directory=solver_cache_dir or None)
+            ttl = parse_float(solver_cache_ttl)
+            if ttl is not None:
+                options.update(ttl=ttl)
+            try:
+                self.solver_cache = SolverCache(**options)
+            except (IOError, OSError) as e:
+                _LOGGER.warning("Solver cache disabled, failed to create: %r", e)
 
         # Create a :mod:`requests` session. `requests` will manage our url parsing, https, etc.
         self.session = requests.Session()
@@ -454,6 +557,15 @@ class Client(object):
             worker.start()
             self._load_workers.append(worker)
 
+        # Build the result decoding queue, start its workers
+        self._decode_queue = queue.Queue()
+        self._decode_workers = []
+        for _ in range(self._DECODE_THREAD_COUNT if self.eager_decode else 0):
+            worker = threading.Thread(target=self._do_decode_results)
+            worker.daemon = True
+            worker.start()
+            self._decode_workers.append(worker)
+
         # Prepare an empty set of solvers
         self._solvers = {}
         self._solvers_lock = threading.RLock()
@@ -494,6 +606,8 @@ class Client(object):
         self._poll_queue.join()
         _LOGGER.debug("Joining load queue")
         self._load_queue.join()
+        _LOGGER.debug("Joining decode queue")
+        self._decode_queue.join()
 
         # Send kill-task to all worker threads
         # Note: threads can't be 'killed' in Python, they have to die by
@@ -506,12 +620,23 @@ class Client(object):
             self._poll_queue.put((-1, None))
         for _ in self._load_workers:
             self._load_queue.put(None)
+        for _ in self._decode_workers:
+            self._decode_queue.put(None)
 
         # Wait for threads to die
         for worker in chain(self._submission_workers, self._cancel_workers,
-                            self._poll_workers, self._load_workers):
+                            self._poll_workers, self._load_workers,
+                            self._decode_workers):
             worker.join()
 
+        # Stop the decoding processes
+        if self.process_decoder is not None:
+            self.process_decoder.shutdown()
+
+        # Release the result store
+        if self._own_result_store:
+            self.result_store.close()
+
         # Close the requests session
         self.session.close()
 
@@ -583,20 +708,7 @@ class Client(object):
             if self._all_solvers_ready and not refresh:
                 return self._solvers
 
-            _LOGGER.debug("Requesting list of all solver data.")
-            try:
-                response = self.session.get(posixpath.join(self.endpoint, 'solvers/remote/'))
-            except requests.exceptions.Timeout:
-                raise RequestTimeout
-
-            if response.status_code == 401:
-                raise SolverAuthenticationError
-            response.raise_for_status()
-
-            _LOGGER.debug("Received list of all solver data.")
-            data = response.json()
-
-            for solver_desc in data:
+            for solver_desc in self._load_solvers_data(refresh=refresh):
                 try:
                     solver = Solver(self, solver_desc)
                     if self.is_solver_handled(solver):
@@ -611,6 +723,59 @@ class Client(object):
             self._all_solvers_ready = True
             return self._solvers
 
+    def _load_solvers_data(self, refresh=False):
+        """Fetch descriptions of all solvers, or load them from the solver
+        cache, if enabled and fresh (and not `refresh`). Stale entries are
+        revalidated with ``If-None-Match``/``If-Modified-Since``."""
+
+        entry = None
+        if self.solver_cache is not None:
+            entry = self.solver_cache.load(self.endpoint, self.token)
+            if entry is not None and not refresh and self.solver_cache.is_fresh(entry):
+                _LOGGER.debug("Using cached list of all solver data.")
+                return entry['data']
+
+        headers = {}
+        if entry is not None:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        _LOGGER.debug("Requesting list of all solver data.")
+        try:
+            response = self.session.get(
+                posixpath.join(self.endpoint, 'solvers/remote/'), headers=headers)
+        except requests.exceptions.Timeout:
+            raise RequestTimeout
+
+        if response.status_code == 401:
+            raise SolverAuthenticationError
+
+        if response.status_code == 304 and entry is not None:
+            _LOGGER.debug("Cached list of all solver data not modified.")
+            self._cache_solvers_data(entry['data'], entry['etag'], entry['last_modified'])
+            return entry['data']
+
+        response.raise_for_status()
+
+        _LOGGER.debug("Received list of all solver data.")
+        data = self.json_codec.loads(response.content)
+
+        if self.solver_cache is not None:
+            self._cache_solvers_data(data, response.headers.get('ETag'),
+                                     response.headers.get('Last-Modified'))
+        return data
+
+    def _cache_solvers_data(self, data, etag, last_modified):
+        """Save solver descriptions to the solver cache. Failures to write the
+        cache are logged, not raised, as solver data is available regardless."""
+        try:
+            self.solver_cache.save(self.endpoint, self.token, data,
+                                   etag=etag, last_modified=last_modified)
+        except Exception as e:
+            _LOGGER.warning("Failed to cache solver data: %r", e)
+
     def solvers(self, qpu=None, software=None, vfyc=None,
                 flux_biases=None, num_qubits=None, refresh=False):
         """Returns a filtered list of solvers handled by this client.
@@ -736,6 +901,9 @@ class Client(object):
                     raise SolverError("No solvers available this client can handle")
 
         with self._solvers_lock:
+            if not refresh and name not in self._solvers:
+                self._load_cached_solver(name)
+
             if refresh or name not in self._solvers:
                 try:
                     response = self.session.get(
@@ -751,7 +919,7 @@ class Client(object):
 
                 response.raise_for_status()
 
-                solver = Solver(self, data=response.json())
+                solver = Solver(self, data=self.json_codec.loads(response.content))
                 if solver.id != name:
                     raise InvalidAPIResponseError(
                         "Asked for solver named {!r}, got {!r}".format(name, solver.id))
@@ -759,6 +927,21 @@ class Client(object):
 
             return self._solvers[name]
 
+    def _load_cached_solver(self, name):
+        """Add solver `name` from the solver cache, if enabled and fresh."""
+        if self.solver_cache is None:
+            return
+
+        entry = self.solver_cache.load(self.endpoint, self.token)
+        if entry is None or not self.solver_cache.is_fresh(entry):
+            return
+
+        for solver_desc in entry['data']:
+            if solver_desc.get('id') == name:
+                _LOGGER.debug("Using cached solver data: %s", name)
+                self._solvers[name] = Solver(self, solver_desc)
+                return
+
     def _submit(self, body, future):
         """Enqueue a problem for submission to the server.
 
@@ -767,6 +950,19 @@ class Client(object):
         self._submission_queue.put(self._submit.Message(body, future))
     _submit.Message = collections.namedtuple('Message', ['body', 'future'])
 
+    def _submit_many(self, messages):
+        """Enqueue many problems for submission to the server, as lists of
+        (up to :attr:`_SUBMIT_BATCH_SIZE`) messages each submitted in a single
+        request.
+
+        This method is thread safe.
+
+        Args:
+            messages (list[:attr:`_submit.Message`]): Problems to submit.
+        """
+        for start in range(0, len(messages), self._SUBMIT_BATCH_SIZE):
+            self._submission_queue.put(messages[start:start + self._SUBMIT_BATCH_SIZE])
+
     def _do_submit_problems(self):
         """Pull problems from the submission queue and submit them.
 
@@ -774,29 +970,53 @@ class Client(object):
             This method is always run inside of a daemon thread.
         """
         try:
+            # Queue item pulled, but left for the next batch (may be `None`)
+            nothing = object()
+            pending = nothing
+
             while True:
                 # Pull as many problems as we can, block on the first one,
                 # but once we have one problem, switch to non-blocking then
                 # submit without blocking again.
+                # Items are single problems, or lists of problems (batches
+                # enqueued by `_submit_many`), never split between requests.
+
+                if pending is not nothing:
+                    item, pending = pending, nothing
+                else:
+                    item = self._submission_queue.get()
 
                 # `None` task is used to signal thread termination
-                item = self._submission_queue.get()
                 if item is None:
                     break
 
-                ready_problems = [item]
+                ready_problems = list(item) if isinstance(item, list) else [item]
+                num_items = 1
                 while len(ready_problems) < self._SUBMIT_BATCH_SIZE:
                     try:
-                        ready_problems.append(self._submission_queue.get_nowait())
+                        item = self._submission_queue.get_nowait()
                     except queue.Empty:
                         break
+                    problems = item if isinstance(item, list) else [item]
+                    if item is None or len(ready_problems) + len(problems) > self._SUBMIT_BATCH_SIZE:
+                        # keep it for the next batch
+                        pending = item
+                        break
+                    ready_problems.extend(problems)
+                    num_items += 1
 
                 # Submit the problems
                 _LOGGER.debug("Submitting %d problems", len(ready_problems))
-                body = '[' + ','.join(mess.body for mess in ready_problems) + ']'
+                body = b'[' + b','.join(mess.body for mess in ready_problems) + b']'
+                options = {}
+                if self.compress_submissions and len(body) >= self.compress_submissions_threshold:
+                    _LOGGER.trace("Compressing submission body of %d bytes", len(body))
+                    body = gzip_compress(body)
+                    options['headers'] = {'Content-Encoding': 'gzip'}
                 try:
                     try:
-                        response = self.session.post(posixpath.join(self.endpoint, 'problems/'), body)
+                        response = self.session.post(
+                            posixpath.join(self.endpoint, 'problems/'), body, **options)
                     except requests.exceptions.Timeout:
                         raise RequestTimeout
 
@@ -804,7 +1024,7 @@ class Client(object):
                         raise SolverAuthenticationError()
                     response.raise_for_status()
 
-                    message = response.json()
+                    message = self.json_codec.loads(response.content)
                     _LOGGER.debug("Finished submitting %d problems", len(ready_problems))
                 except BaseException as exception:
                     _LOGGER.debug("Submit failed for %d problems", len(ready_problems))
@@ -813,12 +1033,14 @@ class Client(object):
 
                     for mess in ready_problems:
                         mess.future._set_error(exception, sys.exc_info())
+                    for _ in range(num_items):
                         self._submission_queue.task_done()
                     continue
 
                 # Pass on the information
                 for submission, res in zip(ready_problems, message):
                     self._handle_problem_status(res, submission.future)
+                for _ in range(num_items):
                     self._submission_queue.task_done()
 
                 # this is equivalent to a yield to scheduler in other threading libraries
@@ -878,9 +1100,13 @@ class Client(object):
                 # Loading should happen only once, not every time when response
                 # doesn't contain 'answer'.
 
-                # If the message is complete, forward it to the future object
+                # If the message is complete, forward it to the future object,
+                # decoding it first if requested
                 if 'answer' in message:
-                    future._set_message(message)
+                    if self.eager_decode:
+                        self._decode(message, future)
+                    else:
+                        future._set_message(message)
                 # If the problem is complete, but we don't have the result data
                 # put the problem in the queue for loading results.
                 else:
@@ -1071,7 +1297,7 @@ class Client(object):
                         raise SolverAuthenticationError()
                     response.raise_for_status()
 
-                    statuses = response.json()
+                    statuses = self.json_codec.loads(response.content)
                     for status in statuses:
                         self._handle_problem_status(status, frame_futures[status['id']])
 
@@ -1121,20 +1347,35 @@ class Client(object):
                 query_string = 'problems/{}/'.format(future.id)
                 try:
                     try:
-                        response = self.session.get(posixpath.join(self.endpoint, query_string))
+                        if self.stream_results:
+                            response = self.session.get(
+                                posixpath.join(self.endpoint, query_string), stream=True)
+                        else:
+                            response = self.session.get(posixpath.join(self.endpoint, query_string))
                     except requests.exceptions.Timeout:
                         raise RequestTimeout
 
-                    if response.status_code == 401:
-                        raise SolverAuthenticationError()
-                    response.raise_for_status()
-
-                    message = response.json()
+                    try:
+                        if response.status_code == 401:
+                            raise SolverAuthenticationError()
+                        response.raise_for_status()
+
+                        if self.stream_results:
+                            message = load_qp_stream(
+                                response.iter_content(chunk_size=self._STREAM_CHUNK_SIZE),
+                                loads=self.json_codec.loads)
+                        else:
+                            message = self.json_codec.loads(response.content)
+                    finally:
+                        # release the connection of a streamed response, on errors too
+                        if self.stream_results:
+                            response.close()
                 except BaseException as exception:
                     if not isinstance(exception, SolverAuthenticationError):
                         exception = IOError(exception)
 
                     future._set_error(IOError(exception), sys.exc_info())
+                    self._load_queue.task_done()
                     continue
 
                 # Dispatch the results, mark the task complete
@@ -1146,3 +1387,38 @@ class Client(object):
 
         except Exception as err:
             _LOGGER.error('Load result error: ' + str(err))
+
+    def _decode(self, message, future):
+        """Enqueue a problem result message for decoding.
+
+        Args:
+            message (dict): Result message from the SAPI server.
+            future: `Future` object corresponding to the query
+
+        This method is threadsafe.
+        """
+        self._decode_queue.put((message, future))
+
+    def _do_decode_results(self):
+        """Decode problem results, and complete their futures.
+
+        Note:
+            This method is always run inside of a daemon thread.
+        """
+        try:
+            while True:
+                item = self._decode_queue.get()
+                # `None` task signifies thread termination
+                if item is None:
+                    break
+
+                message, future = item
+                _LOGGER.debug("Decoding results of: %s", future.id)
+                future._set_decoded_message(message)
+                self._decode_queue.task_done()
+
+                # this is equivalent to a yield to scheduler in other threading libraries
+                time.sleep(0)
+
+        except Exception as err:
+            _LOGGER.exception(err)
@@ -1,12 +1,121 @@
 from __future__ import division, absolute_import
 
+import re
+import sys
+import json
 import struct
 import base64
+import numbers
+import binascii
+import operator
+import threading
+from itertools import chain, repeat
+from collections import namedtuple, OrderedDict
+
+import six
+from six.moves import map, range
 
 from dwave.cloud.utils import (
     uniform_iterator, uniform_get, strip_tail, active_qubits)
 
-__all__ = ['encode_bqm_as_qp', 'decode_qp', 'decode_qp_numpy']
+# Use numpy if available for fast encoding
+try:
+    import numpy as np
+    _numpy = True
+except ImportError:  # pragma: no cover
+    # If numpy isn't available we can do the encoding slower in native python
+    _numpy = False
+
+__all__ = ['encode_bqm_as_qp', 'encode_arrays_as_qp', 'decode_qp', 'decode_qp_numpy',
+           'expand_samples', 'load_qp_stream', 'PackedSamples', 'JSONCodec',
+           'get_json_codec', 'JSON_CODECS', 'EncodingCache', 'ProcessPoolDecoder']
+
+# Lookup tables used by decode_qp, mapping a byte to the tuple of its bits
+# (most significant bit first), and to the tuple of corresponding spins
+_BYTE_BITS = tuple(tuple((byte >> shift) & 1 for shift in range(7, -1, -1))
+                   for byte in range(256))
+_BYTE_SPINS = tuple(tuple(2 * bit - 1 for bit in bits) for bits in _BYTE_BITS)
+
+# Supported layouts of decoded solutions (see decode_qp_numpy)
+SAMPLES_LAYOUTS = ('full', 'active', 'packed')
+
+# Base64 encoded fields of a `qp` answer
+_QP_FIELDS = ('energies', 'num_occurrences', 'active_variables', 'solutions')
+
+# Approximate number of unpacked bits (bytes) decoded at once by decode_qp_numpy
+# when scattering active variables into the full solutions matrix
+_DECODE_CHUNK_SIZE = 2**20
+
+# JSON libraries supported for (de)serializing messages, fastest first
+JSON_CODECS = ('orjson', 'ujson', 'json')
+
+
+#: JSON codec: `dumps` serializes an object to utf-8 encoded bytes, `loads`
+#: deserializes bytes (or a string).
+JSONCodec = namedtuple('JSONCodec', ['name', 'dumps', 'loads'])
+
+
+def _json_dumps(obj):
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+def _json_loads(data):
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode('utf-8')
+    return json.loads(data)
+
+
+def _orjson_codec():
+    import orjson
+
+    def dumps(obj):
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            # e.g. non-string keys, or subclasses of builtin types
+            return _json_dumps(obj)
+
+    return JSONCodec('orjson', dumps, orjson.loads)
+
+
+def _ujson_codec():
+    import ujson
+
+    def dumps(obj):
+        return ujson.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+    return JSONCodec('ujson', dumps, ujson.loads)
+
+
+_JSON_CODEC_FACTORIES = {
+    'orjson': _orjson_codec,
+    'ujson': _ujson_codec,
+    'json': lambda: JSONCodec('json', _json_dumps, _json_loads),
+}
+
+
+def get_json_codec(name=None):
+    """Get a JSON codec.
+
+    Args:
+        name (str, optional):
+            Name of the JSON library to use, one of :data:`JSON_CODECS`. By
+            default, the fastest library installed is used, falling back to
+            the standard library's :mod:`json`.
+
+    Returns:
+        :class:`JSONCodec`
+    """
+    if name is not None:
+        if name not in _JSON_CODEC_FACTORIES:
+            raise ValueError("Unknown JSON codec: {!r}".format(name))
+        return _JSON_CODEC_FACTORIES[name]()
+
+    for name in JSON_CODECS:
+        try:
+            return _JSON_CODEC_FACTORIES[name]()
+        except ImportError:
+            pass
 
 
 def encode_bqm_as_qp(solver, linear, quadratic):
@@ -26,6 +135,136 @@ def encode_bqm_as_qp(solver, linear, quadratic):
     Returns:
         encoded submission dictionary
     """
+    if _numpy:
+        lin, quad = _encode_qp_biases_numpy(solver, linear, quadratic)
+    else:
+        lin, quad = _encode_qp_biases(solver, linear, quadratic)
+
+    # The name for this encoding is 'qp' and is explicitly included in the
+    # message for easier extension in the future.
+    return {
+        'format': 'qp',
+        'lin': lin.decode('utf-8'),
+        'quad': quad.decode('utf-8')
+    }
+
+
+def encode_arrays_as_qp(solver, linear, quadratic, active_couplers=False):
+    """Encode a problem given as arrays aligned with the solver's qubits and
+    couplers for submission to the solver, using the `qp` format for data.
+    Requires numpy.
+
+    Args:
+        solver (:class:`dwave.cloud.solver.Solver`):
+            The solver used.
+
+        linear (:class:`numpy.ndarray`):
+            Linear terms of the model, one per qubit in ``properties['qubits']``,
+            NaN for inactive qubits.
+
+        quadratic (:class:`numpy.ndarray`):
+            Quadratic terms of the model, one per coupler in
+            ``properties['couplers']``.
+
+        active_couplers (bool, default=False):
+            `quadratic` has terms only for couplers between active qubits,
+            as encoded.
+
+    Returns:
+        encoded submission dictionary
+    """
+    import numpy as np
+
+    linear = np.asarray(linear, dtype='<f8')
+    quadratic = np.asarray(quadratic, dtype='<f8')
+
+    # Only couplers between active qubits are encoded
+    if not active_couplers:
+        active = ~np.isnan(linear)
+        coupler_qubits = solver._encoding_index.coupler_qubits
+        quadratic = quadratic[active[coupler_qubits[:, 0]] & active[coupler_qubits[:, 1]]]
+
+    return {
+        'format': 'qp',
+        'lin': base64.b64encode(linear.tobytes()).decode('utf-8'),
+        'quad': base64.b64encode(quadratic.tobytes()).decode('utf-8')
+    }
+
+
+class EncodingCache(object):
+    """Bounded LRU cache of problems encoded with :func:`encode_bqm_as_qp`.
+
+    Problems are looked up by a fingerprint of the solver (object, as
+    encoding depends on its graph, which can change between solver
+    definitions with the same id), and linear and quadratic terms (in order
+    of iteration). A hit skips encoding entirely, but computing the
+    fingerprint adds to the cost of encoding a problem not found, so caching
+    pays off only when identical problems are resubmitted.
+
+    Args:
+        maxsize (int, default=16):
+            Maximum number of encoded problems kept. Use 0 to disable caching.
+
+    Attributes:
+        hits (int): Number of problems found in the cache.
+        misses (int): Number of problems encoded.
+    """
+
+    def __init__(self, maxsize=16):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._encoded = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._encoded)
+
+    @staticmethod
+    def fingerprint(solver, linear, quadratic):
+        """Hashable key of a problem, equal for identical problems."""
+        return (solver, tuple(uniform_iterator(linear)), tuple(quadratic.items()))
+
+    def encode(self, solver, linear, quadratic):
+        """Encode a problem, like :func:`encode_bqm_as_qp`, reusing a
+        previously encoded identical problem if available."""
+        if self.maxsize <= 0:
+            with self._lock:
+                self.misses += 1
+            return encode_bqm_as_qp(solver, linear, quadratic)
+
+        key = self.fingerprint(solver, linear, quadratic)
+        with self._lock:
+            encoded = self._encoded.pop(key, None)
+            if encoded is not None:
+                self.hits += 1
+                self._encoded[key] = encoded
+                return dict(encoded)
+            self.misses += 1
+
+        encoded = encode_bqm_as_qp(solver, linear, quadratic)
+
+        with self._lock:
+            self._encoded[key] = encoded
+            while len(self._encoded) > self.maxsize:
+                self._encoded.popitem(last=False)
+        return dict(encoded)
+
+    def clear(self):
+        """Drop all encoded problems, and reset counters."""
+        with self._lock:
+            self._encoded.clear()
+            self.hits = self.misses = 0
+
+
+def _encode_qp_biases(solver, linear, quadratic):
+    """Helper for encode_bqm_as_qp, encodes linear and quadratic biases
+    in native python.
+
+    Returns:
+        tuple(bytes, bytes): base64-encoded `lin` and `quad` buffers.
+    """
+    index = solver._encoding_index
     active = active_qubits(linear, quadratic)
 
     # Encode linear terms. The coefficients of the linear terms of the objective
@@ -35,96 +274,328 @@ def encode_bqm_as_qp(solver, linear, quadratic):
     # specified by the server.
     # Note: only active qubits are coded with double, inactive with NaN
     nan = float('nan')
-    lin = [uniform_get(linear, qubit, 0 if qubit in active else nan)
-           for qubit in solver._encoding_qubits]
+    lin = [nan] * len(solver._encoding_qubits)
+    for qubit in active:
+        pos = index.qubits.get(qubit)
+        if pos is not None:
+            lin[pos] = uniform_get(linear, qubit, 0)
     lin = base64.b64encode(struct.pack('<' + ('d' * len(lin)), *lin))
 
     # Encode the coefficients of the quadratic terms of the objective
     # in the same manner as the linear terms, in the order given by the
-    # _encoding_couplers property, discarding tailing zero couplings
-    quad = [quadratic.get((q1,q2), 0) + quadratic.get((q2,q1), 0)
-            for (q1,q2) in solver._encoding_couplers
-            if q1 in active and q2 in active]
+    # _encoding_couplers property, discarding couplers not in the active
+    # subgraph. Active couplers are found by walking the neighborhoods of
+    # active qubits only.
+    positions = sorted(pos for qubit in active
+                       for neighbor, pos in index.adjacency.get(qubit, ())
+                       if qubit < neighbor and neighbor in active)
+    slots = {pos: slot for slot, pos in enumerate(positions)}
+    quad = [0] * len(positions)
+    for edge, bias in six.iteritems(quadratic):
+        pos = index.couplers.get(tuple(edge))
+        if pos is not None:
+            quad[slots[pos]] += bias
     quad = base64.b64encode(struct.pack('<' + ('d' * len(quad)), *quad))
 
-    # The name for this encoding is 'qp' and is explicitly included in the
-    # message for easier extension in the future.
-    return {
-        'format': 'qp',
-        'lin': lin.decode('utf-8'),
-        'quad': quad.decode('utf-8')
-    }
+    return lin, quad
+
+
+def _encode_qp_biases_numpy(solver, linear, quadratic):
+    """Helper for encode_bqm_as_qp, encodes linear and quadratic biases
+    using numpy.
+
+    Positions of the problem terms are looked up in the solver's encoding
+    index, and biases are scattered into `lin` and `quad` buffers with fancy
+    indexing, instead of being looked up one qubit/coupler at a time.
+
+    Returns:
+        tuple(bytes, bytes): base64-encoded `lin` and `quad` buffers.
+    """
+    index = solver._encoding_index
+    num_qubits = len(solver._encoding_qubits)
+    num_couplers = len(solver._encoding_couplers)
+
+    # Positions of problem terms in the encoding order, -1 if not on the graph.
+    # Note: lookups are done with `map` over `dict.get` to keep them in C.
+    qubit_position = index.qubits.get
+    if isinstance(linear, dict):
+        lin_pos = np.fromiter(map(qubit_position, linear, repeat(-1)),
+                              dtype=np.int64, count=len(linear))
+        lin_biases = np.fromiter(six.itervalues(linear), dtype=np.double,
+                                 count=len(linear))
+    else:
+        lin_pos = np.fromiter(map(qubit_position, range(len(linear)), repeat(-1)),
+                              dtype=np.int64, count=len(linear))
+        lin_biases = np.asarray(linear, dtype=np.double)
 
+    quad_qubit_pos = np.fromiter(
+        map(qubit_position, chain.from_iterable(quadratic), repeat(-1)),
+        dtype=np.int64, count=2 * len(quadratic))
+    quad_pos = np.fromiter(map(index.couplers.get, quadratic, repeat(-1)),
+                           dtype=np.int64, count=len(quadratic))
+    quad_biases = np.fromiter(six.itervalues(quadratic), dtype=np.double,
+                              count=len(quadratic))
 
-def decode_qp(msg):
+    # Active qubits are those with a bias or a coupling attached
+    active = np.zeros(num_qubits, dtype=bool)
+    active[lin_pos[lin_pos >= 0]] = True
+    active[quad_qubit_pos[quad_qubit_pos >= 0]] = True
+
+    # Note: only active qubits are coded with double, inactive with NaN
+    lin = np.full(num_qubits, np.nan, dtype=np.double)
+    lin[active] = 0
+    on_graph = lin_pos >= 0
+    lin[lin_pos[on_graph]] = lin_biases[on_graph]
+
+    # Both (u, v) and (v, u) biases accumulate on the same coupler
+    quad = np.zeros(num_couplers, dtype=np.double)
+    on_graph = quad_pos >= 0
+    np.add.at(quad, quad_pos[on_graph], quad_biases[on_graph])
+
+    # Discard couplers not in the active subgraph
+    coupler_qubits = index.coupler_qubits
+    quad = quad[active[coupler_qubits[:, 0]] & active[coupler_qubits[:, 1]]]
+
+    little_endian = np.dtype('<f8')
+    lin = base64.b64encode(lin.astype(little_endian).tobytes())
+    quad = base64.b64encode(quad.astype(little_endian).tobytes())
+
+    return lin, quad
+
+
+def decode_qp(msg, fields=None, samples_layout='full', aggregate=False):
     """Decode SAPI response that uses `qp` format, without numpy.
 
     The 'qp' format is the current encoding used for problems and samples.
     In this encoding the reply is generally json, but the samples, energy,
     and histogram data (the occurrence count of each solution), are all
     base64 encoded arrays.
+
+    Fields are decoded in place, in the `answer` of the message. Fields already
+    decoded (by a previous call) are left as they are.
+
+    Args:
+        msg (dict): SAPI response message.
+
+        fields (list[str], optional):
+            Answer fields to decode, a subset of `energies`, `num_occurrences`,
+            `active_variables` and `solutions`. All by default.
+
+        samples_layout (str, default='full'):
+            Layout of decoded `solutions`, 'full' or 'active' (see
+            :func:`decode_qp_numpy`). The 'packed' layout requires numpy.
+
+        aggregate (bool, default=False):
+            Collapse identical solutions into one, summing their occurrences
+            (see :func:`decode_qp_numpy`).
+
+    Returns:
+        dict: decoded answer
     """
+    if samples_layout not in ('full', 'active'):
+        raise ValueError("Unsupported samples layout: {!r}".format(samples_layout))
+
+    result = msg['answer']
+    fields = _decode_dependencies(fields, aggregate)
+
+    if aggregate and 'solutions' in fields and _is_encoded(result, 'solutions'):
+        _aggregate_answer(msg)
+
     # Decode the simple buffers
+    for field, decoder in [('active_variables', _decode_ints),
+                           ('num_occurrences', _decode_ints),
+                           ('energies', _decode_doubles)]:
+        if field in fields and _is_encoded(result, field):
+            result[field] = decoder(result[field])
+
+    if 'solutions' in fields and _is_encoded(result, 'solutions'):
+        result['solutions'] = _decode_solutions(msg, samples_layout)
+
+    return result
+
+
+def _decode_solutions(msg, samples_layout='full'):
+    """Helper for decode_qp, decodes the solutions bitfield.
+
+    Requires `active_variables` and `energies` to be decoded already.
+    """
     result = msg['answer']
-    result['active_variables'] = _decode_ints(result['active_variables'])
     active_variables = result['active_variables']
-    if 'num_occurrences' in result:
-        result['num_occurrences'] = _decode_ints(result['num_occurrences'])
-    result['energies'] = _decode_doubles(result['energies'])
 
     # Measure out the size of the binary solution data
     num_solutions = len(result['energies'])
-    num_variables = len(result['active_variables'])
+    num_variables = len(active_variables)
     solution_bytes = -(-num_variables // 8)  # equivalent to int(math.ceil(num_variables / 8.))
     total_variables = result['num_variables']
 
-    # Figure out the null value for output
-    default = 3 if msg['type'] == 'qubo' else 0
+    # Figure out the null value for output, and switch to the right variable
+    # space by decoding bytes directly to spins for ising problems. Inactive
+    # variables of ising problems are -1, as they have always been here
+    # (unlike in decode_qp_numpy, where they are 0).
+    if msg['type'] == 'ising':
+        byte_table, default = _BYTE_SPINS, -1
+    else:
+        byte_table, default = _BYTE_BITS, 3
+
+    # Each decoded row of values is extended with the null value, so that
+    # a single gather can place active variables and fill in the missing ones
+    padding = solution_bytes * 8
+    if samples_layout == 'active':
+        gather = list(range(num_variables))
+    else:
+        gather = [padding] * total_variables
+        for index, variable in enumerate(active_variables):
+            gather[variable] = index
+    if len(gather) > 1:
+        getter = operator.itemgetter(*gather)
+    else:
+        getter = lambda values: [values[i] for i in gather]
 
     # Decode the solutions, which will be byte aligned in binary format
-    binary = base64.b64decode(result['solutions'])
+    binary = memoryview(_b64decode(result['solutions']))
     solutions = []
     for solution_index in range(num_solutions):
-        # Grab the section of the buffer related to the current
-        buffer_index = solution_index * solution_bytes
-        solution_buffer = binary[buffer_index:buffer_index + solution_bytes]
-        bytes = struct.unpack('B' * solution_bytes, solution_buffer)
-
-        # Assume None values
-        solution = [default] * total_variables
-        index = 0
-        for byte in bytes:
-            # Parse each byte and read how ever many bits can be
-            values = _decode_byte(byte)
-            for _ in range(min(8, len(active_variables) - index)):
-                i = active_variables[index]
-                index += 1
-                solution[i] = values.pop()
-
-        # Switch to the right variable space
-        if msg['type'] == 'ising':
-            values = {0: -1, 1: 1}
-            solution = [values.get(v, default) for v in solution]
-        solutions.append(solution)
-
-    result['solutions'] = solutions
-    return result
+        offset = solution_index * solution_bytes
+        values = list(chain.from_iterable(
+            map(byte_table.__getitem__, binary[offset:offset + solution_bytes].tolist())))
+        values.append(default)
+        solutions.append(list(getter(values)))
 
+    return solutions
 
-def _decode_byte(byte):
-    """Helper for decode_qp, turns a single byte into a list of bits.
 
-    Args:
-        byte: byte to be decoded
+def _decode_dependencies(fields, aggregate=False):
+    """Helper for decoders, returns the set of `fields` extended with the
+    fields they depend on (all answer fields if `fields` is None).
 
-    Returns:
-        list of bits corresponding to byte
+    Aggregated solutions, energies and occurrences are decoded together."""
+    if fields is None:
+        return set(_QP_FIELDS)
+
+    fields = set(fields)
+    if aggregate and fields.intersection(_AGGREGATED_FIELDS):
+        fields.update(_AGGREGATED_FIELDS)
+    if 'solutions' in fields:
+        fields.update(('active_variables', 'energies'))
+    return fields
+
+
+# Answer fields rewritten by aggregation of identical solutions
+_AGGREGATED_FIELDS = ('energies', 'num_occurrences', 'solutions')
+
+
+def _aggregate_answer(msg):
+    """Helper for decode_qp, collapses identical solutions into one, in place.
+
+    Rows of the encoded `solutions` bitfield are compared as bytes, in order
+    of first occurrence. Energies of unique rows are kept, and occurrences
+    summed. Aggregated fields are left encoded, as binary buffers.
     """
-    bits = []
-    for _ in range(8):
-        bits.append(byte & 1)
-        byte >>= 1
-    return bits
+    result = msg['answer']
+    energies = _decode_doubles(result['energies'])
+    num_solutions = len(energies)
+    if _is_encoded(result, 'num_occurrences'):
+        occurrences = _decode_ints(result['num_occurrences'])
+    else:
+        occurrences = [1] * num_solutions
+
+    binary = bytearray(_b64decode(result['solutions']))
+    row_bytes = len(binary) // num_solutions if num_solutions else 0
+
+    # Clear padding bits after the last active variable, so rows compare
+    # equal when all their variables do
+    mask = _padding_mask(result)
+    if row_bytes and mask != 0xff:
+        tail = slice(row_bytes - 1, None, row_bytes)
+        binary[tail] = bytearray(byte & mask for byte in binary[tail])
+    binary = bytes(binary)
+
+    unique = {}
+    first, counts = [], []
+    for index in range(num_solutions):
+        row = binary[index * row_bytes:(index + 1) * row_bytes]
+        position = unique.setdefault(row, len(first))
+        if position == len(first):
+            first.append(index)
+            counts.append(occurrences[index])
+        else:
+            counts[position] += occurrences[index]
+
+    result['solutions'] = bytearray(b''.join(
+        binary[index * row_bytes:(index + 1) * row_bytes] for index in first))
+    result['energies'] = bytearray(
+        struct.pack('<' + 'd' * len(first), *[energies[index] for index in first]))
+    result['num_occurrences'] = bytearray(struct.pack('<' + 'i' * len(counts), *counts))
+
+
+def _aggregate_answer_numpy(msg):
+    """Helper for decode_qp_numpy, collapses identical solutions into one,
+    in place (see :func:`_aggregate_answer`).
+
+    Rows of packed bits are compared as opaque (void) values, so unique rows
+    are found with a single sort, before any bits are unpacked.
+    """
+    import numpy as np
+
+    result = msg['answer']
+    energies = np.frombuffer(_b64decode(result['energies']), dtype='<f8')
+    num_solutions = len(energies)
+    if _is_encoded(result, 'num_occurrences'):
+        occurrences = np.frombuffer(_b64decode(result['num_occurrences']), dtype='<i4')
+    else:
+        occurrences = np.ones(num_solutions, dtype='<i4')
+
+    packed = _packed_solutions(msg, num_solutions)
+    if packed.shape[1]:
+        # Clear padding bits after the last active variable
+        mask = _padding_mask(result)
+        if mask != 0xff:
+            packed = packed.copy()
+            packed[:, -1] &= mask
+
+        rows = np.ascontiguousarray(packed).view(np.dtype((np.void, packed.shape[1]))).ravel()
+        _, first, inverse = np.unique(rows, return_index=True, return_inverse=True)
+
+        # Keep unique rows in order of first occurrence
+        order = np.argsort(first)
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        first, inverse = first[order], rank[inverse.ravel()]
+    else:
+        # Without active variables all solutions are the same
+        first = np.zeros(min(num_solutions, 1), dtype=np.intp)
+        inverse = np.zeros(num_solutions, dtype=np.intp)
+
+    counts = np.bincount(inverse, weights=occurrences, minlength=len(first))
+
+    result['solutions'] = bytearray(packed[first].tobytes())
+    result['energies'] = bytearray(energies[first].tobytes())
+    result['num_occurrences'] = bytearray(counts.astype('<i4').tobytes())
+
+
+def _padding_mask(result):
+    """Helper for aggregation, returns the mask of bits of the last byte of a
+    packed solution that hold active variables (not padding)."""
+    if _is_encoded(result, 'active_variables'):
+        num_variables = len(_b64decode(result['active_variables'])) // 4
+    else:
+        num_variables = len(result['active_variables'])
+    return (0xff << (-num_variables % 8)) & 0xff
+
+
+def _is_encoded(result, field):
+    """Helper for decoders, checks if `field` is present in the answer and
+    still holds the base64 encoded string, or the binary buffer it encodes
+    (see :func:`load_qp_stream`), i.e. has not been decoded yet."""
+    return isinstance(result.get(field), six.string_types + (bytearray,))
+
+
+def _b64decode(value):
+    """Helper for decoders, returns the binary content of an encoded field.
+    Fields loaded with :func:`load_qp_stream` are already base64 decoded."""
+    if isinstance(value, bytearray):
+        return value
+    return base64.b64decode(value)
 
 
 def _decode_ints(message):
@@ -134,7 +605,7 @@ def _decode_ints(message):
     The array has then been base64 encoded. Since we are decoding we do these
     steps in reverse.
     """
-    binary = base64.b64decode(message)
+    binary = _b64decode(message)
     return struct.unpack('<' + ('i' * (len(binary) // 4)), binary)
 
 
@@ -151,20 +622,67 @@ def _decode_doubles(message):
     Returns:
         decoded double array
     """
-    binary = base64.b64decode(message)
+    binary = _b64decode(message)
     return struct.unpack('<' + ('d' * (len(binary) // 8)), binary)
 
 
-def decode_qp_numpy(msg, return_matrix=True):
+def decode_qp_numpy(msg, return_matrix=True, fields=None, samples_layout='full',
+                    dtypes=None, aggregate=False):
     """Decode SAPI response, results in a `qp` format, explicitly using numpy.
     If numpy is not installed, the method will fail.
 
     To use numpy for decoding, but return the results a lists (instead of
     numpy matrices), set `return_matrix=False`.
+
+    Fields are decoded in place, in the `answer` of the message. Fields already
+    decoded (by a previous call) are left as they are.
+
+    Args:
+        msg (dict): SAPI response message.
+
+        return_matrix (bool, default=True):
+            Return decoded fields as numpy arrays, instead of lists.
+
+        fields (list[str], optional):
+            Answer fields to decode, a subset of `energies`, `num_occurrences`,
+            `active_variables` and `solutions`. All by default.
+
+        samples_layout (str, default='full'):
+            Layout of decoded `solutions`. With 'full', solutions are unpacked
+            to a matrix with one value per variable. With 'active', solutions
+            are unpacked to a matrix with one column per active variable, in
+            order of `active_variables` (use :func:`expand_samples` to switch
+            to the full layout). With 'packed', solutions are kept bit-packed,
+            as received, and returned as :class:`PackedSamples`, which unpacks
+            rows or columns on access.
+
+        dtypes (dict, optional):
+            Data type of decoded fields, as a mapping of field name to numpy
+            dtype, e.g. ``{'solutions': numpy.int8, 'energies': numpy.float32}``.
+            By default, energies are doubles, `num_occurrences` and
+            `active_variables` are 32-bit ints, and solutions are 8-bit ints.
+
+        aggregate (bool, default=False):
+            Collapse identical solutions into one, with the sum of their
+            `num_occurrences`, in order of first occurrence. Solutions are
+            compared packed, before they are unpacked. Aggregated fields
+            (`solutions`, `energies` and `num_occurrences`) are decoded
+            together.
+
+    Returns:
+        dict: decoded answer
     """
     import numpy as np
 
+    if samples_layout not in SAMPLES_LAYOUTS:
+        raise ValueError("Unknown samples layout: {!r}".format(samples_layout))
+
     result = msg['answer']
+    fields = _decode_dependencies(fields, aggregate)
+    dtypes = dtypes or {}
+
+    if aggregate and 'solutions' in fields and _is_encoded(result, 'solutions'):
+        _aggregate_answer_numpy(msg)
 
     # Build some little endian type encodings
     double_type = np.dtype(np.double)
@@ -173,54 +691,653 @@ def decode_qp_numpy(msg, return_matrix=True):
     int_type = int_type.newbyteorder('<')
 
     # Decode the simple buffers
-    result['energies'] = np.frombuffer(base64.b64decode(result['energies']),
-                                       dtype=double_type)
+    decoded = []
+    for field, dtype in [('energies', double_type),
+                         ('num_occurrences', int_type),
+                         ('active_variables', int_type)]:
+        if field in fields and _is_encoded(result, field):
+            values = np.frombuffer(_b64decode(result[field]), dtype=dtype)
+            if field in dtypes:
+                values = values.astype(dtypes[field], copy=False)
+            result[field] = values
+            decoded.append(field)
 
-    if 'num_occurrences' in result:
-        result['num_occurrences'] = \
-            np.frombuffer(base64.b64decode(result['num_occurrences']),
-                        dtype=int_type)
+    if 'solutions' in fields and _is_encoded(result, 'solutions'):
+        dtype = dtypes.get('solutions', np.int8)
+        if samples_layout == 'packed':
+            # Packed samples convert rows to python objects on access
+            result['solutions'] = _decode_solutions_packed(msg, return_matrix, dtype)
+        else:
+            result['solutions'] = _decode_solutions_numpy(msg, samples_layout, dtype)
+            decoded.append('solutions')
 
-    result['active_variables'] = \
-        np.frombuffer(base64.b64decode(result['active_variables']),
-                      dtype=int_type)
+    # If the final result shouldn't be numpy formats switch back to python objects
+    if not return_matrix:
+        for field in decoded:
+            result[field] = result[field].tolist()
 
-    # Measure out the binary data size
-    num_solutions = len(result['energies'])
-    active_variables = result['active_variables']
-    num_variables = len(active_variables)
-    total_variables = result['num_variables']
+    return result
 
-    # Decode the solutions, which will be a continuous run of bits
-    byte_type = np.dtype(np.uint8)
-    byte_type = byte_type.newbyteorder('<')
-    bits = np.unpackbits(np.frombuffer(base64.b64decode(result['solutions']),
-                         dtype=byte_type))
 
-    # Clip off the extra bits from encoding
-    if num_solutions:
-        bits = np.reshape(bits, (num_solutions, bits.size // num_solutions))
-        bits = np.delete(bits, range(num_variables, bits.shape[1]), 1)
+def _decode_solutions_numpy(msg, samples_layout='full', dtype=None):
+    """Helper for decode_qp_numpy, decodes the solutions bitfield.
+
+    Requires `active_variables` and `energies` to be decoded already.
+    """
+    import numpy as np
+
+    result = msg['answer']
+    active_variables = np.asarray(result['active_variables'])
+    packed = _packed_solutions(msg)
+
+    if samples_layout == 'active':
+        bits = _unpack_bits(packed, len(active_variables), msg['type'])
+        return bits.astype(dtype, copy=False) if dtype is not None else bits
+
+    return _unpack_solutions(packed, active_variables, result['num_variables'],
+                             msg['type'], dtype=dtype)
+
+
+def _decode_solutions_packed(msg, return_matrix, dtype=None):
+    """Helper for decode_qp_numpy, decodes the solutions bitfield
+    into :class:`PackedSamples`, without unpacking bits.
+
+    Requires `active_variables` and `energies` to be decoded already.
+    """
+    import numpy as np
+
+    result = msg['answer']
+    return PackedSamples(_packed_solutions(msg),
+                         np.asarray(result['active_variables']),
+                         result['num_variables'], msg['type'],
+                         return_matrix=return_matrix, dtype=dtype)
+
+
+def _packed_solutions(msg, num_solutions=None):
+    """Helper for decode_qp_numpy, decodes the base64 solutions into a matrix
+    of packed bits, one row (byte aligned) per solution.
+
+    Number of solutions defaults to the number of (decoded) energies."""
+    import numpy as np
+
+    result = msg['answer']
+    if num_solutions is None:
+        num_solutions = len(result['energies'])
+
+    packed = np.frombuffer(_b64decode(result['solutions']), dtype=np.uint8)
+    row_bytes = packed.size // num_solutions if num_solutions else 0
+    return packed.reshape(num_solutions, row_bytes)
+
+
+def _unpackbits_rows(packed, count):
+    """Helper for decode_qp_numpy, unpacks the first `count` bits of each row
+    of a `packed` byte matrix into a new uint8 matrix."""
+    import numpy as np
+
+    try:
+        return np.unpackbits(packed, axis=1, count=count)
+    except TypeError:   # pragma: no cover
+        # numpy < 1.17 doesn't support `count`, so trim padding with a view
+        return np.unpackbits(packed, axis=1)[:, :count]
+
+
+def _unpack_bits(packed, num_variables, problem_type):
+    """Helper for decode_qp_numpy, unpacks rows of packed bits into an int8
+    matrix of values of active variables, with padding trimmed and bits
+    switched to spins (in place) for ising problems."""
+    import numpy as np
+
+    # Unpack, clipping off the extra bits from encoding
+    bits = _unpackbits_rows(packed, num_variables).view(np.int8)
 
     # Switch from bits to spins
-    default = 3
-    if msg['type'] == 'ising':
-        bits = bits.astype(np.int8)
+    if problem_type == 'ising':
         bits *= 2
         bits -= 1
-        default = 0
+    return bits
+
+
+def _unpack_solutions(packed, active_variables, total_variables, problem_type,
+                      dtype=None):
+    """Helper for decode_qp_numpy and :class:`PackedSamples`, unpacks rows of
+    packed bits into solutions over all variables.
+
+    Bits are unpacked row-wise with padding trimmed, and switched to spins in
+    place. The output matrix is the only full-size allocation: when not all
+    variables are active, rows are unpacked in small chunks and scattered
+    into the output.
+    """
+    import numpy as np
+
+    num_solutions = len(packed)
+    num_variables = len(active_variables)
+    if dtype is None:
+        dtype = np.int8
+
+    # All variables active, in order: nothing to fill in
+    if num_variables == total_variables and \
+            np.array_equal(active_variables, np.arange(total_variables)):
+        return _unpack_bits(packed, num_variables, problem_type).astype(dtype, copy=False)
 
     # Fill in the missing variables
-    solutions = np.full((num_solutions, total_variables), default, dtype=np.int8)
-    solutions[:, active_variables] = bits
-    result['solutions'] = solutions
+    default = 0 if problem_type == 'ising' else 3
+    solutions = np.full((num_solutions, total_variables), default, dtype=dtype)
+    chunk = max(1, _DECODE_CHUNK_SIZE // max(1, num_variables))
+    for start in range(0, num_solutions, chunk):
+        solutions[start:start + chunk, active_variables] = \
+            _unpack_bits(packed[start:start + chunk], num_variables, problem_type)
+    return solutions
 
-    # If the final result shouldn't be numpy formats switch back to python objects
-    if not return_matrix:
-        result['energies'] = result['energies'].tolist()
-        if 'num_occurrences' in result:
-            result['num_occurrences'] = result['num_occurrences'].tolist()
-        result['active_variables'] = result['active_variables'].tolist()
-        result['solutions'] = result['solutions'].tolist()
 
-    return result
+def expand_samples(samples, active_variables, num_variables, problem_type):
+    """Expand samples in the 'active' layout (one column per active variable)
+    to the 'full' layout (one column per variable), filling in inactive
+    variables with the null value (0 for ising, 3 for qubo problems).
+
+    Args:
+        samples (list/:class:`numpy.ndarray`):
+            Samples over active variables, one row per sample.
+
+        active_variables (list/:class:`numpy.ndarray`):
+            Variables corresponding to columns of `samples`.
+
+        num_variables (int):
+            Total number of variables (columns) in expanded samples.
+
+        problem_type (str):
+            'ising' or 'qubo'.
+
+    Returns:
+        Samples in the full layout, a numpy matrix if `samples` is a numpy
+        array, list of lists otherwise.
+    """
+    default = 0 if problem_type == 'ising' else 3
+
+    if _numpy and isinstance(samples, np.ndarray):
+        expanded = np.full((len(samples), num_variables), default, dtype=samples.dtype)
+        expanded[:, np.asarray(active_variables, dtype=np.intp)] = samples
+        return expanded
+
+    expanded = []
+    for row in samples:
+        full = [default] * num_variables
+        for variable, value in zip(active_variables, row):
+            full[variable] = value
+        expanded.append(full)
+    return expanded
+
+
+class PackedSamples(object):
+    """Bit-packed samples, unpacked on access.
+
+    Keeps solutions in the SAPI `qp` layout (one bit per active variable, each
+    row byte aligned), using 8x (or more) less memory than unpacked samples.
+    Rows, slices of rows and columns are unpacked on demand, and indexing
+    follows the unpacked layout, e.g. ``samples[i][v]`` is the value of
+    variable `v` in the `i`-th sample.
+
+    Args:
+        packed (:class:`numpy.ndarray`):
+            Packed solutions, uint8 matrix with one row per solution.
+
+        active_variables (:class:`numpy.ndarray`):
+            Variables (columns) encoded in each row, in order of bits.
+
+        num_variables (int):
+            Total number of variables (columns) in unpacked samples.
+
+        problem_type (str):
+            'ising' (spin values) or 'qubo' (binary values).
+
+        return_matrix (bool, default=True):
+            Return unpacked samples as numpy arrays, instead of lists.
+
+        dtype (:class:`numpy.dtype`, optional, default=int8):
+            Data type of unpacked samples.
+    """
+
+    def __init__(self, packed, active_variables, num_variables, problem_type,
+                 return_matrix=True, dtype=None):
+        self.packed = packed
+        self.active_variables = active_variables
+        self.num_variables = num_variables
+        self.problem_type = problem_type
+        self.return_matrix = return_matrix
+        self.dtype = np.dtype(np.int8 if dtype is None else dtype)
+
+        # Position of each variable's bit in a packed row, -1 if inactive
+        self._positions = np.full(num_variables, -1, dtype=np.int64)
+        self._positions[active_variables] = np.arange(len(active_variables))
+
+    def __repr__(self):
+        return "{}(shape={!r}, nbytes={!r})".format(
+            type(self).__name__, self.shape, self.nbytes)
+
+    def __len__(self):
+        return len(self.packed)
+
+    @property
+    def shape(self):
+        "Shape of unpacked samples: (num_samples, num_variables)."
+        return (len(self.packed), self.num_variables)
+
+    @property
+    def nbytes(self):
+        "Memory used by packed samples, in bytes."
+        return self.packed.nbytes
+
+    def _unpack(self, packed):
+        return _unpack_solutions(packed, self.active_variables,
+                                 self.num_variables, self.problem_type,
+                                 dtype=self.dtype)
+
+    def _output(self, array):
+        return array if self.return_matrix else array.tolist()
+
+    def __getitem__(self, key):
+        rows, cols = key if isinstance(key, tuple) else (key, None)
+
+        # Single column: unpack only the bits of one variable
+        if isinstance(cols, numbers.Integral):
+            return self._output(self.column(cols)[rows])
+
+        samples = self._unpack(self._rows(rows))
+        if isinstance(rows, numbers.Integral):
+            samples = samples[0]
+        if cols is not None:
+            samples = samples[..., cols]
+        return self._output(samples)
+
+    def _rows(self, key):
+        """Packed rows selected by `key`, always as a matrix."""
+        if isinstance(key, numbers.Integral):
+            index = key + len(self.packed) if key < 0 else key
+            if not 0 <= index < len(self.packed):
+                raise IndexError("sample index out of range")
+            return self.packed[index:index + 1]
+        return self.packed[key]
+
+    def __iter__(self):
+        chunk = max(1, _DECODE_CHUNK_SIZE // max(1, self.num_variables))
+        for start in range(0, len(self.packed), chunk):
+            for row in self._unpack(self.packed[start:start + chunk]):
+                yield self._output(row)
+
+    def column(self, variable):
+        """Values of `variable` in all samples, as a numpy array.
+
+        Only the bits of `variable` are unpacked.
+        """
+        ising = self.problem_type == 'ising'
+        position = self._positions[variable]
+        if position < 0:
+            return np.full(len(self.packed), 0 if ising else 3, dtype=self.dtype)
+
+        column = (self.packed[:, position // 8] >> (7 - position % 8)) & 1
+        column = column.astype(self.dtype)
+        if ising:
+            column *= 2
+            column -= 1
+        return column
+
+    def unpack(self):
+        """Unpacked samples, as a numpy matrix."""
+        return self._unpack(self.packed)
+
+    def __array__(self, dtype=None, copy=None):
+        array = self.unpack()
+        return array if dtype is None else array.astype(dtype)
+
+    def tolist(self):
+        """Unpacked samples, as a list of lists."""
+        return self.unpack().tolist()
+
+
+class ProcessPoolDecoder(object):
+    """Decodes large answers with :func:`decode_qp_numpy` in a pool of worker
+    processes.
+
+    Decoding holds the GIL for most of its duration. Decoding answers in other
+    processes keeps the calling process responsive; the calling thread only
+    waits (without holding the GIL) for the decoded fields.
+
+    Worker processes are started on first use, with the ``forkserver`` (or
+    ``spawn``) start method, as forking a multi-threaded process, such as a
+    client with its worker threads, can deadlock the child process.
+
+    Decoded fields are pickled back from the worker processes as numpy
+    arrays, and copied into the answer of the calling process. Converting
+    arrays to lists (`return_matrix=False`) costs about as much as decoding,
+    so such answers are not accepted for decoding in worker processes, unless
+    decoded into packed samples.
+
+    Note:
+        Worker processes started with ``forkserver`` or ``spawn`` import the
+        main module of the calling process, so scripts using the decoder (or a
+        client with `decode_processes`) must guard their code with
+        ``if __name__ == '__main__':``, otherwise each worker re-runs it.
+
+    Note:
+        On Python 2 (and Python 3 before 3.7), the start method of the
+        executor can't be set, and worker processes would be forked. There,
+        no answers are accepted, and :meth:`decode` decodes in-process.
+
+    Args:
+        max_workers (int, default=None):
+            Number of worker processes, number of CPUs by default.
+
+        threshold (int, default=2**22):
+            Minimal size (in bytes) of encoded answer fields decoded in a
+            worker process. Smaller answers are cheaper to decode in-process.
+
+    Examples:
+        This example decodes results of a client in two worker processes,
+        from a script guarded for worker processes importing it.
+
+        >>> from dwave.cloud import Client
+        >>> def main():
+        ...     with Client.from_config(decode_processes=2) as client:
+        ...         solver = client.get_solver()
+        ...         return solver.sample_qubo({(0, 4): 1}, num_reads=1000).samples
+        ...
+        >>> if __name__ == '__main__':
+        ...     samples = main()    # doctest: +SKIP
+    """
+
+    def __init__(self, max_workers=None, threshold=2**22):
+        self.max_workers = max_workers
+        self.threshold = threshold
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def accepts(self, msg, fields=None, return_matrix=True, samples_layout='full'):
+        """Check if the encoded answer `fields` (all by default) of `msg` are
+        large enough to be decoded in a worker process, into arrays (or packed
+        samples) per `return_matrix` and `samples_layout`."""
+        if _safe_mp_context() is None:
+            return False
+        if not return_matrix and samples_layout != 'packed':
+            return False
+
+        result = msg['answer']
+        fields = _decode_dependencies(fields)
+        size = sum(len(result[field]) for field in fields if _is_encoded(result, field))
+        return size >= self.threshold
+
+    def decode(self, msg, **kwargs):
+        """Decode the answer of `msg` in a worker process, in place.
+
+        Arguments are the same as for :func:`decode_qp_numpy`.
+
+        Returns:
+            dict: decoded answer
+        """
+        mp_context = _safe_mp_context()
+        if mp_context is None:
+            # forking the calling process is not safe
+            return decode_qp_numpy(msg, **kwargs)
+
+        with self._lock:
+            if self._executor is None:
+                from concurrent.futures import ProcessPoolExecutor
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=mp_context)
+            executor = self._executor
+
+        # Only the answer is sent to the worker, and only fields
+        # decoded are sent back, as arrays
+        return_matrix = kwargs.pop('return_matrix', True)
+        message = {'type': msg['type'], 'answer': msg['answer']}
+        decoded = executor.submit(_decode_qp_answer, message, kwargs).result()
+
+        if not return_matrix:
+            for field, value in decoded.items():
+                if isinstance(value, PackedSamples):
+                    value.return_matrix = False
+                else:
+                    decoded[field] = value.tolist()
+
+        msg['answer'].update(decoded)
+        return msg['answer']
+
+    def shutdown(self):
+        """Stop the worker processes, if started."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+def _safe_mp_context():
+    """Multiprocessing context that doesn't fork the calling process:
+    ``forkserver`` where available, ``spawn`` otherwise. None if the start
+    method of an executor can't be set (before Python 3.7)."""
+    if sys.version_info < (3, 7):
+        return None
+
+    import multiprocessing
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def _decode_qp_answer(msg, kwargs):
+    """Helper for ProcessPoolDecoder, decodes `msg` in a worker process,
+    returning only the decoded fields of the answer (as arrays)."""
+    result = msg['answer']
+    encoded = [field for field in result if _is_encoded(result, field)]
+    decode_qp_numpy(msg, return_matrix=True, **kwargs)
+    return {field: result[field] for field in encoded if not _is_encoded(result, field)}
+
+
+def load_qp_stream(chunks, fields=_QP_FIELDS, loads=None):
+    """Load a SAPI response message (json) from an iterable of byte chunks,
+    e.g. a streamed HTTP response body.
+
+    The message is parsed incrementally: the base64 encoded `qp` answer
+    `fields` are decoded chunk by chunk into binary buffers, without the
+    full response, or the full encoded fields, ever being held in memory.
+    The rest of the message is parsed with `loads`.
+
+    Decoded fields are left in the message as :class:`bytearray` buffers,
+    accepted in place of base64 strings by :func:`decode_qp` and
+    :func:`decode_qp_numpy` (numpy arrays are created without a copy).
+
+    Args:
+        chunks (iterable[bytes]):
+            Response body, in chunks of any size.
+
+        fields (list[str], optional):
+            Answer fields to decode while loading. All encoded `qp` fields
+            by default.
+
+        loads (callable, optional, default=:func:`json.loads`):
+            Parser for json bytes, e.g. `loads` of a :class:`JSONCodec`.
+
+    Returns:
+        dict: SAPI response message
+    """
+    parser = _QPStreamParser(fields, loads)
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close()
+
+
+class _QPStreamParser(object):
+    """Incremental parser for :func:`load_qp_stream`.
+
+    Scans the json text for string values of the selected keys of `answer`.
+    Those are base64 decoded as they arrive, and replaced with placeholders in
+    the remaining (small) json text, which is parsed on :meth:`close`.
+    """
+
+    # Parser states: between strings, in a (kept) string, in a decoded field
+    _VALUE, _STRING, _FIELD = range(3)
+
+    _QUOTE_OR_ESCAPE = re.compile(b'["\\\\]')
+    _BRACKET = re.compile(b'[][{}]')
+
+    # Keys of containers enclosing the decoded fields (the message and `answer`)
+    _FIELD_PATH = [None, b'answer']
+
+    # Placeholders are strings that can't appear in a `qp` message
+    _PLACEHOLDER = u'\x00qp:{}'
+
+    def __init__(self, fields=_QP_FIELDS, loads=None):
+        self.keys = set(field.encode('ascii') for field in fields)
+        self.loads = loads or _json_loads
+        self.state = self._VALUE
+        self.escape = False
+
+        # escape sequence read so far in a decoded field (None outside one)
+        self.field_escape = None
+
+        # keys of the enclosing containers (None for the message and arrays)
+        self.path = []
+
+        # json text of the message, without the decoded fields
+        self.text = []
+
+        # content of the current string, and the last string with the
+        # text following it (an object key if followed by a colon)
+        self.string = []
+        self.key = None
+        self.after_key = b''
+
+        # decoded field buffers, and the base64 text not decoded yet
+        self.buffers = []
+        self.tail = b''
+
+    def feed(self, chunk):
+        pos, end = 0, len(chunk)
+        while pos < end:
+            if self.state == self._VALUE:
+                pos = self._feed_value(chunk, pos)
+            elif self.state == self._STRING:
+                pos = self._feed_string(chunk, pos)
+            else:
+                pos = self._feed_field(chunk, pos)
+
+    def _feed_value(self, chunk, pos):
+        quote = chunk.find(b'"', pos)
+        stop = len(chunk) if quote < 0 else quote
+        self.text.append(chunk[pos:stop])
+
+        start = pos
+        for match in self._BRACKET.finditer(chunk, pos, stop):
+            self._after_key(chunk[start:match.start()])
+            bracket = match.group()
+            if bracket == b'{':
+                self.path.append(self._value_key())
+            elif bracket == b'[':
+                self.path.append(None)
+            elif self.path:
+                self.path.pop()
+            self.key = None
+            start = match.end()
+        self._after_key(chunk[start:stop])
+        if quote < 0:
+            return stop
+
+        if self.path == self._FIELD_PATH and self._value_key() in self.keys:
+            self.state = self._FIELD
+            self.buffers.append(bytearray())
+            self.tail = b''
+        else:
+            self.state = self._STRING
+            self.text.append(b'"')
+            self.string = []
+        self.key = None
+        return quote + 1
+
+    def _after_key(self, text):
+        if self.key is not None:
+            self.after_key += text
+            if len(self.after_key) > 64:
+                self.key = None
+
+    def _value_key(self):
+        """Key of the value that follows, or None if not in an object."""
+        if self.key is not None and self.after_key.strip() == b':':
+            return self.key
+        return None
+
+    def _feed_string(self, chunk, pos):
+        if self.escape:
+            # escaped character (or the first of \uXXXX) is kept as is
+            self.escape = False
+            self.text.append(chunk[pos:pos + 1])
+            self.string.append(chunk[pos:pos + 1])
+            return pos + 1
+
+        match = self._QUOTE_OR_ESCAPE.search(chunk, pos)
+        stop = match.start() if match else len(chunk)
+        self.text.append(chunk[pos:stop])
+        self.string.append(chunk[pos:stop])
+        if not match:
+            return stop
+
+        if chunk[stop:stop + 1] == b'\\':
+            self.escape = True
+            self.text.append(b'\\')
+            self.string.append(b'\\')
+        else:
+            self.state = self._VALUE
+            self.text.append(b'"')
+            self.key = b''.join(self.string)
+            self.after_key = b''
+        return stop + 1
+
+    def _feed_field(self, chunk, pos):
+        if self.field_escape is not None:
+            # escape sequences are read a character at a time, since
+            # they're rare in base64 text (usually just `\/`)
+            self.field_escape += chunk[pos:pos + 1]
+            if self.field_escape[:1] != b'u' or len(self.field_escape) == 5:
+                escaped = _json_loads(b'"\\' + self.field_escape + b'"')
+                self._decode(escaped.encode('ascii'))
+                self.field_escape = None
+            return pos + 1
+
+        match = self._QUOTE_OR_ESCAPE.search(chunk, pos)
+        stop = match.start() if match else len(chunk)
+        self._decode(chunk[pos:stop])
+        if not match:
+            return stop
+
+        if chunk[stop:stop + 1] == b'\\':
+            self.field_escape = b''
+        else:
+            if self.tail:
+                raise ValueError("Incomplete base64 encoded field")
+            self.state = self._VALUE
+            placeholder = self._PLACEHOLDER.format(len(self.buffers) - 1)
+            self.text.append(json.dumps(placeholder).encode('ascii'))
+        return stop + 1
+
+    def _decode(self, text):
+        """Decode base64 `text` into the current buffer, in 4-character groups."""
+        if self.tail:
+            text = self.tail + text
+        usable = len(text) - len(text) % 4
+        if usable:
+            self.buffers[-1].extend(binascii.a2b_base64(text[:usable]))
+        self.tail = text[usable:]
+
+    def close(self):
+        """Finish parsing, return the message."""
+        if self.state != self._VALUE:
+            raise ValueError("Incomplete response message")
+
+        message = self.loads(b''.join(self.text))
+        return self._restore(message)
+
+    def _restore(self, obj):
+        """Replace placeholders in `obj` with decoded buffers."""
+        if isinstance(obj, dict):
+            for key, value in obj.items():
+                obj[key] = self._restore(value)
+        elif isinstance(obj, list):
+            obj[:] = [self._restore(value) for value in obj]
+        elif isinstance(obj, six.string_types) and obj.startswith(u'\x00qp:'):
+            return self.buffers[int(obj[4:])]
+        return obj
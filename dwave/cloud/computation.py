@@ -18,12 +18,17 @@ from __future__ import division, absolute_import
 import threading
 import time
 import six
+import logging
 import functools
 from concurrent.futures import TimeoutError
 
-from dwave.cloud.coders import decode_qp, decode_qp_numpy
+from dwave.cloud.coders import (
+    decode_qp, decode_qp_numpy, expand_samples, SAMPLES_LAYOUTS, _QP_FIELDS)
+from dwave.cloud.store import export_results
 from dwave.cloud.utils import utcnow
 
+_LOGGER = logging.getLogger(__name__)
+
 # Use numpy if available for fast decoding
 try:
     import numpy as np
@@ -51,6 +56,20 @@ class Future(object):
         id_: Identification for a query submitted by a solver to SAPI.
             May be None following submission until an identification number is set.
         return_matrix: Return values for this :class:`Future` object are NumPy matrices.
+        samples_layout: Layout of decoded samples, 'full' (default), 'active' or 'packed'.
+            Active samples have one column per active variable (see
+            :meth:`get_samples` for conversion to the full layout). Packed samples
+            are kept bit-packed, as received, and are unpacked on access
+            (see :class:`~dwave.cloud.coders.PackedSamples`).
+        result_dtypes: Mapping of result field ('samples', 'energies', 'occurrences')
+            to NumPy dtype of decoded values. Requires NumPy.
+        aggregate_samples: Collapse identical samples into one, with the sum of their
+            occurrences. Samples are compared bit-packed, as received, before they
+            are unpacked.
+        process_decoder: :class:`~dwave.cloud.coders.ProcessPoolDecoder` used for
+            decoding large results in worker processes. Requires NumPy.
+        result_store: :class:`~dwave.cloud.store.ResultStore` decoded result arrays
+            are written to, and memory-mapped from (read-only). Requires NumPy.
 
     Examples:
         This example creates a solver using the local system's default D-Wave Cloud Client
@@ -72,7 +91,9 @@ class Future(object):
         >>> client.close()
     """
 
-    def __init__(self, solver, id_, return_matrix, submission_data):
+    def __init__(self, solver, id_, return_matrix, submission_data,
+                 samples_layout='full', result_dtypes=None, aggregate_samples=False,
+                 process_decoder=None, result_store=None):
         self.solver = solver
 
         # Store the query data in case the problem needs to be resubmitted
@@ -88,6 +109,34 @@ class Future(object):
             raise ValueError("Matrix result requested without numpy.")
         self.return_matrix = return_matrix
 
+        # Should the samples be unpacked on decoding, or kept packed
+        if samples_layout not in SAMPLES_LAYOUTS:
+            raise ValueError("Unknown samples layout: {!r}".format(samples_layout))
+        if samples_layout == 'packed' and not _numpy:
+            raise ValueError("{!r} samples layout requested without numpy.".format(samples_layout))
+        self.samples_layout = samples_layout
+
+        # Data types of decoded fields, keyed by answer field name
+        if result_dtypes and not _numpy:
+            raise ValueError("Result dtypes requested without numpy.")
+        self._result_dtypes = {}
+        for key, dtype in (result_dtypes or {}).items():
+            field = self._ALIASES.get(key, key)
+            if field not in _QP_FIELDS:
+                raise ValueError("Unknown result field: {!r}".format(key))
+            self._result_dtypes[field] = dtype
+
+        # Should identical samples be collapsed on decoding
+        self.aggregate_samples = aggregate_samples
+
+        # Decoder of large results, in other processes
+        self._process_decoder = process_decoder if _numpy else None
+
+        # Disk-backed store of decoded results
+        if result_store is not None and not _numpy:
+            raise ValueError("Result store requested without numpy.")
+        self._result_store = result_store
+
         #: The id the server will use to identify this problem, None until the id is actually known
         self.id = id_
 
@@ -118,8 +167,11 @@ class Future(object):
         #: Status flag most recently returned by the server
         self.remote_status = None
 
-        # Data from the server after it is parsed (either data or an error)
+        # Data from the server after it is parsed (either data or an error).
+        # Answer fields are decoded on first access, see `_decode`.
         self._result = None
+        self._decoded_fields = set()
+        self._decode_lock = threading.Lock()
         self.error = None
 
         # Event(s) to signal when the results are ready
@@ -149,6 +201,23 @@ class Future(object):
         self._message = message
         self._signal_ready()
 
+    def _set_decoded_message(self, message):
+        """Complete the future with a message from the server, decoding the
+        answer before the future is resolved.
+
+        Decoding errors are not raised here, but on result access, when
+        decoding is retried.
+
+        Args:
+            message (dict): Data from the server from trying to complete query.
+        """
+        self._message = message
+        try:
+            self._decode()
+        except Exception as exception:
+            _LOGGER.debug("Decoding results of %s failed: %r", self.id, exception)
+        self._signal_ready()
+
     def _set_error(self, error, exc_info=None):
         """Complete the future with an error.
 
@@ -322,6 +391,38 @@ class Future(object):
             for f in done:
                 yield f
 
+    @staticmethod
+    def export_many(futures, path, chunk_size=2**24, compress=True):
+        """Export results of multiple :class:`Future` objects to a single
+        compressed, columnar archive.
+
+        Samples, energies and occurrences of all problems are written in chunks,
+        followed by problem ids and timing. Read the archive back with
+        :class:`~dwave.cloud.store.ResultArchive`. Requires NumPy.
+
+        Args:
+            futures (iterable): :class:`Future` objects of problems with samples
+                of the same size. Blocks until each is complete, in order.
+            path (str/file): Path, or file object, the archive is written to.
+            chunk_size (int, default=2**24): Number of sample values per chunk.
+            compress (bool, default=True): Compress the archive.
+
+        Returns:
+            int: Number of exported problems.
+
+        Examples:
+            This example exports results of several problems, and loads
+            energies of the second problem back.
+
+            >>> from dwave.cloud.computation import Future
+            >>> from dwave.cloud.store import ResultArchive
+            >>> Future.export_many(computation, 'results.npz')     # doctest: +SKIP
+            3
+            >>> with ResultArchive('results.npz') as archive:   # doctest: +SKIP
+            ...     print(archive.problem(1)['energies'])
+        """
+        return export_results(futures, path, chunk_size=chunk_size, compress=compress)
+
     def wait(self, timeout=None):
         """Wait for the solver to receive a response for a submitted problem.
 
@@ -490,7 +591,7 @@ class Future(object):
             [-3976.0, -3974.0, -3972.0, -3970.0, -3968.0, -3968.0, -3966.0,
              -3964.0, -3964.0, -3960.0]
         """
-        return self.result()['energies']
+        return self._load_result(['energies'])['energies']
 
     @property
     def samples(self):
@@ -501,6 +602,10 @@ class Future(object):
 
         Returns:
             list of lists or NumPy matrix: Samples on the nodes of solver's graph.
+            With the 'active' samples layout, samples on active variables only
+            (see :meth:`get_samples`). With the 'packed' samples layout, a
+            :class:`~dwave.cloud.coders.PackedSamples` object that unpacks
+            rows/columns on access.
 
         Examples:
             This example creates a solver using the local system's default D-Wave Cloud Client
@@ -524,7 +629,44 @@ class Future(object):
             (1, 0)
             (0, 1)
         """
-        return self.result()['samples']
+        return self._load_result(['solutions'])['samples']
+
+    def get_samples(self, layout='full'):
+        """Samples in the given layout, regardless of the layout they were
+        decoded in.
+
+        Args:
+            layout (str, default='full'):
+                'full' (one column per variable) or 'active' (one column per
+                active variable, in order of `active_variables`).
+
+        Returns:
+            list of lists or NumPy matrix: Samples in the requested layout.
+        """
+        if layout not in ('full', 'active'):
+            raise ValueError("Unsupported samples layout: {!r}".format(layout))
+
+        samples = self.samples
+        if layout == self.samples_layout:
+            return samples
+
+        result = self._result
+        active_variables = result['active_variables']
+
+        if self.samples_layout == 'packed':
+            samples = samples.unpack()
+            if layout == 'active':
+                samples = samples[:, np.asarray(active_variables)]
+            return samples if self.return_matrix else samples.tolist()
+
+        if layout == 'full':
+            return expand_samples(samples, active_variables,
+                                  result['num_variables'], self._message['type'])
+
+        # full to active
+        if self.return_matrix:
+            return samples[:, np.asarray(active_variables)]
+        return [[row[v] for v in active_variables] for row in samples]
 
     @property
     def occurrences(self):
@@ -563,13 +705,13 @@ class Future(object):
             (-1, -1, 1, 1, ' --> ', -2.0, 28)
 
         """
-        self._load_result()
+        self._load_result(['num_occurrences', 'energies'])
         if 'occurrences' in self._result:
             return self._result['occurrences']
         elif self.return_matrix:
-            return np.ones((len(self._result['samples']),))
+            return np.ones((len(self._result['energies']),))
         else:
-            return [1] * len(self._result['samples'])
+            return [1] * len(self._result['energies'])
 
     @property
     def timing(self):
@@ -602,7 +744,7 @@ class Future(object):
             >>> # Snipped above response for brevity
 
         """
-        return self.result()['timing']
+        return self._load_result([])['timing']
 
     def __getitem__(self, key):
         """Provide a simple results item getter. Blocks if future is unresolved.
@@ -610,13 +752,20 @@ class Future(object):
         Args:
             key: keywords for result fields.
         """
-        self._load_result()
+        field = self._ALIASES.get(key, key)
+        self._load_result([field] if field in _QP_FIELDS else [])
         if key not in self._result:
             raise KeyError('{} is not a property of response object'.format(key))
         return self._result[key]
 
-    def _load_result(self):
-        """Get the result, waiting and decoding as needed."""
+    def _load_result(self, fields=None):
+        """Get the result, waiting and decoding as needed.
+
+        Args:
+            fields (list[str], optional):
+                Answer fields to decode. All fields are decoded by default;
+                the rest are left encoded until requested.
+        """
         if self._result is None:
             # Wait for the query response
             self.wait(timeout=None)
@@ -629,47 +778,86 @@ class Future(object):
                     raise self.error
                 raise RuntimeError(self.error)
 
-            # If someone else took care of this while we were waiting
-            if self._result is not None:
-                return self._result
-            self._decode()
-
-        return self._result
-
-    def _decode(self):
-        """Choose the right decoding method based on format and environment."""
-
-        if self._message['type'] not in ['qubo', 'ising']:
-            raise ValueError('Unknown problem format used.')
+        return self._decode(fields)
 
-        # If format is set, it must be qp
-        if self._message.get('answer', {}).get('format') != 'qp':
-            raise ValueError('Data format returned by server not understood.')
+    def _decode(self, fields=None):
+        """Choose the right decoding method based on format and environment.
 
-        # prefer numpy decoding, but fallback to python
-        # TODO: we should really be explicit about numpy usage
-        start = time.time()
-        if _numpy:
-            self._result = decode_qp_numpy(self._message,
-                                           return_matrix=self.return_matrix)
-        else:
-            self._result = decode_qp(self._message)
-        self.parse_time = time.time() - start
+        Only the requested answer `fields` (all by default) are decoded, and
+        each field is decoded at most once.
+        """
+        if fields is None:
+            fields = _QP_FIELDS
+
+        # If someone else took care of this already
+        if self._result is not None and self._decoded_fields.issuperset(fields):
+            return self._result
+
+        with self._decode_lock:
+            if self._message['type'] not in ['qubo', 'ising']:
+                raise ValueError('Unknown problem format used.')
+
+            # If format is set, it must be qp
+            if self._message.get('answer', {}).get('format') != 'qp':
+                raise ValueError('Data format returned by server not understood.')
+
+            pending = [field for field in fields if field not in self._decoded_fields]
+
+            # prefer numpy decoding, but fallback to python
+            # TODO: we should really be explicit about numpy usage
+            start = time.time()
+            if (self._process_decoder is not None
+                    and self._process_decoder.accepts(
+                        self._message, pending, return_matrix=self.return_matrix,
+                        samples_layout=self.samples_layout)):
+                self._process_decoder.decode(
+                    self._message, return_matrix=self.return_matrix,
+                    fields=pending, samples_layout=self.samples_layout,
+                    dtypes=self._result_dtypes, aggregate=self.aggregate_samples)
+            elif _numpy:
+                decode_qp_numpy(self._message, return_matrix=self.return_matrix,
+                                fields=pending, samples_layout=self.samples_layout,
+                                dtypes=self._result_dtypes,
+                                aggregate=self.aggregate_samples)
+            else:
+                decode_qp(self._message, fields=pending,
+                          samples_layout=self.samples_layout,
+                          aggregate=self.aggregate_samples)
+            self.parse_time = (self.parse_time or 0) + time.time() - start
+
+            if self._result_store is not None:
+                self._result_store.spill(self._message['answer'])
+
+            decoded_fields = self._decoded_fields.union(pending)
+            self._result = self._message['answer']
+            self._alias_result(decoded_fields)
+
+            # Published last, as the check above (without the lock) relies on
+            # decoded fields being in the result, aliased
+            self._decoded_fields = decoded_fields
 
-        self._alias_result()
         return self._result
 
-    def _alias_result(self):
+    # Aliases for some of the keys in the results dict
+    _ALIASES = {'samples': 'solutions',
+                'occurrences': 'num_occurrences'}
+
+    def _alias_result(self, decoded_fields=None):
         """Create aliases for some of the keys in the results dict. Eventually,
         those will be renamed on the server side.
+
+        Aliases are created only for decoded fields (`decoded_fields`, by
+        default those already marked decoded).
         """
         if not self._result:
             return
 
-        aliases = {'samples': 'solutions',
-                   'occurrences': 'num_occurrences'}
-        for alias, original in aliases.items():
-            if original in self._result and alias not in self._result:
+        if decoded_fields is None:
+            decoded_fields = self._decoded_fields
+
+        for alias, original in self._ALIASES.items():
+            if (original in self._result and alias not in self._result
+                    and original in decoded_fields):
                 self._result[alias] = self._result[original]
 
         return self._result
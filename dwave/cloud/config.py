@@ -43,6 +43,19 @@ def parse_float(s):
     return float(s)
 
 
+def parse_boolean(s):
+    """Parse value as returned by ConfigParse as bool.
+
+    Accepts bool values unchanged, and strings like ``1``, ``yes``, ``true``,
+    ``on`` (case-insensitive) as True."""
+
+    if s is None or s == '':
+        return None
+    if isinstance(s, bool):
+        return s
+    return str(s).strip().lower() in ('1', 'yes', 'true', 'on')
+
+
 def get_configfile_paths(system=True, user=True, local=True, only_existing=True):
     """Return a list of local configuration file paths.
 
@@ -14,18 +14,48 @@ and select and return one with its :meth:`get_solver` method.
 
 from __future__ import division, absolute_import
 
-import json
 import logging
+import itertools
+import collections
+
+import six
+from six.moves import queue
 
 from dwave.cloud.exceptions import *
-from dwave.cloud.coders import encode_bqm_as_qp
+from dwave.cloud.coders import encode_arrays_as_qp
 from dwave.cloud.utils import uniform_iterator, uniform_get
 from dwave.cloud.computation import Future
 
-__all__ = ['Solver']
+# Use numpy if available for fast encoding
+try:
+    import numpy as np
+    _numpy = True
+except ImportError:  # pragma: no cover
+    _numpy = False
+
+__all__ = ['Solver', 'CompiledProblem', 'ProblemCheck']
 
 _LOGGER = logging.getLogger(__name__)
 
+# Reverse lookup indexes into the solver's encoding order of qubits/couplers:
+#  - qubits: qubit -> position in `_encoding_qubits`
+#  - couplers: (u, v) and (v, u) -> position in `_encoding_couplers`
+#  - adjacency: qubit -> list of (neighbor, coupler position)
+#  - coupler_qubits: numpy array of coupler endpoints' qubit positions,
+#    shape (num_couplers, 2), or None if numpy is not available
+#  - qubit_lookup: numpy array, qubit -> position (-1 for non-qubits), or None
+#  - coupler_keys, coupler_lookup: numpy arrays, sorted keys of coupler
+#    endpoints' positions ``pos(u) * num_qubits + pos(v)``, in both directions,
+#    and corresponding coupler positions, or None
+_EncodingIndex = collections.namedtuple(
+    '_EncodingIndex', ['qubits', 'couplers', 'adjacency', 'coupler_qubits',
+                       'qubit_lookup', 'coupler_keys', 'coupler_lookup'])
+
+#: Report of :meth:`Solver.check_problem`: `valid` is True if the problem
+#: matches the solver's graph; `qubits` and `couplers` list the linear and
+#: quadratic terms (with nonzero biases) off the graph, in order of input.
+ProblemCheck = collections.namedtuple('ProblemCheck', ['valid', 'qubits', 'couplers'])
+
 
 class Solver(object):
     """
@@ -99,6 +129,15 @@ class Solver(object):
         # When True the solution data will be returned as numpy matrices: False
         self.return_matrix = False
 
+        # Layout of the solution data, 'full', 'active' or bit-'packed': 'full'
+        self.samples_layout = 'full'
+
+        # NumPy dtypes of the result data, keyed by 'samples', 'energies' or 'occurrences': {}
+        self.result_dtypes = {}
+
+        # When True identical samples are collapsed, with summed occurrences: False
+        self.aggregate_samples = False
+
         # The exact sequence of nodes/edges is used in encoding problems and must be preserved
         try:
             self._encoding_qubits = self.properties['qubits']
@@ -106,19 +145,15 @@ class Solver(object):
             raise InvalidAPIResponseError("Missing solver property: 'properties.qubits'")
 
         try:
-            self._encoding_couplers = [tuple(edge) for edge in self.properties['couplers']]
+            self._coupler_data = self.properties['couplers']
         except KeyError:
             raise InvalidAPIResponseError("Missing solver property: 'properties.couplers'")
 
-        # The nodes in this solver's graph: set(int)
-        self.nodes = self.variables = set(self._encoding_qubits)
+        # Graph views (sets of nodes and edges, list of couplers), built on first use
+        self._nodes = self._edges = self._undirected_edges = self._couplers_cache = None
 
-        # The edges in this solver's graph, every edge will be present as (a, b) and (b, a): set(tuple(int, int))
-        self.edges = self.couplers = set(tuple(edge) for edge in self._encoding_couplers) | \
-            set((edge[1], edge[0]) for edge in self._encoding_couplers)
-
-        # The edges in this solver's graph, each edge will only be represented once: set(tuple(int, int))
-        self.undirected_edges = {edge for edge in self.edges if edge[0] < edge[1]}
+        # Reverse lookup indexes for encoding/checking problems, built on first use
+        self._encoding_index_cache = None
 
         # Create a set of default parameters for the queries
         self._params = {}
@@ -126,6 +161,80 @@ class Solver(object):
     def __repr__(self):
         return "Solver(id={!r})".format(self.id)
 
+    @property
+    def _encoding_couplers(self):
+        """The couplers in their encoding order: list(tuple(int, int))."""
+        if self._couplers_cache is None:
+            self._couplers_cache = [tuple(edge) for edge in self._coupler_data]
+        return self._couplers_cache
+
+    @property
+    def nodes(self):
+        """The nodes in this solver's graph: set(int)."""
+        if self._nodes is None:
+            self._nodes = set(self._encoding_qubits)
+        return self._nodes
+
+    variables = nodes
+
+    @property
+    def edges(self):
+        """The edges in this solver's graph, every edge will be present as (a, b)
+        and (b, a): set(tuple(int, int))."""
+        if self._edges is None:
+            couplers = self._encoding_couplers
+            self._edges = set(couplers) | set((v, u) for u, v in couplers)
+        return self._edges
+
+    couplers = edges
+
+    @property
+    def undirected_edges(self):
+        """The edges in this solver's graph, each edge will only be represented
+        once: set(tuple(int, int))."""
+        if self._undirected_edges is None:
+            self._undirected_edges = set(
+                (u, v) if u < v else (v, u) for u, v in self._encoding_couplers if u != v)
+        return self._undirected_edges
+
+    @property
+    def _encoding_index(self):
+        """Reverse lookup indexes into `_encoding_qubits` and `_encoding_couplers`.
+
+        Built once, on first use, so that encoding and checking a problem cost
+        time proportional to the number of problem terms, not the graph size.
+        """
+        if self._encoding_index_cache is None:
+            qubits = {qubit: pos for pos, qubit in enumerate(self._encoding_qubits)}
+            couplers = {}
+            adjacency = {qubit: [] for qubit in self._encoding_qubits}
+            for pos, (u, v) in enumerate(self._encoding_couplers):
+                couplers[(u, v)] = couplers[(v, u)] = pos
+                adjacency.setdefault(u, []).append((v, pos))
+                adjacency.setdefault(v, []).append((u, pos))
+
+            coupler_qubits = qubit_lookup = coupler_keys = coupler_lookup = None
+            if _numpy:
+                coupler_qubits = np.array(
+                    [(qubits[u], qubits[v]) for u, v in self._encoding_couplers],
+                    dtype=np.int64).reshape(-1, 2)
+
+                labels = np.array(self._encoding_qubits, dtype=np.int64)
+                qubit_lookup = np.full(labels.max() + 1 if labels.size else 0, -1, dtype=np.int64)
+                qubit_lookup[labels] = np.arange(labels.size)
+
+                u, v = coupler_qubits.T
+                keys = np.concatenate((u * labels.size + v, v * labels.size + u))
+                order = np.argsort(keys, kind='mergesort')
+                coupler_keys = keys[order]
+                coupler_lookup = np.tile(np.arange(len(u)), 2)[order]
+
+            self._encoding_index_cache = _EncodingIndex(
+                qubits, couplers, adjacency, coupler_qubits,
+                qubit_lookup, coupler_keys, coupler_lookup)
+
+        return self._encoding_index_cache
+
     @property
     def is_qpu(self):
         "Is this a QPU-based solver?"
@@ -146,7 +255,8 @@ class Solver(object):
     @property
     def num_qubits(self):
         "The number of active (encoding) qubits."
-        return len(self.nodes)
+        # note: counted without building the graph views (:attr:`nodes`)
+        return len(self._encoding_qubits)
 
     @property
     def has_flux_biases(self):
@@ -230,6 +340,212 @@ class Solver(object):
         quadratic = {(i1, i2): v for (i1, i2), v in uniform_iterator(qubo) if i1 != i2}
         return self._sample('qubo', linear, quadratic, params)
 
+    def sample_ising_arrays(self, h, J, **params):
+        """Sample from the specified Ising model, given as NumPy arrays.
+
+        Problem terms are aligned with the solver's qubits and couplers, so
+        they are checked and encoded without per-term Python work.
+
+        Args:
+            h (array-like): Linear terms, one per qubit, aligned with
+                ``properties['qubits']``. Qubits with a NaN bias are inactive
+                (not sampled).
+            J (array-like/tuple): Quadratic terms, one per coupler, aligned with
+                ``properties['couplers']``, or in COO form, as a tuple of arrays
+                ``(row, col, bias)`` of qubits and biases (repeated couplers
+                are summed).
+            **params: Parameters for the sampling method, specified per solver.
+
+        Returns:
+            :obj:`Future`
+
+        Examples:
+            This example submits an Ising problem with a random bias on each
+            qubit, and coupling strength of -1 on every coupler.
+
+            >>> import numpy as np
+            >>> from dwave.cloud import Client
+            >>> with Client.from_config() as client:  # doctest: +SKIP
+            ...     solver = client.get_solver()
+            ...     h = np.random.uniform(-1, 1, len(solver.properties['qubits']))
+            ...     J = -np.ones(len(solver.properties['couplers']))
+            ...     computation = solver.sample_ising_arrays(h, J, num_reads=5)
+        """
+        h, J = self._check_problem_arrays('ising', h, J)
+        return self._sample_arrays('ising', h, J, params)
+
+    def sample_qubo_arrays(self, linear, quadratic, **params):
+        """Sample from the specified QUBO, given as NumPy arrays.
+
+        Args:
+            linear (array-like): Diagonal terms, one per qubit, aligned with
+                ``properties['qubits']``. Qubits with a NaN bias are inactive
+                (not sampled).
+            quadratic (array-like/tuple): Off-diagonal terms, one per coupler,
+                aligned with ``properties['couplers']``, or in COO form, as a
+                tuple of arrays ``(row, col, bias)`` of qubits and biases
+                (repeated terms are summed, diagonal terms are added to
+                `linear`).
+            **params: Parameters for the sampling method, specified per solver.
+
+        Returns:
+            :obj:`Future`
+        """
+        linear, quadratic = self._check_problem_arrays('qubo', linear, quadratic)
+        return self._sample_arrays('qubo', linear, quadratic, params)
+
+    def sample_ising_batch(self, problems, params=None, **shared_params):
+        """Sample from many Ising models at once.
+
+        All problems and parameters are checked, and all problems encoded,
+        before any is submitted. Problems are then enqueued together, in
+        batches of problems submitted in a single request.
+
+        Args:
+            problems (iterable[tuple]): Ising models, as ``(linear, quadratic)``
+                pairs of terms (see :meth:`sample_ising`).
+            params (list[dict], default=None): Parameters for each problem,
+                overriding `shared_params`.
+            **shared_params: Parameters for the sampling method common to all
+                problems.
+
+        Returns:
+            list[:obj:`Future`]: one per problem, in order.
+
+        Raises:
+            ValueError: if a problem is incompatible with the solver, or the
+                number of problems and per-problem parameters differ.
+            KeyError: on an unknown parameter.
+
+        Examples:
+            This example submits 100 Ising problems with random linear biases,
+            and 10 reads each.
+
+            >>> import random
+            >>> from dwave.cloud import Client
+            >>> with Client.from_config() as client:  # doctest: +SKIP
+            ...     solver = client.get_solver()
+            ...     problems = [({q: random.uniform(-1, 1) for q in solver.nodes}, {})
+            ...                 for _ in range(100)]
+            ...     computations = solver.sample_ising_batch(problems, num_reads=10)
+        """
+        return self._sample_batch('ising', problems, params, shared_params)
+
+    def sample_qubo_batch(self, qubos, params=None, **shared_params):
+        """Sample from many QUBOs at once (see :meth:`sample_ising_batch`).
+
+        Args:
+            qubos (iterable[dict]): QUBO coefficients (see :meth:`sample_qubo`).
+            params (list[dict], default=None): Parameters for each problem,
+                overriding `shared_params`.
+            **shared_params: Parameters for the sampling method common to all
+                problems.
+
+        Returns:
+            list[:obj:`Future`]: one per problem, in order.
+        """
+        problems = []
+        for qubo in qubos:
+            linear = {i1: v for (i1, i2), v in uniform_iterator(qubo) if i1 == i2}
+            quadratic = {(i1, i2): v for (i1, i2), v in uniform_iterator(qubo) if i1 != i2}
+            problems.append((linear, quadratic))
+        return self._sample_batch('qubo', problems, params, shared_params)
+
+    def map(self, problems, window=100, ordered=True, problem_type='ising', **params):
+        """Sample from a stream of problems, keeping a bounded number in flight.
+
+        Problems are pulled from `problems` lazily: at most `window` problems
+        are submitted and not yet yielded at any time, so memory use does not
+        grow with the number of problems. The window is topped up as results
+        are consumed, whenever a submit request's worth of slots (or half the
+        window, if smaller) are free, so problems stay in flight while
+        results are processed.
+
+        Args:
+            problems (iterable): Ising models, as ``(linear, quadratic)`` pairs
+                (see :meth:`sample_ising`), or QUBOs (see :meth:`sample_qubo`)
+                for `problem_type` 'qubo'.
+            window (int, default=100): Maximal number of problems in flight.
+            ordered (bool, default=True): Yield results in order of the
+                problems. Otherwise, results are yielded as they complete.
+            problem_type (str, default='ising'): 'ising' or 'qubo'.
+            **params: Parameters for the sampling method, common to all problems.
+
+        Yields:
+            :obj:`Future`: resolved futures, one per problem.
+
+        Note:
+            Problems still in flight when the generator is closed (or garbage
+            collected) are cancelled.
+
+        Examples:
+            This example samples one million random Ising problems, with at
+            most 1000 in flight, and finds the lowest energy.
+
+            >>> import random
+            >>> from dwave.cloud import Client
+            >>> with Client.from_config() as client:  # doctest: +SKIP
+            ...     solver = client.get_solver()
+            ...     problems = (({q: random.uniform(-1, 1) for q in solver.nodes}, {})
+            ...                 for _ in range(10**6))
+            ...     results = solver.map(problems, window=1000, ordered=False, num_reads=10)
+            ...     print(min(min(result.energies) for result in results))
+        """
+        if problem_type == 'ising':
+            sample_batch = self.sample_ising_batch
+        elif problem_type == 'qubo':
+            sample_batch = self.sample_qubo_batch
+        else:
+            raise ValueError("Unknown problem type: {!r}".format(problem_type))
+
+        window = int(window)
+        if window < 1:
+            raise ValueError("Window should be a positive integer, got {}".format(window))
+
+        problems = iter(problems)
+
+        # Futures in flight, in order of submission, or (unordered) as a set,
+        # with completed futures queued by notifiers added on submission
+        in_flight = collections.deque() if ordered else set()
+        completed = queue.Queue()
+
+        # Free slots are filled once there are enough of them for a full
+        # submit request (not one by one, as results are consumed), or half
+        # the window is free, for windows smaller than two requests
+        low_water = max(1, min(self.client._SUBMIT_BATCH_SIZE, window // 2))
+
+        try:
+            while True:
+                free = window - len(in_flight)
+                if free >= low_water:
+                    batch = list(itertools.islice(problems, free))
+                    if batch:
+                        futures = sample_batch(batch, **params)
+                        if ordered:
+                            in_flight.extend(futures)
+                        else:
+                            for future in futures:
+                                future._add_event(_CompletionNotifier(future, completed))
+                            in_flight.update(futures)
+                if not in_flight:
+                    break
+
+                if ordered:
+                    future = in_flight.popleft()
+                    future.wait()
+                else:
+                    # notifiers might fire twice, on a race with completion
+                    future = completed.get()
+                    while future not in in_flight:
+                        future = completed.get()
+                    in_flight.remove(future)
+
+                yield future
+
+        finally:
+            for future in in_flight:
+                future.cancel()
+
     def _sample(self, type_, linear, quadratic, params):
         """Internal method for both sample_ising and sample_qubo.
 
@@ -245,39 +561,124 @@ class Solver(object):
         if not self.check_problem(linear, quadratic):
             raise ValueError("Problem graph incompatible with solver.")
 
+        data = self.client.encoding_cache.encode(self, linear, quadratic)
+        return self._submit_encoded(type_, data, (type_, linear, quadratic, params), params)
+
+    def _sample_arrays(self, type_, linear, quadratic, params):
+        """Internal method for both sample_ising_arrays and sample_qubo_arrays,
+        with problem arrays already checked and aligned."""
+        data = encode_arrays_as_qp(self, linear, quadratic)
+        return self._submit_encoded(type_, data, (type_, linear, quadratic, params), params)
+
+    def _submit_encoded(self, type_, data, submission_data, params):
+        """Submit an encoded problem.
+
+        Args:
+            type_ (str): Problem type, 'ising' or 'qubo'.
+            data (dict): Problem data, as encoded by
+                :func:`~dwave.cloud.coders.encode_bqm_as_qp`.
+            submission_data (tuple): Problem, as submitted.
+            params (dict): Parameters for the sampling method.
+
+        Returns:
+            :obj: `Future`
+        """
+        self._check_params(params)
+        body = self._encode_body(type_, data, params)
+        future = self._new_future(submission_data)
+
+        _LOGGER.debug("Submitting new problem to: %s", self.id)
+        self.client._submit(body, future)
+        return future
+
+    def _check_params(self, params):
+        """Check sampling parameters, mixed with the default parameters, are
+        accepted by the solver.
+
+        Raises:
+            KeyError: on the first unknown parameter.
+        """
         # Mix the new parameters with the default parameters
         combined_params = dict(self._params)
         combined_params.update(params)
 
-        # Check the parameters before submitting
         for key in combined_params:
             if key not in self.parameters and not key.startswith('x_'):
                 raise KeyError("{} is not a parameter of this solver.".format(key))
 
-        body = json.dumps({
+    def _encode_body(self, type_, data, params):
+        """Encode a sample request, for :meth:`Client._submit`."""
+        body = self.client.json_codec.dumps({
             'solver': self.id,
-            'data': encode_bqm_as_qp(self, linear, quadratic),
+            'data': data,
             'type': type_,
             'params': params
         })
         _LOGGER.trace("Encoded sample request: %s", body)
-
-        future = Future(solver=self, id_=None, return_matrix=self.return_matrix,
-                        submission_data=(type_, linear, quadratic, params))
-
-        _LOGGER.debug("Submitting new problem to: %s", self.id)
-        self.client._submit(body, future)
-        return future
-
-    def check_problem(self, linear, quadratic):
+        return body
+
+    def _new_future(self, submission_data):
+        """Create a future for a problem submitted to this solver."""
+        return Future(solver=self, id_=None, return_matrix=self.return_matrix,
+                      submission_data=submission_data,
+                      samples_layout=self.samples_layout,
+                      result_dtypes=self.result_dtypes,
+                      aggregate_samples=self.aggregate_samples,
+                      process_decoder=self.client.process_decoder,
+                      result_store=self.client.result_store)
+
+    def _sample_batch(self, type_, problems, params, shared_params):
+        """Internal method for both sample_ising_batch and sample_qubo_batch."""
+        problems = list(problems)
+        if params is None:
+            params = [shared_params] * len(problems)
+        else:
+            params = list(params)
+            if len(params) != len(problems):
+                raise ValueError("Got {} problems, but parameters for {}".format(
+                    len(problems), len(params)))
+            if shared_params:
+                params = [dict(shared_params, **problem_params) for problem_params in params]
+
+        # Check everything first, parameters once per distinct set of names
+        checked = set()
+        for index, ((linear, quadratic), problem_params) in enumerate(zip(problems, params)):
+            names = frozenset(problem_params)
+            if names not in checked:
+                self._check_params(problem_params)
+                checked.add(names)
+            if not self.check_problem(linear, quadratic):
+                raise ValueError(
+                    "Problem graph incompatible with solver (problem {}).".format(index))
+
+        encode = self.client.encoding_cache.encode
+        messages = []
+        for (linear, quadratic), problem_params in zip(problems, params):
+            data = encode(self, linear, quadratic)
+            future = self._new_future((type_, linear, quadratic, problem_params))
+            messages.append(self.client._submit.Message(
+                self._encode_body(type_, data, problem_params), future))
+
+        _LOGGER.debug("Submitting %d new problems to: %s", len(messages), self.id)
+        self.client._submit_many(messages)
+        return [message.future for message in messages]
+
+    def check_problem(self, linear, quadratic, report=False):
         """Test if an Ising model matches the graph provided by the solver.
 
+        Terms are checked all at once, against the solver's (sorted) coupler
+        index, if NumPy is available and qubits are labelled with integers.
+
         Args:
-            linear (list/dict): Linear terms of the model (h).
-            quadratic (dict of (int, int):float): Quadratic terms of the model (J).
+            linear (list/array/dict): Linear terms of the model (h), dense
+                (indexed by qubit) or sparse.
+            quadratic (dict of (int, int):float/tuple): Quadratic terms of the
+                model (J), as a dict, or as COO arrays ``(rows, cols, biases)``.
+            report (bool, default=False): Return a :class:`ProblemCheck` report
+                of terms off the solver's graph, instead of a boolean.
 
         Returns:
-            boolean
+            boolean/:class:`ProblemCheck`
 
         Examples:
             This example creates a client using the local system's default D-Wave Cloud Client
@@ -295,17 +696,172 @@ class Solver(object):
             ...     solver = client.get_solver()
             ...     print(solver.check_problem({0: -1, 1: 1},{(0, 1):0.5}))
             ...     print(solver.check_problem({0: -1, 4: 1},{(0, 4):0.5}))
+            ...     print(solver.check_problem({0: -1, 1: 1},{(0, 1):0.5}, report=True))
             ...
             False
             True
+            ProblemCheck(valid=False, qubits=[], couplers=[(0, 1)])
+        """
+        qubits = self._check_linear(linear)
+        couplers = self._check_quadratic(quadratic)
+        check = ProblemCheck(not qubits and not couplers, qubits, couplers)
+        return check if report else check.valid
+
+    def _check_linear(self, linear):
+        """Helper for check_problem, returns qubits with nonzero biases off
+        the solver's graph."""
+        index = self._encoding_index
+
+        if isinstance(linear, dict):
+            # hashed lookup of all labels at once, then filter the few left
+            missing = six.viewkeys(linear) - six.viewkeys(index.qubits)
+            return [key for key in linear if key in missing and linear[key] != 0]
+
+        terms = _term_arrays(linear, 1) if _numpy else None
+        if terms is not None:
+            (qubits, ), biases = terms
+            return qubits[(biases != 0) & (self._qubit_positions(qubits) < 0)].tolist()
+
+        return [key for key, value in uniform_iterator(linear)
+                if value != 0 and key not in index.qubits]
+
+    def _check_quadratic(self, quadratic):
+        """Helper for check_problem, returns couplers with nonzero biases off
+        the solver's graph."""
+        index = self._encoding_index
+
+        if isinstance(quadratic, dict):
+            # hashed lookup of all labels at once, then filter the few left
+            missing = six.viewkeys(quadratic) - six.viewkeys(index.couplers)
+            return [tuple(key) for key in quadratic if key in missing
+                    and quadratic[key] != 0 and tuple(key) not in index.couplers]
+
+        terms = _term_arrays(quadratic, 2) if _numpy else None
+        if terms is not None:
+            # membership in the sorted index of coupler keys
+            (rows, cols), biases = terms
+            u, v = self._qubit_positions(rows), self._qubit_positions(cols)
+            valid = (u >= 0) & (v >= 0)
+            valid[valid] = np.isin(u[valid] * len(self._encoding_qubits) + v[valid],
+                                   index.coupler_keys)
+            invalid = (biases != 0) & ~valid
+            return list(zip(rows[invalid].tolist(), cols[invalid].tolist()))
+
+        rows, cols, biases = quadratic
+        return [(u, v) for u, v, value in zip(rows, cols, biases)
+                if value != 0 and (u, v) not in index.couplers]
+
+    def _check_problem_arrays(self, type_, linear, quadratic):
+        """Check a problem given as arrays (see :meth:`sample_ising_arrays`)
+        matches the solver's graph, and align it with the solver's qubits and
+        couplers.
+
+        Returns:
+            tuple: dense linear and quadratic terms, as double arrays.
+
+        Raises:
+            ValueError: if the problem is incompatible with the solver.
         """
-        for key, value in uniform_iterator(linear):
-            if value != 0 and key not in self.nodes:
-                return False
-        for key, value in uniform_iterator(quadratic):
-            if value != 0 and tuple(key) not in self.edges:
-                return False
-        return True
+        if not _numpy:
+            raise ValueError("Array problems require numpy.")
+
+        index = self._encoding_index
+        num_qubits = len(self._encoding_qubits)
+        num_couplers = len(self._encoding_couplers)
+
+        linear = np.asarray(linear, dtype=np.float64)
+        if linear.shape != (num_qubits,):
+            raise ValueError("Expected {} linear terms (one per qubit), got an array "
+                             "of shape {}".format(num_qubits, linear.shape))
+
+        if isinstance(quadratic, tuple):
+            rows, cols, biases = (np.asarray(array).ravel() for array in quadratic)
+            biases = biases.astype(np.float64)
+            if not rows.size == cols.size == biases.size:
+                raise ValueError("COO arrays of quadratic terms differ in length")
+
+            # Terms with zero bias don't need to be on the solver's graph
+            nonzero = biases != 0
+            rows, cols, biases = rows[nonzero], cols[nonzero], biases[nonzero]
+            u, v = self._qubit_positions(rows), self._qubit_positions(cols)
+            if (u < 0).any() or (v < 0).any():
+                raise ValueError("Problem graph incompatible with solver.")
+
+            diagonal = u == v
+            if diagonal.any():
+                if type_ != 'qubo':
+                    raise ValueError("Quadratic terms of an Ising model can't be on the diagonal.")
+                linear = linear.copy()
+                np.add.at(linear, u[diagonal], biases[diagonal])
+                u, v, biases = u[~diagonal], v[~diagonal], biases[~diagonal]
+
+            keys = u * num_qubits + v
+            found = np.searchsorted(index.coupler_keys, keys)
+            valid = found < len(index.coupler_keys)
+            valid[valid] = index.coupler_keys[found[valid]] == keys[valid]
+            if not valid.all():
+                raise ValueError("Problem graph incompatible with solver.")
+
+            quadratic = np.zeros(num_couplers, dtype=np.float64)
+            np.add.at(quadratic, index.coupler_lookup[found], biases)
+        else:
+            quadratic = np.asarray(quadratic, dtype=np.float64)
+            if quadratic.shape != (num_couplers,):
+                raise ValueError("Expected {} quadratic terms (one per coupler), got an array "
+                                 "of shape {}".format(num_couplers, quadratic.shape))
+
+        # Couplers are active only between active qubits
+        inactive = np.isnan(linear)
+        if inactive.any():
+            u, v = index.coupler_qubits.T
+            if (quadratic[inactive[u] | inactive[v]] != 0).any():
+                raise ValueError("Quadratic terms on couplers of inactive (NaN) qubits.")
+
+        return linear, quadratic
+
+    def _qubit_positions(self, qubits):
+        """Positions of `qubits` (an integer array) in the solver's encoding
+        order, -1 for non-qubits."""
+        lookup = self._encoding_index.qubit_lookup
+        qubits = np.asarray(qubits, dtype=np.int64)
+        positions = np.full(qubits.shape, -1, dtype=np.int64)
+        valid = (qubits >= 0) & (qubits < len(lookup))
+        positions[valid] = lookup[qubits[valid]]
+        return positions
+
+    def compile(self, linear_keys, quadratic_keys):
+        """Compile a problem structure, for repeated submission with varying
+        biases or parameters.
+
+        The structure is checked against the solver's graph once, and the
+        positions of terms in the encoded problem are precomputed, so that
+        submitting the compiled problem costs one vectorized fill and base64
+        encoding.
+
+        Args:
+            linear_keys (iterable): Qubits of the linear terms.
+            quadratic_keys (iterable of (int, int)): Couplers of the quadratic terms.
+
+        Returns:
+            :class:`CompiledProblem`
+
+        Raises:
+            ValueError: if the structure is incompatible with the solver.
+
+        Examples:
+            This example sweeps the strength of a ferromagnetic coupling.
+
+            >>> from dwave.cloud import Client
+            >>> with Client.from_config() as client:  # doctest: +SKIP
+            ...     solver = client.get_solver()
+            ...     u, v = next(iter(solver.edges))
+            ...     problem = solver.compile([u, v], [(u, v)])
+            ...     problem.update(linear={u: 1, v: 1})
+            ...     for strength in [0.25, 0.5, 1]:
+            ...         problem.update(quadratic={(u, v): -strength})
+            ...         computation = problem.sample_ising(num_reads=10)
+        """
+        return CompiledProblem(self, linear_keys, quadratic_keys)
 
     def _retrieve_problem(self, id_):
         """Resume polling for a problem previously submitted.
@@ -316,6 +872,189 @@ class Solver(object):
         Returns:
             :obj: `Future`
         """
-        future = Future(self, id_, self.return_matrix, None)
+        future = Future(self, id_, self.return_matrix, None,
+                        samples_layout=self.samples_layout,
+                        result_dtypes=self.result_dtypes,
+                        aggregate_samples=self.aggregate_samples,
+                        process_decoder=self.client.process_decoder,
+                        result_store=self.client.result_store)
         self.client._poll(future)
         return future
+
+
+class CompiledProblem(object):
+    """Problem structure compiled for a solver, see :meth:`Solver.compile`.
+
+    Biases are kept in arrays aligned with the keys given on compilation,
+    :attr:`linear` and :attr:`quadratic` (all zero initially). They can be
+    set in bulk with :meth:`set_biases`, patched with :meth:`update`, or
+    modified in place, between submissions. Requires numpy.
+
+    Args:
+        solver (:class:`Solver`): Solver the problem is compiled for.
+        linear_keys (iterable): Qubits of the linear terms.
+        quadratic_keys (iterable of (int, int)): Couplers of the quadratic terms.
+
+    Attributes:
+        linear (:class:`numpy.ndarray`): Linear biases, one per linear key.
+        quadratic (:class:`numpy.ndarray`): Quadratic biases, one per quadratic key.
+    """
+
+    def __init__(self, solver, linear_keys, quadratic_keys):
+        if not _numpy:
+            raise ValueError("Compiled problems require numpy.")
+
+        self.solver = solver
+        self.linear_keys = list(linear_keys)
+        self.quadratic_keys = [tuple(key) for key in quadratic_keys]
+
+        index = solver._encoding_index
+        try:
+            linear_positions = [index.qubits[qubit] for qubit in self.linear_keys]
+            coupler_positions = [index.couplers[key] for key in self.quadratic_keys]
+        except KeyError:
+            raise ValueError("Problem graph incompatible with solver.")
+        self._linear_positions = np.array(linear_positions, dtype=np.int64)
+
+        # Active qubits are marked in the template of the linear buffer with
+        # 0 (biases are added on encoding), inactive qubits with NaN
+        num_qubits = len(solver._encoding_qubits)
+        active = np.zeros(num_qubits, dtype=bool)
+        active[self._linear_positions] = True
+        for u, v in self.quadratic_keys:
+            active[index.qubits[u]] = active[index.qubits[v]] = True
+        self._linear_template = np.where(active, 0.0, np.nan)
+
+        # Position of each quadratic term among the encoded (active) couplers
+        u, v = index.coupler_qubits.T
+        active_couplers = active[u] & active[v]
+        slots = np.cumsum(active_couplers) - 1
+        self._quadratic_slots = slots[np.array(coupler_positions, dtype=np.int64)]
+        self._num_active_couplers = int(active_couplers.sum())
+
+        self.linear = np.zeros(len(self.linear_keys), dtype=np.float64)
+        self.quadratic = np.zeros(len(self.quadratic_keys), dtype=np.float64)
+
+        # Key lookups for `update`, built on first use
+        self._linear_index = None
+        self._quadratic_index = None
+
+    def __repr__(self):
+        return "CompiledProblem(solver={!r}, num_linear={}, num_quadratic={})".format(
+            self.solver.id, len(self.linear_keys), len(self.quadratic_keys))
+
+    def set_biases(self, linear=None, quadratic=None):
+        """Replace all linear and/or quadratic biases.
+
+        Args:
+            linear (array-like, optional): Linear biases, aligned with `linear_keys`.
+            quadratic (array-like, optional): Quadratic biases, aligned with `quadratic_keys`.
+        """
+        if linear is not None:
+            linear = np.asarray(linear, dtype=np.float64)
+            if linear.shape != self.linear.shape:
+                raise ValueError("Expected {} linear biases, got an array of shape {}".format(
+                    len(self.linear), linear.shape))
+            self.linear[:] = linear
+        if quadratic is not None:
+            quadratic = np.asarray(quadratic, dtype=np.float64)
+            if quadratic.shape != self.quadratic.shape:
+                raise ValueError("Expected {} quadratic biases, got an array of shape {}".format(
+                    len(self.quadratic), quadratic.shape))
+            self.quadratic[:] = quadratic
+
+    def update(self, linear=None, quadratic=None):
+        """Patch some of the biases.
+
+        Args:
+            linear (dict, optional): New biases of linear terms, keyed by qubit.
+            quadratic (dict, optional): New biases of quadratic terms, keyed by
+                coupler, in either direction.
+
+        Raises:
+            KeyError: if a term is not part of the compiled structure.
+        """
+        if linear:
+            if self._linear_index is None:
+                self._linear_index = {key: i for i, key in enumerate(self.linear_keys)}
+            for key, bias in uniform_iterator(linear):
+                self.linear[self._linear_index[key]] = bias
+        if quadratic:
+            if self._quadratic_index is None:
+                # the first term of each coupler is updated, in either direction
+                self._quadratic_index = {}
+                for i, (u, v) in reversed(list(enumerate(self.quadratic_keys))):
+                    self._quadratic_index[(u, v)] = self._quadratic_index[(v, u)] = i
+            for key, bias in uniform_iterator(quadratic):
+                self.quadratic[self._quadratic_index[tuple(key)]] = bias
+
+    def encode(self):
+        """Encode the problem with current biases, like
+        :func:`~dwave.cloud.coders.encode_bqm_as_qp`."""
+        linear = self._linear_template + np.bincount(
+            self._linear_positions, weights=self.linear, minlength=len(self._linear_template))
+        quadratic = np.bincount(
+            self._quadratic_slots, weights=self.quadratic, minlength=self._num_active_couplers)
+        return encode_arrays_as_qp(self.solver, linear, quadratic, active_couplers=True)
+
+    def sample_ising(self, **params):
+        """Sample from the Ising model with current biases.
+
+        Args:
+            **params: Parameters for the sampling method, specified per solver.
+
+        Returns:
+            :obj:`Future`
+        """
+        return self._sample('ising', params)
+
+    def sample_qubo(self, **params):
+        """Sample from the QUBO with current biases, linear biases being
+        the diagonal terms.
+
+        Args:
+            **params: Parameters for the sampling method, specified per solver.
+
+        Returns:
+            :obj:`Future`
+        """
+        return self._sample('qubo', params)
+
+    def _sample(self, type_, params):
+        submission_data = (type_, self.linear.copy(), self.quadratic.copy(), params)
+        return self.solver._submit_encoded(type_, self.encode(), submission_data, params)
+
+
+def _term_arrays(terms, order):
+    """Helper for Solver.check_problem, converts dense linear (`order` 1) or
+    COO quadratic (`order` 2) terms to a list of arrays of labels, and an
+    array of biases.
+
+    Linear terms are always dense, tuples included (as for encoding).
+
+    Returns None if labels are not integers.
+    """
+    if order == 2 and isinstance(terms, tuple):
+        labels = [np.asarray(array).ravel() for array in terms[:-1]]
+        biases = np.asarray(terms[-1]).ravel()
+    else:
+        biases = np.asarray(terms).ravel()
+        labels = [np.arange(len(biases))]
+
+    if len(labels) != order or any(array.dtype.kind not in 'iu' for array in labels):
+        return None
+    return [array.astype(np.int64, copy=False) for array in labels], biases
+
+
+class _CompletionNotifier(object):
+    """Helper for :meth:`Solver.map`, added to a future's completion events,
+    puts the future in a `queue` once completed."""
+
+    __slots__ = ('future', 'queue')
+
+    def __init__(self, future, queue):
+        self.future = future
+        self.queue = queue
+
+    def set(self):
+        self.queue.put(self.future)
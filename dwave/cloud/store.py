@@ -0,0 +1,511 @@
+"""Disk-backed storage of decoded problem results.
+
+Decoded answer arrays are appended to large, memory-mapped segment files, and
+replaced with read-only views, so that resident memory does not grow with the
+number of results held (see :class:`ResultStore`).
+
+Results of many problems are exported to a single compressed, columnar
+archive with :func:`export_results`, and read back with :class:`ResultArchive`.
+
+Solver definitions fetched from the API are cached on disk, per endpoint and
+token, with :class:`SolverCache`.
+"""
+
+from __future__ import absolute_import
+
+import io
+import os
+import time
+import json
+import shutil
+import hashlib
+import zipfile
+import logging
+import tempfile
+import threading
+
+import six
+import homebase
+
+from dwave.cloud.config import CONF_AUTHOR, CONF_APP
+from dwave.cloud.utils import gzip_compress, gzip_decompress
+
+# Use numpy if available for memory-mapped results
+try:
+    import numpy as np
+    _numpy = True
+except ImportError:  # pragma: no cover
+    _numpy = False
+
+__all__ = ['ResultStore', 'export_results', 'ResultArchive', 'SolverCache']
+
+_LOGGER = logging.getLogger(__name__)
+
+# Columns of an exported archive with one row per sample, written in chunks
+_SAMPLE_COLUMNS = ('samples', 'energies', 'occurrences')
+
+
+class ResultStore(object):
+    """Store of decoded answer arrays in a directory, in memory-mapped segment
+    files.
+
+    Arrays are appended to large, preallocated segment files, and replaced
+    with read-only views of the mapped segments, so the number of open files
+    and mappings depends on the total size of results stored, not on their
+    number. Arrays smaller than `min_size` are cheaper to keep in memory, and
+    are not stored.
+
+    Requires NumPy.
+
+    Args:
+        directory (str, default=None):
+            Directory for segment files, created if necessary. Files written
+            to a given directory are kept. By default, a temporary directory
+            is created, and removed on :meth:`close`.
+
+        segment_size (int, default=2**28):
+            Size (in bytes) of segment files. Files are sparse where
+            supported, so unused space is not allocated on disk. Arrays larger
+            than a segment are stored in a segment of their own.
+
+        min_size (int, default=2**16):
+            Minimal size (in bytes) of arrays stored by :meth:`spill`.
+
+    Examples:
+        >>> from dwave.cloud import Client
+        >>> with Client.from_config(result_store='/tmp/results') as client:   # doctest: +SKIP
+        ...     solver = client.get_solver()
+        ...     solver.return_matrix = True
+        ...     samples = solver.sample_ising({0: 1}, {}, num_reads=10000).samples   # memory-mapped
+    """
+
+    # Alignment (in bytes) of arrays in segments
+    _ALIGNMENT = 64
+
+    def __init__(self, directory=None, segment_size=2**28, min_size=2**16):
+        if not _numpy:
+            raise ValueError("Result store requested without numpy.")
+
+        self._temporary = directory is None
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix='dwave-cloud-results-')
+        elif not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self.directory = directory
+        self.segment_size = int(segment_size)
+        self.min_size = int(min_size)
+        self._lock = threading.Lock()
+        self.closed = False
+
+        # current segment (arrays are appended to), and offset of its free space
+        self._segment = None
+        self._offset = 0
+
+    def _new_segment(self, size):
+        """Create a segment file of `size` bytes, and map it."""
+        fd, path = tempfile.mkstemp(prefix='segment.', suffix='.bin', dir=self.directory)
+        try:
+            # sized by writing its last byte (os.ftruncate is not available
+            # everywhere), leaving the file sparse where supported
+            if size:
+                os.lseek(fd, size - 1, os.SEEK_SET)
+                os.write(fd, b'\0')
+        finally:
+            os.close(fd)
+        return np.memmap(path, dtype=np.uint8, mode='r+', shape=(size,))
+
+    def _allocate(self, size):
+        """Reserve `size` bytes in a segment, returns the segment and offset."""
+        with self._lock:
+            if self.closed:
+                raise ValueError("Result store is closed.")
+
+            if size > self.segment_size:
+                return self._new_segment(size), 0
+
+            offset = -(-self._offset // self._ALIGNMENT) * self._ALIGNMENT
+            if self._segment is None or offset + size > self.segment_size:
+                self._segment = self._new_segment(self.segment_size)
+                offset = 0
+            self._offset = offset + size
+            return self._segment, offset
+
+    def save(self, array):
+        """Copy `array` into a segment file.
+
+        Args:
+            array (:class:`numpy.ndarray`): Array to store.
+
+        Returns:
+            :class:`numpy.memmap`: read-only, memory-mapped view of the saved array.
+        """
+        array = np.ascontiguousarray(array)
+        segment, offset = self._allocate(array.nbytes)
+
+        # reserved regions don't overlap, arrays are copied without the lock
+        view = segment[offset:offset + array.nbytes].view(array.dtype).reshape(array.shape)
+        view[...] = array
+        view.setflags(write=False)
+        return view
+
+    def spill(self, answer):
+        """Replace the in-memory arrays of decoded `answer` with memory-mapped
+        views of saved arrays, in place.
+
+        Fields already memory-mapped, smaller than `min_size`, and decoded
+        into lists (or packed samples), are left as is.
+
+        Args:
+            answer (dict): Decoded answer, as returned by
+                :func:`~dwave.cloud.coders.decode_qp_numpy`.
+
+        Returns:
+            dict: `answer`
+        """
+        for field, value in list(answer.items()):
+            if (isinstance(value, np.ndarray) and not isinstance(value, np.memmap)
+                    and value.nbytes >= self.min_size):
+                answer[field] = self.save(value)
+        return answer
+
+    def close(self):
+        """Stop accepting results, and remove the temporary directory (if
+        created by the store).
+
+        Memory-mapped views remain valid until released on platforms that
+        allow removal of open files. Elsewhere (e.g. on Windows), results must
+        be released before the store is closed, otherwise the directory is
+        left in place, and a warning is logged.
+        """
+        with self._lock:
+            self.closed = True
+            self._segment = None
+        if self._temporary:
+            try:
+                shutil.rmtree(self.directory)
+            except OSError as exc:
+                _LOGGER.warning("Result store directory %r not removed: %s",
+                                self.directory, exc)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def export_results(futures, path, chunk_size=2**24, compress=True):
+    """Export results of many problems to a single columnar archive.
+
+    Samples, energies and occurrences of all problems are concatenated into
+    columns, written in chunks of about `chunk_size` sample values, so
+    memory use is bounded by the chunk size (and the results themselves).
+    Problem ids and timing are written as columns with one row per problem.
+
+    The archive is a (``.npz``) zip file of ``.npy`` arrays, see
+    :class:`ResultArchive` for a reader. Samples are stored as 8-bit ints.
+
+    Args:
+        futures (iterable[:class:`~dwave.cloud.computation.Future`]):
+            Futures of problems with samples of the same size. Futures are
+            waited on in order.
+
+        path (str/file):
+            Path, or file object, the archive is written to.
+
+        chunk_size (int, default=2**24):
+            Minimal number of sample values (bytes) per chunk, except the last.
+
+        compress (bool, default=True):
+            Compress the archive (with deflate).
+
+    Returns:
+        int: number of problems exported.
+    """
+    if not _numpy:
+        raise ValueError("Results export requested without numpy.")
+
+    compression = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+    with zipfile.ZipFile(path, 'w', compression=compression, allowZip64=True) as archive:
+        writer = _ArchiveWriter(archive, chunk_size)
+        for future in futures:
+            writer.add(future)
+        writer.close()
+
+    return len(writer.problem_ids)
+
+
+class _ArchiveWriter(object):
+    """Helper for export_results, buffers sample columns of futures, and
+    writes them in chunks."""
+
+    def __init__(self, archive, chunk_size):
+        self.archive = archive
+        self.chunk_size = chunk_size
+        self.num_variables = None
+
+        self.problem_ids = []
+        self.num_rows = []
+        self.timing = []
+        self.chunk_rows = []
+
+        self.buffers = {column: [] for column in _SAMPLE_COLUMNS}
+        self.buffered = 0
+        self.buffered_rows = 0
+
+    def add(self, future):
+        samples = np.asarray(future.samples, dtype=np.int8)
+        if samples.ndim != 2:
+            samples = samples.reshape(len(samples), -1)
+
+        if self.num_variables is None:
+            self.num_variables = samples.shape[1]
+        elif samples.shape[1] != self.num_variables:
+            raise ValueError("Samples of problem {!r} have {} variables, expected {}".format(
+                future.id, samples.shape[1], self.num_variables))
+
+        self.buffers['samples'].append(samples)
+        self.buffers['energies'].append(np.asarray(future.energies))
+        self.buffers['occurrences'].append(np.asarray(future.occurrences))
+        self.buffered += samples.size
+        self.buffered_rows += len(samples)
+
+        self.problem_ids.append(six.text_type(future.id or ''))
+        self.num_rows.append(len(samples))
+        self.timing.append(json.dumps(future.timing))
+
+        if self.buffered >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffers['samples']:
+            return
+
+        chunk = len(self.chunk_rows)
+        for column, arrays in self.buffers.items():
+            self.write('{}/{}'.format(column, chunk), np.concatenate(arrays))
+            del arrays[:]
+
+        self.chunk_rows.append(self.buffered_rows)
+        self.buffered = 0
+        self.buffered_rows = 0
+
+    def close(self):
+        self.flush()
+        self.write('problem_ids', np.array(self.problem_ids, dtype='U'))
+        self.write('num_rows', np.array(self.num_rows, dtype=np.int64))
+        self.write('timing', np.array(self.timing, dtype='U'))
+        self.write('chunk_rows', np.array(self.chunk_rows, dtype=np.int64))
+
+    def write(self, name, array):
+        buffer = io.BytesIO()
+        np.lib.format.write_array(buffer, array, allow_pickle=False)
+        self.archive.writestr(name + '.npy', buffer.getvalue())
+
+
+class ResultArchive(object):
+    """Reader of an archive written by :func:`export_results`.
+
+    Columns are loaded on access, chunk by chunk.
+
+    Args:
+        path (str/file):
+            Path, or file object, of the archive.
+
+    Examples:
+        >>> from dwave.cloud.computation import Future
+        >>> Future.export_many(futures, 'results.npz')     # doctest: +SKIP
+        >>> with ResultArchive('results.npz') as archive:   # doctest: +SKIP
+        ...     for energies in archive.chunks('energies'):
+        ...         print(energies.min())
+    """
+
+    def __init__(self, path):
+        if not _numpy:
+            raise ValueError("Results archive requested without numpy.")
+
+        self._npz = np.load(path, allow_pickle=False)
+        self._columns = {}
+
+    def __len__(self):
+        return len(self.num_rows)
+
+    def _load(self, name):
+        if name not in self._columns:
+            self._columns[name] = self._npz[name]
+        return self._columns[name]
+
+    @property
+    def problem_ids(self):
+        """list[str]: Problem ids, in order of export."""
+        return self._load('problem_ids').tolist()
+
+    @property
+    def num_rows(self):
+        """:class:`numpy.ndarray`: Number of samples of each problem."""
+        return self._load('num_rows')
+
+    @property
+    def timing(self):
+        """list[dict]: Timing information of each problem."""
+        return [json.loads(timing) for timing in self._load('timing').tolist()]
+
+    @property
+    def num_chunks(self):
+        """int: Number of chunks of sample columns."""
+        return len(self._load('chunk_rows'))
+
+    def chunks(self, column):
+        """Iterate over chunks of a sample column, 'samples', 'energies' or
+        'occurrences'."""
+        if column not in _SAMPLE_COLUMNS:
+            raise ValueError("Unknown column: {!r}".format(column))
+        for chunk in range(self.num_chunks):
+            yield self._npz['{}/{}'.format(column, chunk)]
+
+    def column(self, column):
+        """Load a column entirely, one row per sample (see :meth:`chunks`)."""
+        chunks = list(self.chunks(column))
+        if not chunks:
+            return np.empty((0, 0) if column == 'samples' else 0)
+        return np.concatenate(chunks)
+
+    def problem(self, index):
+        """Results of the `index`-th problem exported, loading only the chunk
+        they are in.
+
+        Returns:
+            dict: `samples`, `energies`, `occurrences`, `problem_id` and `timing`.
+        """
+        num_rows = self.num_rows
+        if not -len(num_rows) <= index < len(num_rows):
+            raise IndexError("Problem index out of range")
+        index %= len(num_rows)
+
+        start = int(num_rows[:index].sum())
+        chunk_ends = np.cumsum(self._load('chunk_rows'))
+        chunk = int(np.searchsorted(chunk_ends, start, side='right'))
+        offset = start - (int(chunk_ends[chunk - 1]) if chunk else 0)
+        rows = slice(offset, offset + int(num_rows[index]))
+
+        result = {column: self._npz['{}/{}'.format(column, chunk)][rows]
+                  for column in _SAMPLE_COLUMNS}
+        result['problem_id'] = self.problem_ids[index]
+        result['timing'] = json.loads(self._load('timing')[index])
+        return result
+
+    def close(self):
+        self._npz.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class SolverCache(object):
+    """Disk-backed cache of solver definitions, one file per endpoint and token.
+
+    Cached definitions are stored as gzip-compressed JSON, along with the
+    response's ``ETag`` and ``Last-Modified`` validators, used for
+    conditional revalidation of stale entries.
+
+    Args:
+        directory (str, default=None):
+            Directory for cache files, created if necessary. By default, the
+            user's cache directory (e.g. ``~/.cache/dwave/`` on Linux).
+
+        ttl (float, default=3600):
+            Time (in seconds) cached definitions are used without revalidation.
+
+    Examples:
+        >>> from dwave.cloud import Client
+        >>> with Client.from_config(solver_cache=True) as client:   # doctest: +SKIP
+        ...     solver = client.get_solver()    # no request within an hour
+    """
+
+    def __init__(self, directory=None, ttl=3600):
+        if directory is None:
+            directory = homebase.user_cache_dir(
+                app_author=CONF_AUTHOR, app_name=CONF_APP,
+                use_virtualenv=False, create=False)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self.directory = directory
+        self.ttl = ttl
+
+    def path(self, endpoint, token):
+        """Cache file of solvers available at `endpoint` with `token`. Tokens
+        are not written to disk, file names are hashed."""
+        key = u'{}\n{}'.format(endpoint, token).encode('utf-8')
+        return os.path.join(self.directory, 'solvers-{}.json.gz'.format(
+            hashlib.sha256(key).hexdigest()))
+
+    def load(self, endpoint, token):
+        """Load the cache entry for `endpoint` and `token`.
+
+        Returns:
+            dict/None: `data` (list of solver descriptions), `etag`,
+            `last_modified` and `fetched` (timestamp), or None if not cached
+            (or unreadable).
+        """
+        try:
+            with open(self.path(endpoint, token), 'rb') as fp:
+                entry = json.loads(gzip_decompress(fp.read()).decode('utf-8'))
+        except Exception:
+            return None
+
+        if (not isinstance(entry, dict) or not isinstance(entry.get('data'), list)
+                or not isinstance(entry.get('fetched'), (int, float))):
+            return None
+
+        entry.setdefault('etag', None)
+        entry.setdefault('last_modified', None)
+        return entry
+
+    def save(self, endpoint, token, data, etag=None, last_modified=None):
+        """Save solver descriptions `data` (with response validators), fetched
+        now. Entries are replaced atomically.
+
+        Returns:
+            dict: cache entry saved.
+        """
+        entry = dict(data=data, etag=etag, last_modified=last_modified, fetched=time.time())
+        content = gzip_compress(json.dumps(entry).encode('utf-8'), level=1)
+
+        fd, path = tempfile.mkstemp(prefix='solvers-', suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                fp.write(content)
+            _replace(path, self.path(endpoint, token))
+        except Exception:
+            if os.path.exists(path):
+                os.unlink(path)
+            raise
+
+        return entry
+
+    def is_fresh(self, entry):
+        """Is `entry` younger than the TTL?"""
+        return 0 <= time.time() - entry['fetched'] < self.ttl
+
+    def clear(self, endpoint, token):
+        """Remove the cache entry for `endpoint` and `token`, if present."""
+        try:
+            os.unlink(self.path(endpoint, token))
+        except OSError:
+            pass
+
+
+def _replace(src, dst):
+    """Rename `src` to `dst`, replacing `dst` (atomically, where supported)."""
+    if hasattr(os, 'replace'):
+        os.replace(src, dst)
+    else:   # pragma: no cover
+        # py2 (on POSIX, rename replaces atomically)
+        if os.name == 'nt' and os.path.exists(dst):
+            os.unlink(dst)
+        os.rename(src, dst)
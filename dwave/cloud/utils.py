@@ -5,6 +5,7 @@ from dateutil.tz import UTC
 from functools import wraps
 import itertools
 import random
+import zlib
 
 import six
 import click
@@ -17,7 +18,8 @@ try:
 except ImportError:  # pragma: no cover
     _numpy = False
 
-__all__ = ['evaluate_ising', 'uniform_iterator', 'uniform_get',
+__all__ = ['evaluate_ising', 'evaluate_ising_batch', 'evaluate_qubo_batch',
+           'uniform_iterator', 'uniform_get',
            'default_text_input', 'click_info_switch', 'datetime_to_timestamp']
 
 
@@ -46,6 +48,98 @@ def evaluate_ising(linear, quad, state):
     return energy
 
 
+def evaluate_ising_batch(linear, quad, samples, offset=0.0):
+    """Calculate energies of a batch of states given the Hamiltonian.
+    Requires numpy.
+
+    Args:
+        linear (dict/list/:class:`numpy.ndarray`):
+            Linear Hamiltonian terms, keyed by variable, or one per variable.
+
+        quad (dict/tuple):
+            Quadratic Hamiltonian terms, keyed by pairs of variables, or in COO
+            form, as a tuple of arrays ``(row, col, bias)``.
+
+        samples (list/:class:`numpy.ndarray`):
+            States, one per row, with one spin value per variable (column),
+            e.g. :attr:`~dwave.cloud.computation.Future.samples`.
+
+        offset (float, default=0.0):
+            Constant energy offset.
+
+    Returns:
+        :class:`numpy.ndarray`: Energy of each state.
+    """
+    variables, biases = _coo_terms(linear, 1)
+    rows, cols, quad_biases = _coo_terms(quad, 2)
+    return _evaluate_batch(samples, offset, variables, biases, rows, cols, quad_biases)
+
+
+def evaluate_qubo_batch(qubo, samples, offset=0.0):
+    """Calculate energies of a batch of states given the QUBO.
+    Requires numpy.
+
+    Args:
+        qubo (dict/tuple):
+            QUBO coefficients keyed by pairs of variables (diagonal terms are
+            linear), or in COO form, as a tuple of arrays ``(row, col, bias)``.
+
+        samples (list/:class:`numpy.ndarray`):
+            States, one per row, with one binary value per variable (column),
+            e.g. :attr:`~dwave.cloud.computation.Future.samples`.
+
+        offset (float, default=0.0):
+            Constant energy offset.
+
+    Returns:
+        :class:`numpy.ndarray`: Energy of each state.
+    """
+    rows, cols, biases = _coo_terms(qubo, 2)
+
+    # x * x == x for binary values, so diagonal terms are evaluated as linear
+    diagonal = rows == cols
+    return _evaluate_batch(samples, offset, rows[diagonal], biases[diagonal],
+                           rows[~diagonal], cols[~diagonal], biases[~diagonal])
+
+
+def _coo_terms(terms, order):
+    """Helper for batch evaluators, converts linear (`order` 1) or quadratic
+    (`order` 2) terms to arrays of variables and biases."""
+    if isinstance(terms, tuple):
+        arrays = [np.asarray(array) for array in terms]
+        indices, biases = arrays[:-1], arrays[-1]
+    elif isinstance(terms, dict):
+        biases = np.fromiter(six.itervalues(terms), dtype=np.float64, count=len(terms))
+        keys = np.array(list(terms), dtype=np.int64).reshape(len(terms), order)
+        indices = list(keys.T)
+    else:
+        biases = np.asarray(terms, dtype=np.float64)
+        indices = [np.arange(len(biases))]
+
+    return [index.astype(np.intp, copy=False) for index in indices] + \
+        [biases.astype(np.float64, copy=False)]
+
+
+# Approximate number of state values gathered at once by batch evaluators
+_EVALUATE_CHUNK_SIZE = 2**20
+
+
+def _evaluate_batch(samples, offset, variables, biases, rows, cols, quad_biases):
+    """Helper for batch evaluators, sums the linear and quadratic terms of
+    all states, gathering values of a few states at a time."""
+    samples = np.asarray(samples)
+    energies = np.full(len(samples), offset, dtype=np.float64)
+    if not len(samples):
+        return energies
+
+    chunk = max(1, _EVALUATE_CHUNK_SIZE // max(1, len(variables) + 2 * len(rows)))
+    for start in range(0, len(samples), chunk):
+        states = samples[start:start + chunk]
+        energies[start:start + chunk] += states[:, variables].dot(biases)
+        energies[start:start + chunk] += (states[:, rows] * states[:, cols]).dot(quad_biases)
+    return energies
+
+
 def active_qubits(linear, quadratic):
     """Calculate a set of all active qubits. Qubit is "active" if it has
     bias or coupling attached.
@@ -177,6 +271,25 @@ def utcnow():
     return datetime.utcnow().replace(tzinfo=UTC)
 
 
+def gzip_compress(data, level=6):
+    """Compress `data` (bytes) into the gzip format.
+
+    Note: similar to `gzip.compress()` in Python 3.2+.
+    """
+
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def gzip_decompress(data):
+    """Decompress gzip-compressed `data` (bytes).
+
+    Note: similar to `gzip.decompress()` in Python 3.2+.
+    """
+
+    return zlib.decompress(data, 16 + zlib.MAX_WBITS)
+
+
 def strtrunc(s, maxlen=60):
     s = str(s)
     return s[:(maxlen-3)]+'...' if len(s) > maxlen else s
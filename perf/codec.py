@@ -0,0 +1,85 @@
+"""Benchmark JSON codecs on typical SAPI messages: problem submission bodies,
+status poll responses and result responses.
+
+Usage:
+
+    python -m perf.codec [num_problems] [num_reads]
+"""
+from __future__ import absolute_import, print_function
+
+import os
+import sys
+import json
+import base64
+import timeit
+import logging
+
+from dwave.cloud.coders import get_json_codec, JSON_CODECS
+
+from perf.decode import random_answer
+
+
+# setup local logger
+formatter = logging.Formatter('%(asctime)s %(name)s %(levelname)s %(message)s')
+handler = logging.StreamHandler()
+handler.setFormatter(formatter)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(handler)
+
+
+def submission_bodies(num_problems, num_qubits=2048):
+    """Problem bodies as built by `Solver._sample`, with `qp` encoded data of
+    realistic size (qubit and coupler biases of a 2000Q-sized chip)."""
+    def biases(count):
+        return base64.b64encode(os.urandom(8 * count)).decode('utf-8')
+
+    return [{
+        'solver': 'DW_2000Q',
+        'data': {'format': 'qp', 'lin': biases(num_qubits), 'quad': biases(3 * num_qubits)},
+        'type': 'ising',
+        'params': {'num_reads': 100, 'annealing_time': 20, 'x_label': str(index)}
+    } for index in range(num_problems)]
+
+
+def status_response(num_problems):
+    return [{
+        'status': 'PENDING',
+        'solved_on': None,
+        'solver': 'DW_2000Q',
+        'submitted_on': '2018-07-19T10:25:59.941674+00:00',
+        'type': 'ising',
+        'id': 'f0e8b0bc-0cd6-4ab1-9e39-3a4f0e8a{:04d}'.format(index),
+        'earliest_estimated_completion': '2018-07-19T10:26:00.020954+00:00',
+        'latest_estimated_completion': '2018-07-19T10:26:01.020954+00:00',
+    } for index in range(num_problems)]
+
+
+def bench(func, number):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:3]]
+    defaults = [20, 1000]
+    num_problems, num_reads = args + defaults[len(args):]
+
+    bodies = submission_bodies(num_problems)
+    statuses = json.dumps(status_response(100)).encode('utf-8')
+    result = json.dumps(random_answer(num_reads, 2048, 2000)).encode('utf-8')
+    logger.info("Submitting %d problems (%d bytes), polling 100 statuses (%d bytes), "
+                "loading a result of %d reads (%d bytes)",
+                num_problems, len(json.dumps(bodies)), len(statuses), num_reads, len(result))
+
+    for name in JSON_CODECS:
+        try:
+            codec = get_json_codec(name)
+        except ImportError:
+            logger.info(" - %s: not installed", name)
+            continue
+
+        submit = bench(lambda: b'[' + b','.join(map(codec.dumps, bodies)) + b']', 100)
+        poll = bench(lambda: codec.loads(statuses), 100)
+        load = bench(lambda: codec.loads(result), 100)
+        logger.info(" - %s: submit %.3f ms, poll %.3f ms, load %.3f ms",
+                    name, submit * 1e3, poll * 1e3, load * 1e3)
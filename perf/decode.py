@@ -0,0 +1,126 @@
+"""Benchmark the pure-python `qp` answer decoder against the previous
+(bit-by-bit) implementation, and against the numpy decoder if available.
+
+Usage:
+
+    python -m perf.decode [num_reads] [num_variables] [num_active]
+"""
+from __future__ import absolute_import, print_function
+
+import sys
+import copy
+import base64
+import random
+import struct
+import timeit
+import logging
+
+from dwave.cloud.coders import decode_qp, decode_qp_numpy, _decode_ints, _decode_doubles
+
+
+# setup local logger
+formatter = logging.Formatter('%(asctime)s %(name)s %(levelname)s %(message)s')
+handler = logging.StreamHandler()
+handler.setFormatter(formatter)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(handler)
+
+
+def legacy_decode_qp(msg):
+    """Reference: pure-python decoder prior to the table-driven rewrite."""
+
+    def decode_byte(byte):
+        bits = []
+        for _ in range(8):
+            bits.append(byte & 1)
+            byte >>= 1
+        return bits
+
+    result = msg['answer']
+    result['active_variables'] = _decode_ints(result['active_variables'])
+    active_variables = result['active_variables']
+    if 'num_occurrences' in result:
+        result['num_occurrences'] = _decode_ints(result['num_occurrences'])
+    result['energies'] = _decode_doubles(result['energies'])
+
+    num_solutions = len(result['energies'])
+    num_variables = len(result['active_variables'])
+    solution_bytes = -(-num_variables // 8)
+    total_variables = result['num_variables']
+
+    default = 3 if msg['type'] == 'qubo' else 0
+
+    binary = base64.b64decode(result['solutions'])
+    solutions = []
+    for solution_index in range(num_solutions):
+        buffer_index = solution_index * solution_bytes
+        solution_buffer = binary[buffer_index:buffer_index + solution_bytes]
+        bytes = struct.unpack('B' * solution_bytes, solution_buffer)
+
+        solution = [default] * total_variables
+        index = 0
+        for byte in bytes:
+            values = decode_byte(byte)
+            for _ in range(min(8, len(active_variables) - index)):
+                i = active_variables[index]
+                index += 1
+                solution[i] = values.pop()
+
+        if msg['type'] == 'ising':
+            values = {0: -1, 1: 1}
+            solution = [values.get(v, default) for v in solution]
+        solutions.append(solution)
+
+    result['solutions'] = solutions
+    return result
+
+
+def random_answer(num_reads, num_variables, num_active, problem_type='ising'):
+    """Random `qp`-encoded answer message."""
+
+    def b64(fmt, values):
+        return base64.b64encode(struct.pack('<' + fmt * len(values), *values)).decode('utf-8')
+
+    active = sorted(random.sample(range(num_variables), num_active))
+    solution_bytes = -(-num_active // 8)
+    solutions = bytearray(random.getrandbits(8) for _ in range(num_reads * solution_bytes))
+
+    return {
+        'type': problem_type,
+        'answer': {
+            'format': 'qp',
+            'num_variables': num_variables,
+            'active_variables': b64('i', active),
+            'energies': b64('d', [random.random() for _ in range(num_reads)]),
+            'num_occurrences': b64('i', [1] * num_reads),
+            'solutions': base64.b64encode(bytes(solutions)).decode('utf-8'),
+            'timing': {}
+        }
+    }
+
+
+def bench(decoder, msg, number=3):
+    return min(timeit.repeat(lambda: decoder(copy.deepcopy(msg)), number=1, repeat=number))
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:4]]
+    defaults = [10000, 2048, 2000]
+    num_reads, num_variables, num_active = args + defaults[len(args):]
+    logger.info("Decoding %d reads of %d active out of %d variables",
+                num_reads, num_active, num_variables)
+
+    msg = random_answer(num_reads, num_variables, num_active)
+
+    legacy = bench(legacy_decode_qp, msg)
+    logger.info(" - legacy decode_qp: %.3f sec", legacy)
+
+    current = bench(decode_qp, msg)
+    logger.info(" - decode_qp: %.3f sec (%.1fx)", current, legacy / current)
+
+    try:
+        numpy_time = bench(decode_qp_numpy, msg)
+        logger.info(" - decode_qp_numpy: %.3f sec (%.1fx)", numpy_time, legacy / numpy_time)
+    except ImportError:
+        logger.info(" - decode_qp_numpy: numpy not available")
@@ -1,12 +1,26 @@
 from __future__ import absolute_import, print_function
 
+import sys
 import base64
 import struct
 import unittest
+import random
 import itertools
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import textwrap
 
-from dwave.cloud.coders import encode_bqm_as_qp
+import six
+import numpy
+
+from dwave.cloud.coders import (
+    encode_bqm_as_qp, encode_arrays_as_qp, decode_qp, decode_qp_numpy, expand_samples, load_qp_stream,
+    PackedSamples, get_json_codec, JSON_CODECS, EncodingCache, ProcessPoolDecoder)
 from dwave.cloud.qpu import Solver
+from dwave.cloud.testing import mock
 
 
 def get_solver():
@@ -24,6 +38,26 @@ def get_solver():
     return Solver(client=None, data=data)
 
 
+def get_large_solver(num_qubits=64):
+    """Solver with a sparse, non-contiguous, randomly ordered qubit set."""
+    rnd = random.Random(0)
+    qubits = rnd.sample(range(2 * num_qubits), num_qubits)
+    couplers = [e for e in itertools.combinations(qubits, 2) if rnd.random() < 0.2]
+    rnd.shuffle(couplers)
+    data = {
+        "properties": {
+            "supported_problem_types": ["qubo", "ising"],
+            "qubits": qubits,
+            "couplers": couplers,
+            "num_qubits": num_qubits,
+            "parameters": {"num_reads": "Number of samples to return."}
+        },
+        "id": "test-large-solver",
+        "description": "A larger test solver"
+    }
+    return Solver(client=None, data=data)
+
+
 class TestCoders(unittest.TestCase):
     nan = float('nan')
 
@@ -92,3 +126,659 @@ class TestCoders(unittest.TestCase):
         self.assertEqual(request['lin'],  self.encode_doubles([0, self.nan, self.nan, 0]))
         # [0]
         self.assertEqual(request['quad'], self.encode_doubles([0]))
+
+    def test_qpu_request_encoding_numpy_matches_python(self):
+        """NumPy and pure-Python encoders produce identical buffers."""
+
+        solver = get_large_solver()
+        rnd = random.Random(1)
+        nodes = sorted(solver.nodes)
+        edges = sorted(solver.edges)
+
+        problems = [
+            ({}, {}),
+            ({q: rnd.uniform(-2, 2) for q in nodes}, {}),
+            ({}, {e: rnd.uniform(-1, 1) for e in rnd.sample(edges, 10)}),
+            ({q: rnd.uniform(-2, 2) for q in rnd.sample(nodes, 20)},
+             {e: rnd.uniform(-1, 1) for e in rnd.sample(edges, 30)}),
+            ([rnd.uniform(-2, 2) for _ in range(max(nodes) // 2)],
+             {e: rnd.uniform(-1, 1) for e in rnd.sample(edges, 30)}),
+        ]
+
+        for linear, quadratic in problems:
+            with mock.patch('dwave.cloud.coders._numpy', True):
+                fast = encode_bqm_as_qp(solver, linear, quadratic)
+            with mock.patch('dwave.cloud.coders._numpy', False):
+                slow = encode_bqm_as_qp(solver, linear, quadratic)
+            self.assertEqual(fast, slow)
+
+    def test_qpu_request_encoding_arrays(self):
+        """Array encoding matches the encoding of equivalent dicts."""
+        solver = get_large_solver()
+        rnd = random.Random(11)
+        qubits = solver.properties['qubits']
+        couplers = solver._encoding_couplers
+
+        inactive = set(rnd.sample(qubits, 10))
+        h = [float('nan') if q in inactive else rnd.uniform(-1, 1) for q in qubits]
+        J = [0 if u in inactive or v in inactive else rnd.uniform(-1, 1) for u, v in couplers]
+        linear = {q: b for q, b in zip(qubits, h) if q not in inactive}
+        quadratic = {c: b for c, b in zip(couplers, J) if not inactive.intersection(c)}
+
+        self.assertEqual(encode_arrays_as_qp(solver, numpy.array(h), numpy.array(J)),
+                         encode_bqm_as_qp(solver, linear, quadratic))
+
+    def test_qpu_request_encoding_compiled(self):
+        """Compiled problems encode like equivalent dicts."""
+        solver = get_large_solver()
+        rnd = random.Random(13)
+        couplers = rnd.sample(solver._encoding_couplers, 40)
+        qubits = rnd.sample(solver.properties['qubits'], 20)
+
+        problem = solver.compile(qubits, couplers)
+        for _ in range(3):
+            linear = {q: rnd.uniform(-1, 1) for q in qubits}
+            quadratic = {c: rnd.uniform(-1, 1) for c in couplers}
+            problem.set_biases([linear[q] for q in qubits], [quadratic[c] for c in couplers])
+            self.assertEqual(problem.encode(), encode_bqm_as_qp(solver, linear, quadratic))
+
+        # patched biases, couplers in either direction
+        u, v = couplers[0]
+        linear[qubits[0]] = 5.0
+        quadratic[(u, v)] = -5.0
+        problem.update(linear={qubits[0]: 5.0}, quadratic={(v, u): -5.0})
+        self.assertEqual(problem.encode(), encode_bqm_as_qp(solver, linear, quadratic))
+
+        with self.assertRaises(KeyError):
+            problem.update(linear={-1: 1})
+        with self.assertRaises(ValueError):
+            problem.set_biases(linear=[1, 2])
+        with self.assertRaises(ValueError):
+            solver.compile([-1], [])
+        with self.assertRaises(ValueError):
+            solver.compile([], [(qubits[0], qubits[0])])
+
+    def test_qpu_request_encoding_both_coupler_directions(self):
+        """Biases given for (u, v) and (v, u) are summed on the coupler."""
+
+        solver = get_solver()
+        linear = {}
+        quadratic = {(0, 1): -1, (1, 0): 0.5}
+        request = encode_bqm_as_qp(solver, linear, quadratic)
+        self.assertEqual(request['lin'],  self.encode_doubles([0, 0, self.nan, self.nan]))
+        self.assertEqual(request['quad'], self.encode_doubles([-0.5]))
+
+
+class TestEncodingCache(unittest.TestCase):
+
+    def test_hits_and_misses(self):
+        solver = get_solver()
+        cache = EncodingCache(maxsize=2)
+        linear = {0: 1.0, 3: -1.0}
+        quadratic = {(0, 3): 0.5}
+
+        encoded = cache.encode(solver, linear, quadratic)
+        self.assertEqual(encoded, encode_bqm_as_qp(solver, linear, quadratic))
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+        self.assertEqual(cache.encode(solver, dict(linear), dict(quadratic)), encoded)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        # different biases are a miss
+        cache.encode(solver, linear, {(0, 3): -0.5})
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+        # same problem on a different solver is a miss, even with the same
+        # id (e.g. a refreshed definition), as its graph may differ
+        other = get_solver()
+        other.properties['qubits'].remove(1)
+        other.properties['couplers'] = [(2, 3), (3, 0)]
+        other = Solver(client=None, data=other.data)
+        self.assertEqual(
+            cache.encode(other, linear, quadratic), encode_bqm_as_qp(other, linear, quadratic))
+        self.assertNotEqual(cache.encode(other, linear, quadratic), encoded)
+        self.assertEqual((cache.hits, cache.misses), (2, 3))
+        self.assertEqual(len(cache), 2)
+
+        cache.clear()
+        self.assertEqual((len(cache), cache.hits, cache.misses), (0, 0, 0))
+
+    def test_lru_eviction(self):
+        solver = get_solver()
+        cache = EncodingCache(maxsize=2)
+        problems = [{0: 1.0}, {1: 1.0}, {2: 1.0}]
+
+        cache.encode(solver, problems[0], {})
+        cache.encode(solver, problems[1], {})
+        cache.encode(solver, problems[0], {})    # most recently used
+        cache.encode(solver, problems[2], {})    # evicts problems[1]
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+        cache.encode(solver, problems[0], {})
+        self.assertEqual((cache.hits, cache.misses), (2, 3))
+        cache.encode(solver, problems[1], {})
+        self.assertEqual((cache.hits, cache.misses), (2, 4))
+
+    def test_disabled(self):
+        solver = get_solver()
+        cache = EncodingCache(maxsize=0)
+        for _ in range(2):
+            cache.encode(solver, {0: 1.0}, {})
+        self.assertEqual((len(cache), cache.hits, cache.misses), (0, 0, 2))
+
+
+def encode_answer(problem_type, bits, active_variables, num_variables):
+    """Build a `qp`-encoded SAPI answer message for a matrix of bits
+    (one row per solution, one column per active variable)."""
+    bits = numpy.asarray(bits, dtype=numpy.uint8)
+    num_solutions = bits.shape[0]
+
+    def b64(array, dtype):
+        return base64.b64encode(numpy.asarray(array, dtype=dtype).tobytes()).decode('utf-8')
+
+    return {
+        'type': problem_type,
+        'answer': {
+            'format': 'qp',
+            'num_variables': num_variables,
+            'active_variables': b64(active_variables, '<i4'),
+            'energies': b64(numpy.arange(num_solutions), '<f8'),
+            'num_occurrences': b64(numpy.ones(num_solutions), '<i4'),
+            'solutions': b64(numpy.packbits(bits, axis=1), numpy.uint8),
+            'timing': {}
+        }
+    }
+
+
+class TestDecoders(unittest.TestCase):
+
+    def expected_samples(self, problem_type, bits, active_variables, num_variables,
+                         ising_default=0):
+        default = ising_default if problem_type == 'ising' else 3
+        samples = []
+        for row in bits:
+            sample = [default] * num_variables
+            for variable, bit in zip(active_variables, row):
+                sample[variable] = 2 * bit - 1 if problem_type == 'ising' else bit
+            samples.append(sample)
+        return samples
+
+    def test_decode_qp(self):
+        """Pure-python decoder unpacks bits (MSB first) into the right variables."""
+
+        rnd = random.Random(0)
+        for problem_type in ['ising', 'qubo']:
+            for num_variables, num_active in [(1, 1), (8, 8), (13, 5), (20, 9), (50, 16)]:
+                active = sorted(rnd.sample(range(num_variables), num_active))
+                bits = [[rnd.randint(0, 1) for _ in active] for _ in range(7)]
+                msg = encode_answer(problem_type, bits, active, num_variables)
+
+                result = decode_qp(msg)
+
+                self.assertEqual(list(result['active_variables']), active)
+                self.assertEqual(list(result['energies']), list(range(7)))
+                self.assertEqual(result['solutions'],
+                                 self.expected_samples(problem_type, bits, active,
+                                                       num_variables, ising_default=-1))
+
+    def test_decode_qp_inactive_ising(self):
+        """Pure-python decoder sets inactive variables of ising problems to -1,
+        NumPy decoder to 0."""
+
+        msg = encode_answer('ising', [[1, 0], [0, 1]], [1, 3], 4)
+        self.assertEqual(decode_qp(msg)['solutions'], [[-1, 1, -1, -1], [-1, -1, -1, 1]])
+
+        msg = encode_answer('ising', [[1, 0], [0, 1]], [1, 3], 4)
+        self.assertEqual(decode_qp_numpy(msg)['solutions'].tolist(),
+                         [[0, 1, 0, -1], [0, -1, 0, 1]])
+
+    def python_samples(self, problem_type, samples, active_variables):
+        """NumPy decoded `samples` as decoded by the pure-python decoder."""
+        samples = numpy.array(samples)
+        if problem_type == 'ising':
+            inactive = numpy.ones(samples.shape[1], dtype=bool)
+            inactive[active_variables] = False
+            samples[:, inactive] = -1
+        return samples.tolist()
+
+    def test_decode_qp_numpy(self):
+        """NumPy decoder trims padding bits and fills in inactive variables."""
+
+        rnd = random.Random(2)
+        for problem_type in ['ising', 'qubo']:
+            for num_variables, num_active in [(1, 1), (8, 8), (13, 13), (13, 5), (50, 16)]:
+                active = sorted(rnd.sample(range(num_variables), num_active))
+                bits = [[rnd.randint(0, 1) for _ in active] for _ in range(7)]
+                msg = encode_answer(problem_type, bits, active, num_variables)
+
+                result = decode_qp_numpy(msg)
+
+                self.assertEqual(result['solutions'].dtype, numpy.int8)
+                self.assertEqual(result['solutions'].tolist(),
+                                 self.expected_samples(problem_type, bits, active, num_variables))
+
+    def test_decode_qp_numpy_empty(self):
+        msg = encode_answer('ising', numpy.empty((0, 3)), [0, 1, 2], 4)
+        self.assertEqual(decode_qp_numpy(msg)['solutions'].shape, (0, 4))
+
+        msg = encode_answer('qubo', numpy.empty((2, 0)), [], 3)
+        self.assertEqual(decode_qp_numpy(msg)['solutions'].tolist(), [[3, 3, 3], [3, 3, 3]])
+
+    def test_decode_qp_no_active_variables(self):
+        msg = encode_answer('qubo', numpy.empty((2, 0)), [], 3)
+        self.assertEqual(decode_qp(msg)['solutions'], [[3, 3, 3], [3, 3, 3]])
+
+    def test_decode_qp_matches_numpy(self):
+        """Pure-python and NumPy decoders agree."""
+
+        rnd = random.Random(1)
+        active = sorted(rnd.sample(range(100), 37))
+        bits = [[rnd.randint(0, 1) for _ in active] for _ in range(20)]
+        for problem_type in ['ising', 'qubo']:
+            slow = decode_qp(encode_answer(problem_type, bits, active, 100))
+            fast = decode_qp_numpy(encode_answer(problem_type, bits, active, 100))
+            self.assertEqual(slow['solutions'],
+                             self.python_samples(problem_type, fast['solutions'], active))
+
+    def test_decode_qp_numpy_packed(self):
+        """Packed samples unpack to the same values as the full layout."""
+
+        rnd = random.Random(3)
+        active = sorted(rnd.sample(range(30), 11))
+        bits = [[rnd.randint(0, 1) for _ in active] for _ in range(9)]
+
+        for problem_type in ['ising', 'qubo']:
+            full = decode_qp_numpy(encode_answer(problem_type, bits, active, 30))['solutions']
+            packed = decode_qp_numpy(encode_answer(problem_type, bits, active, 30),
+                                     samples_layout='packed')['solutions']
+
+            self.assertIsInstance(packed, PackedSamples)
+            self.assertEqual(packed.shape, full.shape)
+            self.assertEqual(len(packed), len(full))
+            self.assertEqual(packed.nbytes, 9 * 2)
+
+            numpy.testing.assert_array_equal(packed.unpack(), full)
+            numpy.testing.assert_array_equal(numpy.asarray(packed), full)
+            self.assertEqual(packed.tolist(), full.tolist())
+            self.assertEqual([list(row) for row in packed], full.tolist())
+
+            # rows, slices and columns
+            for i in [0, 4, -1]:
+                numpy.testing.assert_array_equal(packed[i], full[i])
+                for v in [active[0], active[-1], 0, 29]:
+                    self.assertEqual(packed[i][v], full[i][v])
+                    self.assertEqual(packed[i, v], full[i, v])
+            numpy.testing.assert_array_equal(packed[2:5], full[2:5])
+            numpy.testing.assert_array_equal(packed[[1, 3]], full[[1, 3]])
+            numpy.testing.assert_array_equal(packed[1:3, 5:9], full[1:3, 5:9])
+            for v in range(30):
+                numpy.testing.assert_array_equal(packed[:, v], full[:, v])
+                numpy.testing.assert_array_equal(packed.column(v), full[:, v])
+
+            with self.assertRaises(IndexError):
+                packed[9]
+
+    def test_decode_qp_numpy_packed_lists(self):
+        """Packed samples return lists when return_matrix is False."""
+
+        msg = encode_answer('ising', [[1, 0, 1], [0, 0, 1]], [0, 2, 3], 4)
+        packed = decode_qp_numpy(msg, return_matrix=False, samples_layout='packed')['solutions']
+
+        self.assertEqual(packed[0], [1, 0, -1, 1])
+        self.assertEqual(packed[1][0], -1)
+        self.assertEqual(packed[:, 3], [1, 1])
+        self.assertEqual(list(packed), [[1, 0, -1, 1], [-1, 0, -1, 1]])
+
+    def test_decode_qp_numpy_unknown_layout(self):
+        msg = encode_answer('ising', [[1]], [0], 1)
+        with self.assertRaises(ValueError):
+            decode_qp_numpy(msg, samples_layout='unknown')
+
+    def test_decode_qp_active_layout(self):
+        """Active samples expand to the full layout."""
+
+        rnd = random.Random(5)
+        active = sorted(rnd.sample(range(20), 7))
+        bits = [[rnd.randint(0, 1) for _ in active] for _ in range(6)]
+
+        for problem_type in ['ising', 'qubo']:
+            full = decode_qp_numpy(encode_answer(problem_type, bits, active, 20))['solutions']
+            samples = decode_qp_numpy(encode_answer(problem_type, bits, active, 20),
+                                      samples_layout='active')['solutions']
+            samples_py = decode_qp(encode_answer(problem_type, bits, active, 20),
+                                   samples_layout='active')['solutions']
+
+            self.assertEqual(samples.shape, (6, 7))
+            numpy.testing.assert_array_equal(samples, full[:, active])
+            self.assertEqual(samples_py, samples.tolist())
+
+            numpy.testing.assert_array_equal(
+                expand_samples(samples, active, 20, problem_type), full)
+            self.assertEqual(
+                expand_samples(samples_py, active, 20, problem_type), full.tolist())
+
+        with self.assertRaises(ValueError):
+            decode_qp(encode_answer('ising', [[1]], [0], 1), samples_layout='packed')
+
+    def test_decode_qp_numpy_dtypes(self):
+        """Decoded fields are cast to the requested dtypes."""
+
+        active = [0, 2, 3]
+        bits = [[1, 0, 1], [0, 0, 1]]
+        dtypes = {'solutions': numpy.float32, 'energies': numpy.float32,
+                  'num_occurrences': numpy.int64}
+
+        for layout in ['full', 'active', 'packed']:
+            result = decode_qp_numpy(encode_answer('ising', bits, active, 4),
+                                     samples_layout=layout, dtypes=dtypes)
+            samples = numpy.asarray(result['solutions'])
+
+            self.assertEqual(samples.dtype, numpy.float32)
+            self.assertEqual(result['energies'].dtype, numpy.float32)
+            self.assertEqual(result['num_occurrences'].dtype, numpy.int64)
+            self.assertEqual(result['active_variables'].dtype, numpy.int32)
+
+        result = decode_qp_numpy(encode_answer('qubo', bits, active, 4),
+                                 dtypes={'solutions': numpy.int32})
+        self.assertEqual(result['solutions'].dtype, numpy.int32)
+        self.assertEqual(result['solutions'].tolist(), [[1, 3, 0, 1], [0, 3, 0, 1]])
+
+    def test_decode_qp_aggregate(self):
+        """Identical solutions collapse in order of first occurrence, with
+        summed occurrences."""
+
+        active = [0, 2, 3]
+        bits = [[1, 0, 1], [0, 0, 1], [1, 0, 1], [1, 1, 1], [0, 0, 1]]
+
+        for layout in ['full', 'active', 'packed']:
+            msg = encode_answer('ising', bits, active, 4)
+            msg['answer']['num_occurrences'] = base64.b64encode(
+                numpy.array([1, 2, 3, 4, 5], dtype='<i4').tobytes()).decode('utf-8')
+            result = decode_qp_numpy(msg, samples_layout=layout, aggregate=True)
+
+            self.assertEqual(result['energies'].tolist(), [0, 1, 3])
+            self.assertEqual(result['num_occurrences'].tolist(), [4, 7, 4])
+            numpy.testing.assert_array_equal(
+                expand_samples(numpy.asarray(result['solutions']), active, 4, 'ising')
+                if layout == 'active' else numpy.asarray(result['solutions']),
+                [[1, 0, -1, 1], [-1, 0, -1, 1], [1, 0, 1, 1]])
+
+        # occurrences are decoded along with the aggregated energies
+        result = decode_qp_numpy(encode_answer('qubo', bits, active, 4),
+                                 fields=['energies'], aggregate=True)
+        self.assertEqual(result['energies'].tolist(), [0, 1, 3])
+        self.assertEqual(result['num_occurrences'].tolist(), [2, 2, 1])
+
+    def test_decode_qp_aggregate_matches_numpy(self):
+        """Pure-python and NumPy aggregation agree."""
+
+        rnd = random.Random(7)
+        active = sorted(rnd.sample(range(40), 10))
+        bits = [[rnd.randint(0, 1) for _ in active[:3]] + [0] * 7 for _ in range(50)]
+
+        for problem_type in ['ising', 'qubo']:
+            slow = decode_qp(encode_answer(problem_type, bits, active, 40), aggregate=True)
+            fast = decode_qp_numpy(encode_answer(problem_type, bits, active, 40), aggregate=True)
+
+            self.assertLessEqual(len(fast['energies']), 8)
+            self.assertEqual(sum(fast['num_occurrences']), 50)
+            self.assertEqual(slow['solutions'],
+                             self.python_samples(problem_type, fast['solutions'], active))
+            self.assertEqual(list(slow['energies']), fast['energies'].tolist())
+            self.assertEqual(list(slow['num_occurrences']), fast['num_occurrences'].tolist())
+
+        # without active variables all solutions are the same
+        for decode in [decode_qp, decode_qp_numpy]:
+            result = decode(encode_answer('qubo', numpy.empty((3, 0)), [], 2), aggregate=True)
+            self.assertEqual(list(result['num_occurrences']), [3])
+            self.assertEqual(list(map(list, result['solutions'])), [[3, 3]])
+
+    def test_decode_qp_aggregate_ignores_padding(self):
+        """Solutions differing only in padding bits of the packed rows are
+        aggregated."""
+
+        active = [0, 1, 3]
+        bits = [[1, 0, 1], [1, 0, 1], [0, 1, 1]]
+
+        for decode in [decode_qp, decode_qp_numpy]:
+            msg = encode_answer('qubo', bits, active, 4)
+            packed = numpy.packbits(numpy.asarray(bits, dtype=numpy.uint8), axis=1)
+            packed[1, 0] |= 0b00011111
+            packed[2, 0] |= 0b00000001
+            msg['answer']['solutions'] = base64.b64encode(packed.tobytes()).decode('utf-8')
+
+            result = decode(msg, aggregate=True)
+            self.assertEqual(list(result['energies']), [0, 2])
+            self.assertEqual(list(result['num_occurrences']), [2, 1])
+            self.assertEqual(list(map(list, result['solutions'])),
+                             [[1, 0, 3, 1], [0, 1, 3, 1]])
+
+
+class TestProcessPoolDecoder(unittest.TestCase):
+
+    def test_decode(self):
+        """Answers decoded in worker processes match answers decoded in-process."""
+
+        rnd = random.Random(11)
+        active = sorted(rnd.sample(range(50), 20))
+        bits = [[rnd.randint(0, 1) for _ in active] for _ in range(30)]
+
+        decoder = ProcessPoolDecoder(max_workers=1, threshold=0)
+        try:
+            for layout in ['full', 'active', 'packed']:
+                expected = decode_qp_numpy(encode_answer('ising', bits, active, 50),
+                                           samples_layout=layout)
+                msg = encode_answer('ising', bits, active, 50)
+                result = decoder.decode(msg, samples_layout=layout)
+
+                self.assertIs(result, msg['answer'])
+                for field in ['energies', 'num_occurrences', 'active_variables']:
+                    numpy.testing.assert_array_equal(result[field], expected[field])
+                numpy.testing.assert_array_equal(numpy.asarray(result['solutions']),
+                                                 numpy.asarray(expected['solutions']))
+
+            # only requested fields are decoded
+            msg = encode_answer('qubo', bits, active, 50)
+            decoder.decode(msg, fields=['energies'], return_matrix=False)
+            self.assertEqual(msg['answer']['energies'], list(range(30)))
+            self.assertIsInstance(msg['answer']['solutions'], six.string_types)
+
+            # workers are not forked from the (multi-threaded) calling process,
+            # answers are decoded in-process where they would be
+            if sys.version_info >= (3, 7):
+                self.assertNotEqual(
+                    decoder._executor._mp_context.get_start_method(), 'fork')
+            else:
+                self.assertIsNone(decoder._executor)
+        finally:
+            decoder.shutdown()
+
+    def test_guarded_script(self):
+        """Scripts guarded with `if __name__ == '__main__'` run once, even if
+        worker processes import the main module."""
+
+        msg = encode_answer('ising', [[1, 0, 1]] * 10, [0, 1, 2], 3)
+        script = textwrap.dedent("""
+            import json
+            from dwave.cloud.coders import ProcessPoolDecoder
+
+            def main():
+                decoder = ProcessPoolDecoder(max_workers=1, threshold=0)
+                try:
+                    result = decoder.decode(json.loads(%r))
+                finally:
+                    decoder.shutdown()
+                print('decoded', result['solutions'].tolist()[0])
+
+            if __name__ == '__main__':
+                main()
+            """) % json.dumps(msg)
+
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'script.py')
+            with open(path, 'w') as f:
+                f.write(script)
+
+            # the script is run from the temp directory, not the package root
+            env = dict(os.environ)
+            root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            env['PYTHONPATH'] = os.pathsep.join(filter(None, [root, env.get('PYTHONPATH')]))
+            output = subprocess.check_output([sys.executable, path], env=env)
+        finally:
+            shutil.rmtree(directory)
+
+        self.assertEqual(output.decode('utf-8').splitlines(), ['decoded [1, -1, 1]'])
+
+    @unittest.skipIf(sys.version_info < (3, 7), "workers can't be started safely")
+    def test_threshold(self):
+        msg = encode_answer('ising', [[1, 0, 1]] * 10, [0, 1, 2], 3)
+        size = sum(len(msg['answer'][field]) for field in
+                   ['energies', 'num_occurrences', 'active_variables', 'solutions'])
+
+        self.assertTrue(ProcessPoolDecoder(threshold=size).accepts(msg))
+        self.assertFalse(ProcessPoolDecoder(threshold=size + 1).accepts(msg))
+        self.assertFalse(ProcessPoolDecoder(threshold=size).accepts(msg, ['energies']))
+
+    def test_lists_decoded_in_process(self):
+        """Answers decoded into lists (the default of solvers) are not
+        accepted, as building lists costs as much as decoding."""
+
+        msg = encode_answer('ising', [[1, 0, 1]] * 10, [0, 1, 2], 3)
+        decoder = ProcessPoolDecoder(threshold=0)
+
+        self.assertFalse(decoder.accepts(msg, return_matrix=False))
+        self.assertEqual(decoder.accepts(msg, return_matrix=False, samples_layout='packed'),
+                         sys.version_info >= (3, 7))
+
+        # workers send back arrays only
+        from dwave.cloud.coders import _decode_qp_answer
+        decoded = _decode_qp_answer(msg, {'fields': ['energies', 'solutions']})
+        self.assertEqual(set(decoded), {'energies', 'active_variables', 'solutions'})
+        for value in decoded.values():
+            self.assertIsInstance(value, numpy.ndarray)
+
+    @unittest.skipIf(sys.version_info >= (3, 7), "workers can be started safely")
+    def test_no_safe_start_method(self):
+        """Without a safe start method, answers are decoded in-process."""
+
+        msg = encode_answer('ising', [[1, 0, 1]] * 10, [0, 1, 2], 3)
+        decoder = ProcessPoolDecoder(threshold=0)
+
+        self.assertFalse(decoder.accepts(msg))
+        result = decoder.decode(msg)
+        self.assertEqual(result['solutions'].tolist(), [[1, -1, 1]] * 10)
+        self.assertIsNone(decoder._executor)
+
+
+class TestStreamLoading(unittest.TestCase):
+
+    def chunked(self, data, size):
+        return [data[i:i + size] for i in range(0, len(data), size)]
+
+    def test_load_qp_stream(self):
+        """Streamed messages decode the same as fully loaded ones."""
+
+        rnd = random.Random(7)
+        active = sorted(rnd.sample(range(40), 25))
+        bits = [[rnd.randint(0, 1) for _ in active] for _ in range(13)]
+        msg = encode_answer('qubo', bits, active, 40)
+        msg.update(id='abc', status='COMPLETED', extra=['energies', {'"quoted"': 1}])
+        msg['answer']['timing'] = {'solutions': 5}
+        data = json.dumps(msg).encode('utf-8')
+
+        expected = decode_qp_numpy(json.loads(data.decode('utf-8')))
+
+        for size in [1, 3, 7, 64, len(data)]:
+            loaded = load_qp_stream(self.chunked(data, size))
+            self.assertEqual(loaded['extra'], msg['extra'])
+            self.assertEqual(loaded['answer']['timing'], {'solutions': 5})
+            self.assertIsInstance(loaded['answer']['solutions'], bytearray)
+
+            result = decode_qp_numpy(loaded)
+            for field in ['energies', 'num_occurrences', 'active_variables', 'solutions']:
+                numpy.testing.assert_array_equal(result[field], expected[field])
+
+            result = decode_qp(load_qp_stream(self.chunked(data, size)))
+            self.assertEqual(result['solutions'], expected['solutions'].tolist())
+
+    def test_load_qp_stream_escaped(self):
+        """Escaped slashes in base64 fields are decoded."""
+
+        energies = struct.pack('<2d', 1e300, -1e-300)
+        encoded = base64.b64encode(energies).decode('ascii')
+        self.assertIn('/', encoded)
+
+        data = ('{"answer": {"energies": "%s"}}' % encoded.replace('/', '\\/')).encode('ascii')
+        for size in [1, 2, len(data)]:
+            loaded = load_qp_stream(self.chunked(data, size))
+            self.assertEqual(bytes(loaded['answer']['energies']), energies)
+
+    def test_load_qp_stream_unicode_escaped(self):
+        """Any JSON escape in base64 fields is decoded."""
+
+        energies = struct.pack('<2d', 1e300, -1e-300)
+        encoded = base64.b64encode(energies).decode('ascii')
+        escaped = encoded.replace('/', '\\u002f').replace('+', '\\u002B')
+        self.assertNotEqual(escaped, encoded)
+
+        data = ('{"answer": {"energies": "%s"}}' % escaped).encode('ascii')
+        for size in [1, 2, 5, len(data)]:
+            loaded = load_qp_stream(self.chunked(data, size))
+            self.assertEqual(bytes(loaded['answer']['energies']), energies)
+
+    def test_load_qp_stream_nested_keys(self):
+        """Only fields directly in `answer` are decoded."""
+
+        msg = {'answer': {'format': 'qp', 'energies': 'AAAAAAAA8D8=',
+                          'timing': {'solutions': 'abc'},
+                          'extra': [{'energies': 'x'}, 'solutions']},
+               'solutions': 'abc', 'other': {'answer': {'solutions': 'a+b'}}}
+        data = json.dumps(msg).encode('utf-8')
+
+        for size in [1, 3, len(data)]:
+            loaded = load_qp_stream(self.chunked(data, size))
+            self.assertEqual(bytes(loaded['answer']['energies']), struct.pack('<d', 1))
+            loaded['answer']['energies'] = msg['answer']['energies']
+            self.assertEqual(loaded, msg)
+
+    def test_load_qp_stream_incomplete(self):
+        with self.assertRaises(ValueError):
+            load_qp_stream([b'{"answer": {"energies": "AAAA'])
+
+
+class TestJSONCodecs(unittest.TestCase):
+
+    def available_codecs(self):
+        for name in JSON_CODECS:
+            try:
+                yield get_json_codec(name)
+            except ImportError:
+                pass
+
+    def test_round_trip(self):
+        obj = {'solver': 'test', 'data': {'format': 'qp', 'lin': 'AAAA//8='},
+               'type': 'ising', 'params': {'num_reads': 10, 'x': [1.5, None, True]},
+               'unicode': u'\u00e9'}
+
+        for codec in self.available_codecs():
+            body = codec.dumps(obj)
+            self.assertIsInstance(body, bytes)
+            self.assertEqual(json.loads(body.decode('utf-8')), obj)
+            self.assertEqual(codec.loads(body), obj)
+            self.assertEqual(codec.loads(body.decode('utf-8')), obj)
+
+    def test_non_string_keys(self):
+        for codec in self.available_codecs():
+            self.assertEqual(codec.loads(codec.dumps({1: 2})), {'1': 2})
+
+    def test_default_codec(self):
+        codecs = list(self.available_codecs())
+        self.assertEqual(get_json_codec().name, codecs[0].name)
+
+        with mock.patch.dict('sys.modules', {'orjson': None, 'ujson': None}):
+            self.assertEqual(get_json_codec().name, 'json')
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            get_json_codec('unknown')
@@ -3,12 +3,19 @@ from __future__ import division, absolute_import, print_function, unicode_litera
 
 import os
 import json
+import pickle
+import shutil
+import tempfile
 import unittest
 
+import numpy
 import requests
 import requests_mock
 
 from dwave.cloud.qpu import Client, Solver
+from dwave.cloud.solver import ProblemCheck
+from dwave.cloud.store import SolverCache
+from dwave.cloud.utils import gzip_compress
 from dwave.cloud.exceptions import (
     InvalidAPIResponseError, ConfigFileReadError, ConfigFileParseError)
 from dwave.cloud.config import legacy_load_config, load_config
@@ -202,6 +209,243 @@ class MockSolverLoading(unittest.TestCase):
         data['properties']['parameters']['flux_biases'] = '...'
         self.assertTrue(Solver(None, data).has_flux_biases)
 
+    def test_solver_graph(self):
+        solver = solver_object('test')
+        data = json.loads(solver_data('test'))['properties']
+
+        # built on first use
+        self.assertIsNone(solver._edges)
+        self.assertIsNone(solver._undirected_edges)
+
+        couplers = [tuple(edge) for edge in data['couplers']]
+        self.assertEqual(solver._encoding_couplers, couplers)
+        self.assertEqual(solver.nodes, set(data['qubits']))
+        self.assertIs(solver.variables, solver.nodes)
+        self.assertEqual(solver.edges, set(couplers) | set((v, u) for u, v in couplers))
+        self.assertIs(solver.couplers, solver.edges)
+        self.assertEqual(solver.undirected_edges,
+                         {edge for edge in solver.edges if edge[0] < edge[1]})
+        self.assertIs(solver.undirected_edges, solver.undirected_edges)
+
+    def test_solver_catalog_lazy(self):
+        """Listing and filtering solvers does not build their graphs."""
+        with requests_mock.mock() as m:
+            setup_server(m)
+            with Client(url, token) as client:
+                self.assertEqual(
+                    [s.id for s in client.solvers(num_qubits=3, vfyc=False)],
+                    [solver_name, second_solver_name])
+                self.assertEqual(client.solvers(num_qubits=[4, None]), [])
+
+                for solver in client.get_solvers().values():
+                    self.assertIsNone(solver._nodes)
+                    self.assertIsNone(solver._edges)
+                    self.assertIsNone(solver._undirected_edges)
+                    self.assertIsNone(solver._couplers_cache)
+                    self.assertIsNone(solver._encoding_index_cache)
+
+    def test_solver_encoding_index(self):
+        solver = solver_object('test')
+        index = solver._encoding_index
+
+        self.assertEqual(index.qubits, {0: 0, 1: 1, 2: 2})
+        self.assertEqual(index.couplers, {(0, 1): 0, (1, 0): 0, (0, 2): 1,
+                                          (2, 0): 1, (1, 2): 2, (2, 1): 2})
+        self.assertEqual(sorted(index.adjacency[0]), [(1, 0), (2, 1)])
+        self.assertEqual(index.coupler_qubits.tolist(), [[0, 1], [0, 2], [1, 2]])
+
+        # built only once
+        self.assertIs(solver._encoding_index, index)
+
+    def test_solver_check_problem(self):
+        solver = solver_object('test')
+
+        self.assertTrue(solver.check_problem({0: 1, 2: -1}, {(1, 0): 0.5}))
+        self.assertTrue(solver.check_problem([1, 1, 1], {(2, 1): 0.5}))
+        self.assertTrue(solver.check_problem({3: 0}, {(0, 3): 0}))
+        self.assertFalse(solver.check_problem({3: 1}, {}))
+        self.assertFalse(solver.check_problem([0, 0, 0, 1], {}))
+        self.assertFalse(solver.check_problem({}, {(0, 3): 1}))
+
+        # tuples of linear terms are dense, as in encoding
+        self.assertTrue(solver.check_problem((7, 1), {}))
+        self.assertTrue(solver.check_problem((1, 1, 1), {}))
+        self.assertFalse(solver.check_problem((0, 0, 0, 1), {}))
+
+    def test_solver_check_problem_report(self):
+        solver = solver_object('test')
+
+        self.assertEqual(solver.check_problem({0: 1}, {(1, 0): 0.5}, report=True),
+                         ProblemCheck(True, [], []))
+        self.assertEqual(
+            solver.check_problem({3: 1, 0: 1, 4: 0}, {(0, 3): 1, (0, 1): 1, (0, 0): 2, (1, 3): 0},
+                                 report=True),
+            ProblemCheck(False, [3], [(0, 3), (0, 0)]))
+        self.assertEqual(solver.check_problem({'a': 1}, {('a', 0): 1}, report=True),
+                         ProblemCheck(False, ['a'], [('a', 0)]))
+
+        # dense linear and COO quadratic terms
+        self.assertEqual(
+            solver.check_problem([0, 1, 0, 1, 0, 2], ([0, 1, 2, 2], [1, 5, 0, 3], [1, 1, 1, 0]),
+                                 report=True),
+            ProblemCheck(False, [3, 5], [(1, 5)]))
+        self.assertEqual(
+            solver.check_problem(numpy.ones(3), (numpy.array([0, -1]), numpy.array([2, 0]),
+                                                 numpy.array([1.0, 1.0])), report=True),
+            ProblemCheck(False, [], [(-1, 0)]))
+        self.assertTrue(solver.check_problem([], ([], [], [])))
+        self.assertFalse(solver.check_problem([], ([0.5], [1], [1])))
+
+    def test_solver_check_problem_arrays(self):
+        solver = solver_object('test')
+        nan = float('nan')
+
+        # dense
+        h, J = solver._check_problem_arrays('ising', [1, 0, nan], [0.5, 0, 0])
+        self.assertEqual(J.tolist(), [0.5, 0, 0])
+
+        # COO, both directions and repeated couplers summed
+        h, J = solver._check_problem_arrays(
+            'ising', [1, 0, 0], ([0, 2, 1, 3], [1, 0, 2, 1], [0.5, -1, 0.25, 0]))
+        self.assertEqual(J.tolist(), [0.5, -1, 0.25])
+        h, J = solver._check_problem_arrays('ising', [0, 0, 0], ([1, 0], [0, 1], [1, 2]))
+        self.assertEqual(J.tolist(), [3, 0, 0])
+
+        # QUBO diagonal terms in COO are linear
+        q, Q = solver._check_problem_arrays('qubo', [1, 0, 0], ([0, 2], [0, 1], [2, 3]))
+        self.assertEqual(q.tolist(), [3, 0, 0])
+        self.assertEqual(Q.tolist(), [0, 0, 3])
+
+        invalid = [
+            ('ising', [0, 0], [0, 0, 0]),                     # too few qubits
+            ('ising', [0, 0, 0], [0, 0]),                     # too few couplers
+            ('ising', [0, 0, 0], ([0, 3], [3, 1], [1, 1])),   # no qubit 3
+            ('ising', [0, 0, 0], ([0], [0], [1])),            # ising diagonal
+            ('ising', [0, 0, 0], ([0, 1], [1], [1])),         # mismatched COO
+            ('ising', [0, 0, nan], [0, 1, 0]),                # inactive coupler
+        ]
+        for type_, linear, quadratic in invalid:
+            with self.assertRaises(ValueError):
+                solver._check_problem_arrays(type_, linear, quadratic)
+
+
+class MockSolverCache(unittest.TestCase):
+    """Test loading solvers through the on-disk solver cache."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def client(self, ttl=3600):
+        return Client(url, token, solver_cache=True, solver_cache_dir=self.directory,
+                      solver_cache_ttl=ttl)
+
+    def test_cache_entries(self):
+        """Entries are keyed by endpoint and token, without the token on disk."""
+        cache = SolverCache(self.directory, ttl=10)
+        self.assertIsNone(cache.load(url, token))
+
+        entry = cache.save(url, token, [{'id': 'a'}], etag='"1"')
+        self.assertTrue(cache.is_fresh(entry))
+        self.assertEqual(cache.load(url, token), entry)
+        self.assertIsNone(cache.load(url, bad_token))
+        self.assertIsNone(cache.load(bad_url, token))
+        self.assertNotIn(token, os.listdir(self.directory)[0])
+
+        entry['fetched'] -= 10
+        self.assertFalse(cache.is_fresh(entry))
+
+        # corrupt or malformed entries are ignored, and never unpickled
+        for content in [b'garbage', pickle.dumps(entry),
+                        gzip_compress(b'{"data": {}, "fetched": 0}')]:
+            with open(cache.path(url, token), 'wb') as fp:
+                fp.write(content)
+            self.assertIsNone(cache.load(url, token))
+
+        cache.clear(url, token)
+        cache.clear(url, token)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_cache_write_failure(self):
+        """Solvers are loaded even if they can't be cached."""
+        with requests_mock.mock() as m:
+            setup_server(m)
+            with mock.patch.object(SolverCache, 'save', side_effect=OSError(30, 'Read-only')):
+                with self.client() as client:
+                    self.assertEqual(len(client.get_solvers()), 2)
+            self.assertEqual(os.listdir(self.directory), [])
+
+        # unusable cache directory
+        path = os.path.join(self.directory, 'file')
+        open(path, 'w').close()
+        with Client(url, token, solver_cache=True, solver_cache_dir=path) as client:
+            self.assertIsNone(client.solver_cache)
+
+    def test_fresh_cache(self):
+        """New clients use fresh cached solvers without requests."""
+        with requests_mock.mock() as m:
+            setup_server(m)
+            with self.client() as client:
+                self.assertEqual(len(client.get_solvers()), 2)
+            self.assertEqual(m.call_count, 1)
+
+            with self.client() as client:
+                self.assertEqual(len(client.get_solvers()), 2)
+                self.assertEqual(client.get_solver(solver_name).id, solver_name)
+            with self.client() as client:
+                self.assertEqual(client.get_solver(second_solver_name).id, second_solver_name)
+            self.assertEqual(m.call_count, 1)
+
+            # a different token is not served from the cache
+            with Client(url, bad_token, solver_cache=True, solver_cache_dir=self.directory) as client:
+                with self.assertRaises(IOError):
+                    client.get_solvers()
+
+    def test_empty_ttl(self):
+        """Empty ttl (e.g. from a config file) falls back to the default."""
+        for ttl in ['', None]:
+            with self.client(ttl=ttl) as client:
+                self.assertEqual(client.solver_cache.ttl, 3600)
+
+        with self.client(ttl='10') as client:
+            self.assertEqual(client.solver_cache.ttl, 10)
+
+    def test_revalidation(self):
+        """Stale or refreshed cache entries are revalidated conditionally."""
+        with requests_mock.mock() as m:
+            response = '[' + solver_data(solver_name) + ']'
+            m.get(all_solver_url, text=response,
+                  headers={'ETag': '"v1"', 'Last-Modified': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+
+            with self.client(ttl=0) as client:
+                self.assertEqual(list(client.get_solvers()), [solver_name])
+                self.assertNotIn('If-None-Match', m.last_request.headers)
+
+            # not modified
+            m.get(all_solver_url, status_code=304)
+            with self.client(ttl=0) as client:
+                self.assertEqual(list(client.get_solvers()), [solver_name])
+                self.assertEqual(m.last_request.headers['If-None-Match'], '"v1"')
+                self.assertEqual(m.last_request.headers['If-Modified-Since'],
+                                 'Wed, 21 Oct 2015 07:28:00 GMT')
+
+            # modified
+            m.get(all_solver_url, text='[' + solver_data(second_solver_name) + ']',
+                  headers={'ETag': '"v2"'})
+            with self.client() as client:
+                client.get_solvers(refresh=True)
+                self.assertIn(second_solver_name, client.get_solvers())
+
+            with self.client() as client:
+                self.assertEqual(list(client.get_solvers()), [second_solver_name])
+                self.assertEqual(m.call_count, 3)
+
+            entry = SolverCache(self.directory).load(url, token)
+            self.assertEqual(entry['etag'], '"v2"')
+            self.assertIsNone(entry['last_modified'])
+
 
 class GetEvent(Exception):
     """Throws exception when mocked client submits an HTTP GET request."""
@@ -1,18 +1,33 @@
 """Test problem submission against hard-coded replies with unittest.mock."""
 from __future__ import division, absolute_import, print_function, unicode_literals
 
+import io
+import os
+import sys
+import gzip
 import time
+import base64
+import struct
 import json
 import unittest
 import itertools
+import shutil
+import tempfile
 import threading
 
 from datetime import datetime, timedelta
+import six
+import numpy
+import requests
+import requests_mock
 from dateutil.tz import UTC
 from dateutil.parser import parse as parse_datetime
 
 from dwave.cloud.utils import evaluate_ising
 from dwave.cloud.qpu import Client, Solver
+from dwave.cloud.computation import Future
+from dwave.cloud.coders import encode_bqm_as_qp, _QP_FIELDS
+from dwave.cloud.store import ResultStore
 from dwave.cloud.exceptions import SolverFailureError, CanceledFutureError
 from dwave.cloud.testing import mock
 
@@ -128,9 +143,23 @@ def continue_reply(id_, solver_name, now=None, eta_min=None, eta_max=None):
 def choose_reply(path, replies):
     """Choose the right response based on the path and make a mock response."""
     if path in replies:
-        response = mock.Mock(['json', 'raise_for_status'])
+        response = mock.Mock(['json', 'content', 'raise_for_status'])
         response.status_code = 200
         response.json.side_effect = lambda: json.loads(replies[path])
+        response.content = replies[path].encode('utf-8')
+        return response
+    else:
+        raise NotImplementedError(path)
+
+
+def choose_stream_reply(path, replies, chunk_size=3):
+    """Choose the right response based on the path and make a mock streamed response."""
+    if path in replies:
+        response = mock.Mock(['iter_content', 'close', 'raise_for_status'])
+        response.status_code = 200
+        data = replies[path].encode('utf-8')
+        response.iter_content.side_effect = lambda **kwargs: (
+            data[i:i + chunk_size] for i in range(0, len(data), chunk_size))
         return response
     else:
         raise NotImplementedError(path)
@@ -181,6 +210,393 @@ class MockSubmission(_QueryTest):
 
             self._check(results, linear, quad, 100)
 
+    def test_submit_ok_reply_streamed(self):
+        """Handle a normal query and a streamed response."""
+        with Client('endpoint', 'token', stream_results=True) as client:
+            client.session = mock.Mock()
+            client.session.post = lambda a, _: choose_reply(a, {
+                'endpoint/problems/': '[%s]' % complete_no_answer_reply('123', 'abc123')})
+            client.session.get = lambda a, stream: choose_stream_reply(a, {
+                'endpoint/problems/123/': complete_reply('123', 'abc123')})
+            solver = Solver(client, solver_data('abc123'))
+
+            # Build a problem
+            linear = {index: 1 for index in solver.nodes}
+            quad = {key: -1 for key in solver.undirected_edges}
+            results = solver.sample_ising(linear, quad, num_reads=100)
+
+            self._check(results, linear, quad, 100)
+
+    def test_submit_error_reply_streamed(self):
+        """Streamed responses are closed on errors."""
+        response = mock.Mock(['iter_content', 'close', 'raise_for_status'])
+        response.status_code = 500
+        response.raise_for_status.side_effect = requests.exceptions.HTTPError('500')
+
+        with Client('endpoint', 'token', stream_results=True) as client:
+            client.session = mock.Mock()
+            client.session.post = lambda a, _: choose_reply(a, {
+                'endpoint/problems/': '[%s]' % complete_no_answer_reply('123', 'abc123')})
+            client.session.get = lambda a, stream: response
+            solver = Solver(client, solver_data('abc123'))
+
+            results = solver.sample_ising({0: 1}, {}, num_reads=100)
+            with self.assertRaises(IOError):
+                results.samples
+            response.close.assert_called_once_with()
+
+    def test_submit_ok_reply_eager_decode(self):
+        """Results are decoded before the future is resolved."""
+        with Client('endpoint', 'token', eager_decode=True) as client:
+            client.session = mock.Mock()
+            client.session.post = lambda a, _: choose_reply(a, {
+                'endpoint/problems/': '[%s]' % complete_no_answer_reply('123', 'abc123')})
+            client.session.get = lambda a: choose_reply(a, {'endpoint/problems/123/': complete_reply('123', 'abc123')})
+            solver = Solver(client, solver_data('abc123'))
+
+            # Build a problem
+            linear = {index: 1 for index in solver.nodes}
+            quad = {key: -1 for key in solver.undirected_edges}
+            results = solver.sample_ising(linear, quad, num_reads=100)
+
+            results.wait()
+            self.assertEqual(results._decoded_fields, set(_QP_FIELDS))
+            self._check(results, linear, quad, 100)
+
+    def test_submit_eager_decode_error(self):
+        """Decoding errors are raised on result access."""
+        with Client('endpoint', 'token', eager_decode=True) as client:
+            client.session = mock.Mock()
+            reply = json.loads(complete_reply('123', 'abc123'))
+            reply['answer']['format'] = 'bq'
+            client.session.post = lambda a, _: choose_reply(a, {
+                'endpoint/problems/': '[%s]' % json.dumps(reply)})
+            solver = Solver(client, solver_data('abc123'))
+
+            # Build a problem
+            linear = {index: 1 for index in solver.nodes}
+            quad = {key: -1 for key in solver.undirected_edges}
+            results = solver.sample_ising(linear, quad, num_reads=100)
+
+            results.wait()
+            with self.assertRaises(ValueError):
+                results.samples
+
+    @unittest.skipIf(sys.version_info < (3, 7), "workers can't be started safely")
+    def test_submit_ok_reply_process_decoder(self):
+        """Results are decoded in a worker process."""
+        with Client('endpoint', 'token', decode_processes=1, decode_process_threshold=0) as client:
+            client.session = mock.Mock()
+            client.session.post = lambda a, _: choose_reply(a, {
+                'endpoint/problems/': '[%s]' % complete_reply('123', 'abc123')})
+            solver = Solver(client, solver_data('abc123'))
+
+            # Build a problem
+            linear = {index: 1 for index in solver.nodes}
+            quad = {key: -1 for key in solver.undirected_edges}
+
+            # results decoded into lists (by default) are decoded in-process
+            results = solver.sample_ising(linear, quad, num_reads=100)
+            self._check(results, linear, quad, 100)
+            self.assertIsNone(client.process_decoder._executor)
+
+            solver.return_matrix = True
+            results = solver.sample_ising(linear, quad, num_reads=100)
+
+            with mock.patch('dwave.cloud.computation.decode_qp_numpy') as decode:
+                self._check(results, linear, quad, 100)
+                decode.assert_not_called()
+
+            self.assertIsNotNone(client.process_decoder._executor)
+
+        self.assertIsNone(client.process_decoder._executor)
+
+    def test_submit_ok_reply_result_store(self):
+        """Results are memory-mapped from the result store."""
+        store = ResultStore(tempfile.mkdtemp(), min_size=0)
+        with Client('endpoint', 'token', result_store=store) as client:
+            client.session = mock.Mock()
+            client.session.post = lambda a, _: choose_reply(a, {
+                'endpoint/problems/': '[%s]' % complete_reply('123', 'abc123')})
+            solver = Solver(client, solver_data('abc123'))
+            solver.return_matrix = True
+
+            # Build a problem
+            linear = {index: 1 for index in solver.nodes}
+            quad = {key: -1 for key in solver.undirected_edges}
+            results = solver.sample_ising(linear, quad, num_reads=100)
+
+            self._check(results, linear, quad, 100)
+            self.assertIsInstance(results.samples, numpy.memmap)
+            self.assertIsInstance(results.energies, numpy.memmap)
+            self.assertEqual(len(os.listdir(store.directory)), 1)
+
+        # views are released, so files can be removed on all platforms
+        del results
+        store.close()
+        shutil.rmtree(store.directory)
+
+    def test_submit_arrays(self):
+        """Submit problems given as arrays."""
+        with Client('endpoint', 'token') as client:
+            client.session = mock.Mock()
+            client.session.post = mock.Mock(side_effect=lambda a, _: choose_reply(a, {
+                'endpoint/problems/': '[%s]' % complete_reply('123', 'abc123')}))
+            solver = Solver(client, solver_data('abc123'))
+
+            linear = {index: 1 for index in solver.nodes}
+            quad = {key: -1 for key in solver.undirected_edges}
+            h = numpy.ones(len(solver.properties['qubits']))
+            J = -numpy.ones(len(solver.properties['couplers']))
+            rows, cols = zip(*quad)
+
+            # one at a time, the mock replies with a single problem
+            for J_ in [J, (rows, cols, list(quad.values()))]:
+                self._check(solver.sample_ising_arrays(h, J_, num_reads=100), linear, quad, 100)
+
+            # same encoded data as for dicts
+            expected = encode_bqm_as_qp(solver, linear, quad)
+            for call in client.session.post.call_args_list:
+                body = json.loads(call[0][1].decode('utf-8'))
+                self.assertEqual(body[0]['data'], expected)
+
+            solver.sample_qubo_arrays(h, J).wait()
+            body = json.loads(client.session.post.call_args[0][1].decode('utf-8'))
+            self.assertEqual(body[0]['type'], 'qubo')
+
+    def test_submit_compiled(self):
+        """Submit a compiled problem with varying biases."""
+        with Client('endpoint', 'token') as client:
+            client.session = mock.Mock()
+            client.session.post = mock.Mock(side_effect=lambda a, _: choose_reply(a, {
+                'endpoint/problems/': '[%s]' % complete_reply('123', 'abc123')}))
+            solver = Solver(client, solver_data('abc123'))
+
+            linear = {index: 1 for index in solver.nodes}
+            quad = {key: -1 for key in solver.undirected_edges}
+            problem = solver.compile(linear, quad)
+            problem.set_biases(list(linear.values()), list(quad.values()))
+            self._check(problem.sample_ising(num_reads=100), linear, quad, 100)
+
+            body = json.loads(client.session.post.call_args[0][1].decode('utf-8'))
+            self.assertEqual(body[0]['data'], encode_bqm_as_qp(solver, linear, quad))
+            self.assertEqual(body[0]['params'], {'num_reads': 100})
+
+            problem.quadratic[:] = 0
+            problem.sample_qubo(num_reads=10).wait()
+            body = json.loads(client.session.post.call_args[0][1].decode('utf-8'))
+            self.assertEqual(body[0]['type'], 'qubo')
+            self.assertEqual(body[0]['data'],
+                             encode_bqm_as_qp(solver, linear, dict.fromkeys(quad, 0)))
+
+    def test_submit_encoding_cached(self):
+        """Resubmitted problems are encoded once, if caching is enabled."""
+        with Client('endpoint', 'token', encoding_cache_size=16) as client:
+            client.session = mock.Mock()
+            client.session.post = lambda a, _: choose_reply(a, {
+                'endpoint/problems/': '[%s]' % complete_reply('123', 'abc123')})
+            solver = Solver(client, solver_data('abc123'))
+
+            linear = {index: 1 for index in solver.nodes}
+            quad = {key: -1 for key in solver.undirected_edges}
+            for num_reads in [100, 100]:
+                self._check(solver.sample_ising(linear, quad, num_reads=num_reads),
+                            linear, quad, num_reads)
+
+            self.assertEqual(client.encoding_cache.misses, 1)
+            self.assertEqual(client.encoding_cache.hits, 1)
+
+    def test_submit_batch(self):
+        """Submit many problems at once, in full batches."""
+        def post(path, body):
+            problems = json.loads(body.decode('utf-8'))
+            return choose_reply(path, {'endpoint/problems/': '[%s]' % ','.join(
+                complete_reply(str(index), 'abc123') for index in range(len(problems)))})
+
+        with Client('endpoint', 'token') as client:
+            client.session = mock.Mock()
+            client.session.post = mock.Mock(side_effect=post)
+            solver = Solver(client, solver_data('abc123'))
+
+            linear = {index: 1 for index in solver.nodes}
+            quad = {key: -1 for key in solver.undirected_edges}
+            num_problems = 2 * client._SUBMIT_BATCH_SIZE + 5
+            params = [{'x_index': index} for index in range(num_problems)]
+            results = solver.sample_ising_batch(
+                [(linear, quad)] * num_problems, params=params, num_reads=100)
+
+            self.assertEqual(len(results), num_problems)
+            for result in results:
+                self._check(result, linear, quad, 100)
+
+            bodies = [json.loads(call[0][1].decode('utf-8'))
+                      for call in client.session.post.call_args_list]
+            # batches are submitted by concurrent workers, in any order
+            self.assertEqual(sorted(len(body) for body in bodies),
+                             [5, client._SUBMIT_BATCH_SIZE, client._SUBMIT_BATCH_SIZE])
+            self.assertEqual(
+                sorted((problem['params'] for body in bodies for problem in body),
+                       key=lambda params: params['x_index']),
+                [dict(num_reads=100, **p) for p in params])
+
+            # QUBOs, with shared parameters only
+            qubo = dict(quad)
+            qubo.update({(q, q): 1 for q in linear})
+            for result in solver.sample_qubo_batch([qubo, qubo], num_reads=10):
+                result.wait()
+            body = json.loads(client.session.post.call_args[0][1].decode('utf-8'))
+            self.assertEqual([problem['type'] for problem in body], ['qubo', 'qubo'])
+            self.assertEqual(body[0]['params'], {'num_reads': 10})
+            self.assertEqual(body[0]['data'], encode_bqm_as_qp(solver, linear, quad))
+
+    def test_submit_batches_merged(self):
+        """Queued batches are merged into requests while they fit."""
+        def post(path, body):
+            problems = json.loads(body.decode('utf-8'))
+            return choose_reply(path, {'endpoint/problems/': '[%s]' % ','.join(
+                complete_reply(str(index), 'abc123') for index in range(len(problems)))})
+
+        with Client('endpoint', 'token') as client:
+            client.session = mock.Mock()
+            client.session.post = mock.Mock(side_effect=post)
+            solver = Solver(client, solver_data('abc123'))
+
+            def messages(count):
+                return [client._submit.Message(b'{}', solver._new_future(None))
+                        for _ in range(count)]
+
+            # fill the queue before a (single) worker pulls from it
+            submission_queue = client._submission_queue
+            client._submission_queue = queue = six.moves.queue.Queue()
+            batches = [messages(2), messages(3), messages(1)[0],
+                       messages(client._SUBMIT_BATCH_SIZE - 1), messages(1)[0]]
+            for item in batches:
+                queue.put(item)
+            queue.put(None)
+
+            client._do_submit_problems()
+            client._submission_queue = submission_queue
+
+            self.assertEqual(
+                [len(json.loads(call[0][1].decode('utf-8')))
+                 for call in client.session.post.call_args_list],
+                [6, client._SUBMIT_BATCH_SIZE])
+            self.assertEqual(queue.unfinished_tasks, 1)     # `None` only
+
+            # termination pulled while filling a batch is not lost
+            client._submission_queue = queue = six.moves.queue.Queue()
+            queue.put(messages(1)[0])
+            queue.put(None)
+            worker = threading.Thread(target=client._do_submit_problems)
+            worker.daemon = True
+            worker.start()
+            worker.join(5)
+            client._submission_queue = submission_queue
+
+            self.assertFalse(worker.is_alive())
+            self.assertEqual(client.session.post.call_count, 3)
+
+    def test_submit_batch_invalid(self):
+        """Invalid batches are rejected before submitting any problem."""
+        with Client('endpoint', 'token') as client:
+            client.session = mock.Mock()
+            solver = Solver(client, solver_data('abc123'))
+
+            valid = ({0: 1}, {(0, 1): -1})
+            with self.assertRaises(ValueError):
+                solver.sample_ising_batch([valid, ({0: 1}, {(0, 7): -1})])
+            with self.assertRaises(KeyError):
+                solver.sample_ising_batch([valid, valid], params=[{}, {'unknown': 1}])
+            with self.assertRaises(ValueError):
+                solver.sample_ising_batch([valid, valid], params=[{}])
+
+            self.assertEqual(solver.sample_ising_batch([]), [])
+            self.assertFalse(client.session.post.called)
+
+    def test_map(self):
+        """Sample from a stream of problems with a bounded window."""
+        def post(path, body):
+            problems = json.loads(body.decode('utf-8'))
+            return choose_reply(path, {'endpoint/problems/': '[%s]' % ','.join(
+                complete_reply(str(index), 'abc123') for index in range(len(problems)))})
+
+        with Client('endpoint', 'token') as client:
+            client.session = mock.Mock()
+            client.session.post = mock.Mock(side_effect=post)
+            solver = Solver(client, solver_data('abc123'))
+
+            quad = {key: -1 for key in solver.undirected_edges}
+            pulled = []
+
+            def problems(count):
+                for index in range(count):
+                    pulled.append(index)
+                    yield {q: index for q in solver.nodes}, quad
+
+            for ordered in [True, False]:
+                del pulled[:]
+                results = []
+                for result in solver.map(problems(25), window=4, ordered=ordered, num_reads=100):
+                    self.assertTrue(result.done())
+                    results.append(result._submission_data[1][0])
+                    self.assertLessEqual(len(pulled) - len(results), 4)
+
+                if ordered:
+                    self.assertEqual(results, list(range(25)))
+                else:
+                    self.assertEqual(sorted(results), list(range(25)))
+
+            # stopped early, no problems pulled after that
+            del pulled[:]
+            results = solver.map(problems(25), window=3)
+            next(results)
+            next(results)
+            results.close()
+            self.assertEqual(len(pulled), 4)
+
+            # small windows are kept at least half full, and filled entirely
+            for window in [8, 30]:
+                for ordered in [True, False]:
+                    del pulled[:]
+                    num_yielded = 0
+                    for result in solver.map(problems(100), window=window, ordered=ordered):
+                        num_yielded += 1
+                        if num_yielded == 1:
+                            self.assertEqual(len(pulled), window)
+                        if len(pulled) < 100:
+                            self.assertGreaterEqual(len(pulled) - num_yielded, window // 2)
+                    self.assertEqual(num_yielded, 100)
+
+            # problems are submitted in full requests, after the first window too
+            def request_sizes():
+                sizes = [len(json.loads(call[0][1].decode('utf-8')))
+                         for call in client.session.post.call_args_list]
+                client.session.post.reset_mock()
+                return sizes
+
+            request_sizes()
+            for result in solver.map(problems(300), window=100):
+                pass
+            self.assertEqual(set(request_sizes()), {client._SUBMIT_BATCH_SIZE})
+
+            # completed out of order, freed slots don't always add up to full requests
+            # (completion is notified per future, not waited on for the whole window)
+            with mock.patch.object(Future, 'wait_multiple', side_effect=AssertionError):
+                for result in solver.map(problems(300), window=100, ordered=False):
+                    pass
+            sizes = request_sizes()
+            self.assertEqual(sum(sizes), 300)
+            self.assertGreaterEqual(sum(sizes) / len(sizes), client._SUBMIT_BATCH_SIZE / 2)
+
+            qubo = dict(quad)
+            results = list(solver.map([qubo, qubo], problem_type='qubo', num_reads=10))
+            self.assertEqual([result._submission_data[0] for result in results], ['qubo', 'qubo'])
+
+            with self.assertRaises(ValueError):
+                next(solver.map([qubo], problem_type='unknown'))
+            with self.assertRaises(ValueError):
+                next(solver.map([qubo], window=0))
+
     def test_submit_error_reply(self):
         """Handle an error on problem submission."""
         error_body = 'An error message'
@@ -402,6 +818,183 @@ class MockSubmission(_QueryTest):
                 future.result()
 
 
+@mock.patch('time.sleep', lambda *x: None)
+class MockCompressedSubmission(_QueryTest):
+    """Submit problems to a mock endpoint, with and without compression."""
+
+    endpoint = 'https://example.com/sapi'
+
+    def submit(self, m, **config):
+        """Submit a problem, return the request received by the endpoint."""
+        def reply(request, context):
+            if request.headers.get('Content-Encoding') == 'gzip':
+                body = gzip.GzipFile(fileobj=io.BytesIO(request.body)).read()
+            else:
+                body = request.body
+            problems = json.loads(body.decode('utf-8'))
+            return '[%s]' % ','.join(complete_reply(str(index), 'abc123')
+                                     for index, _ in enumerate(problems))
+
+        m.post(self.endpoint + '/problems/', text=reply)
+
+        with Client(self.endpoint, 'token', **config) as client:
+            solver = Solver(client, solver_data('abc123'))
+
+            linear = {index: 1 for index in solver.nodes}
+            quad = {key: -1 for key in solver.undirected_edges}
+            self._check(solver.sample_ising(linear, quad, num_reads=100), linear, quad, 100)
+
+        return m.last_request
+
+    def test_uncompressed(self):
+        with requests_mock.mock() as m:
+            request = self.submit(m)
+            self.assertNotIn('Content-Encoding', request.headers)
+
+            request = self.submit(m, compress_submissions=True)
+            self.assertNotIn('Content-Encoding', request.headers)
+
+    def test_compressed(self):
+        with requests_mock.mock() as m:
+            uncompressed = self.submit(m).body
+            request = self.submit(m, compress_submissions=True,
+                                  compress_submissions_threshold=len(uncompressed))
+
+            self.assertEqual(request.headers['Content-Encoding'], 'gzip')
+            self.assertLess(len(request.body), len(uncompressed))
+            self.assertEqual(gzip.GzipFile(fileobj=io.BytesIO(request.body)).read(), uncompressed)
+
+    def test_config(self):
+        """Options are parsed from configuration strings."""
+        with requests_mock.mock() as m:
+            request = self.submit(m, compress_submissions='on', compress_submissions_threshold='0')
+            self.assertEqual(request.headers['Content-Encoding'], 'gzip')
+
+            request = self.submit(m, compress_submissions='off', compress_submissions_threshold='0')
+            self.assertNotIn('Content-Encoding', request.headers)
+
+
+class MockResultDecoding(unittest.TestCase):
+    """Answer fields are decoded lazily, one field at a time."""
+
+    def resolved_future(self, return_matrix=False):
+        future = Future(solver=None, id_='123', return_matrix=return_matrix,
+                        submission_data=None)
+        future._set_message(json.loads(complete_reply('123', 'abc123')))
+        return future
+
+    def test_timing_does_not_decode(self):
+        future = self.resolved_future()
+        self.assertEqual(future.timing, {})
+        self.assertIsInstance(future._result['energies'], six.string_types)
+        self.assertIsInstance(future._result['solutions'], six.string_types)
+
+    def test_energies_do_not_decode_samples(self):
+        for return_matrix in [False, True]:
+            future = self.resolved_future(return_matrix)
+            self.assertEqual(list(future.energies), [-15.0])
+            self.assertEqual(list(future.occurrences), [100])
+            self.assertIsInstance(future._result['solutions'], six.string_types)
+            self.assertNotIn('samples', future._result)
+
+    def test_samples_decoded_once(self):
+        future = self.resolved_future()
+        samples = future.samples
+        self.assertEqual(samples, [[-1, -1, -1, -1, -1]])
+        self.assertIs(future['samples'], samples)
+        self.assertIs(future.result()['solutions'], samples)
+
+    def test_packed_samples(self):
+        future = Future(solver=None, id_='123', return_matrix=False,
+                        submission_data=None, samples_layout='packed')
+        future._set_message(json.loads(complete_reply('123', 'abc123')))
+        self.assertEqual(future.samples[0], [-1, -1, -1, -1, -1])
+        self.assertEqual(future.samples[0][3], -1)
+        self.assertEqual(future.samples.nbytes, 4)
+
+    def test_get_samples(self):
+        for layout in ['full', 'active', 'packed']:
+            for return_matrix in [False, True]:
+                future = Future(solver=None, id_='123', return_matrix=return_matrix,
+                                submission_data=None, samples_layout=layout)
+                future._set_message(json.loads(complete_reply('123', 'abc123')))
+                for target in ['full', 'active']:
+                    samples = future.get_samples(target)
+                    self.assertEqual(numpy.asarray(samples).tolist(), [[-1, -1, -1, -1, -1]])
+
+        with self.assertRaises(ValueError):
+            future.get_samples('packed')
+
+    def test_result_dtypes(self):
+        future = Future(solver=None, id_='123', return_matrix=True, submission_data=None,
+                        result_dtypes={'samples': numpy.float32, 'energies': numpy.float32,
+                                       'occurrences': numpy.int64})
+        future._set_message(json.loads(complete_reply('123', 'abc123')))
+        self.assertEqual(future.samples.dtype, numpy.float32)
+        self.assertEqual(future.energies.dtype, numpy.float32)
+        self.assertEqual(future.occurrences.dtype, numpy.int64)
+
+        with self.assertRaises(ValueError):
+            Future(solver=None, id_='123', return_matrix=True, submission_data=None,
+                   result_dtypes={'unknown': numpy.float32})
+
+    def test_aggregate_samples(self):
+        future = Future(solver=None, id_='123', return_matrix=False, submission_data=None,
+                        aggregate_samples=True)
+        message = json.loads(complete_reply('123', 'abc123'))
+        answer = message['answer']
+        answer['solutions'] = base64.b64encode(b'\x00\x00\x00\x00').decode('utf-8')
+        answer['energies'] = base64.b64encode(struct.pack('<dddd', -15, -15, -15, -15)).decode('utf-8')
+        answer['num_occurrences'] = base64.b64encode(struct.pack('<iiii', 10, 20, 30, 40)).decode('utf-8')
+        future._set_message(message)
+
+        self.assertEqual(future.samples, [[-1, -1, -1, -1, -1]])
+        self.assertEqual(future.occurrences, [100])
+        self.assertEqual(future.energies, [-15.0])
+
+    def test_result_decodes_all(self):
+        future = self.resolved_future()
+        result = future.result()
+        self.assertEqual(result['samples'], [[-1, -1, -1, -1, -1]])
+        self.assertEqual(result['occurrences'], [100])
+        self.assertEqual(result['energies'], [-15.0])
+        self.assertEqual(result['active_variables'], [0, 1, 2, 3, 4])
+
+    def test_concurrent_decode(self):
+        """Fields are not seen as decoded before they are aliased."""
+        future = self.resolved_future()
+        aliasing, release = threading.Event(), threading.Event()
+        alias_result = future._alias_result
+
+        def slow_alias_result(*args):
+            aliasing.set()
+            release.wait(5)
+            return alias_result(*args)
+
+        results, errors = [], []
+        def read_samples():
+            try:
+                results.append(future.samples)
+            except Exception as exc:
+                errors.append(exc)
+
+        with mock.patch.object(future, '_alias_result', slow_alias_result):
+            first = threading.Thread(target=read_samples)
+            first.start()
+            self.assertTrue(aliasing.wait(5))
+
+            # a concurrent read waits for the decoding thread
+            second = threading.Thread(target=read_samples)
+            second.start()
+            second.join(0.1)
+            release.set()
+            first.join()
+            second.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(results, [[[-1, -1, -1, -1, -1]]] * 2)
+
+
 class DeleteEvent(Exception):
     """Throws exception when mocked client submits an HTTP DELETE request."""
 
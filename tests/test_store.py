@@ -0,0 +1,223 @@
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from dwave.cloud.store import ResultStore, ResultArchive
+from dwave.cloud.computation import Future
+from dwave.cloud.testing import mock
+
+
+class TestResultStore(unittest.TestCase):
+
+    def test_spill(self):
+        """Arrays are replaced with memory-mapped copies, other values are kept."""
+
+        samples = numpy.array([[-1, 1, 0], [1, 1, 0]], dtype=numpy.int8)
+        answer = {'solutions': samples, 'energies': numpy.array([-1.5, 0.5]),
+                  'num_occurrences': [1, 2], 'format': 'qp'}
+
+        with ResultStore(min_size=0) as store:
+            store.spill(answer)
+
+            self.assertIsInstance(answer['solutions'], numpy.memmap)
+            self.assertIsInstance(answer['energies'], numpy.memmap)
+            numpy.testing.assert_array_equal(answer['solutions'], samples)
+            self.assertEqual(answer['solutions'].dtype, numpy.int8)
+            self.assertEqual(answer['energies'].tolist(), [-1.5, 0.5])
+            self.assertEqual(answer['num_occurrences'], [1, 2])
+            self.assertEqual(answer['format'], 'qp')
+
+            # results are read-only, and aligned
+            with self.assertRaises(ValueError):
+                answer['solutions'][0, 0] = 1
+            self.assertTrue(answer['energies'].flags.aligned)
+
+            # arrays share a segment, and are not stored again
+            files = os.listdir(store.directory)
+            self.assertEqual(len(files), 1)
+            stored = answer['solutions']
+            store.spill(answer)
+            self.assertIs(answer['solutions'], stored)
+            self.assertEqual(os.listdir(store.directory), files)
+
+            # views are released, so files can be removed on all platforms
+            directory = store.directory
+            del answer, stored
+
+        self.assertFalse(os.path.exists(directory))
+        with self.assertRaises(ValueError):
+            store.save(samples)
+
+    def test_min_size(self):
+        """Small arrays are kept in memory."""
+
+        samples = numpy.ones((100, 10), dtype=numpy.int8)
+        answer = {'solutions': samples, 'energies': numpy.zeros(100)}
+
+        with ResultStore(min_size=samples.nbytes) as store:
+            store.spill(answer)
+
+            self.assertIsInstance(answer['solutions'], numpy.memmap)
+            self.assertNotIsInstance(answer['energies'], numpy.memmap)
+            del answer
+
+    def test_segments(self):
+        """Arrays are appended to segments, large arrays get a segment of their own."""
+
+        with ResultStore(segment_size=1024, min_size=0) as store:
+            arrays = [store.save(numpy.full(100, index, dtype=numpy.int16))
+                      for index in range(10)]
+            self.assertEqual(len(os.listdir(store.directory)), 3)
+
+            large = store.save(numpy.arange(1000))
+            self.assertEqual(len(os.listdir(store.directory)), 4)
+
+            # the current segment is kept
+            store.save(numpy.arange(10))
+            self.assertEqual(len(os.listdir(store.directory)), 4)
+
+            for index, array in enumerate(arrays):
+                self.assertEqual(array.tolist(), [index] * 100)
+            self.assertEqual(large.tolist(), list(range(1000)))
+            del arrays, array, large
+
+    def test_spill_many(self):
+        """Open files don't grow with the number of answers stored."""
+
+        def open_files():
+            return len(os.listdir('/proc/self/fd')) if os.path.isdir('/proc/self/fd') else 0
+
+        rnd = numpy.random.RandomState(0)
+        with ResultStore(segment_size=2**20, min_size=0) as store:
+            before = open_files()
+
+            answers = []
+            for index in range(5000):
+                answer = {'solutions': rnd.randint(-1, 2, size=(10, 20)).astype(numpy.int8),
+                          'energies': numpy.full(10, index, dtype=numpy.float64)}
+                answers.append(store.spill(answer))
+
+            self.assertLessEqual(len(os.listdir(store.directory)), 10)
+            self.assertLessEqual(open_files(), before + 10)
+
+            for index, answer in enumerate(answers):
+                self.assertIsInstance(answer['solutions'], numpy.memmap)
+                self.assertEqual(answer['energies'].tolist(), [index] * 10)
+            del answers, answer
+
+    def test_close_not_removed(self):
+        """Failure to remove the temporary directory is logged."""
+
+        store = ResultStore(min_size=0)
+        store.save(numpy.arange(5))
+        with mock.patch('dwave.cloud.store.shutil.rmtree', side_effect=OSError('in use')):
+            with mock.patch('dwave.cloud.store._LOGGER') as logger:
+                store.close()
+                logger.warning.assert_called_once()
+
+        self.assertTrue(os.path.isdir(store.directory))
+        shutil.rmtree(store.directory)
+
+    def test_directory(self):
+        """Results written to a given directory are kept."""
+
+        base = tempfile.mkdtemp()
+        try:
+            directory = os.path.join(base, 'results')
+            with ResultStore(directory) as store:
+                array = store.save(numpy.arange(5))
+                store.save(numpy.arange(5))
+
+            self.assertEqual(len(os.listdir(directory)), 1)
+            self.assertEqual(array.tolist(), list(range(5)))
+            del array
+        finally:
+            shutil.rmtree(base)
+
+
+def resolved_future(id_, samples, energies, occurrences, return_matrix=True):
+    """Mock future with given results."""
+    future = mock.Mock(spec=Future)
+    future.id = id_
+    convert = numpy.asarray if return_matrix else list
+    future.samples = convert(samples)
+    future.energies = convert(energies)
+    future.occurrences = convert(occurrences)
+    future.timing = {'total_real_time': len(energies)}
+    return future
+
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'results.npz')
+
+        rnd = numpy.random.RandomState(0)
+        self.futures = [
+            resolved_future('p{}'.format(index),
+                            rnd.choice([-1, 1], size=(num_rows, 6)).tolist(),
+                            rnd.uniform(-10, 0, size=num_rows).tolist(),
+                            rnd.randint(1, 10, size=num_rows).tolist(),
+                            return_matrix=index % 2)
+            for index, num_rows in enumerate([3, 1, 7, 4, 5])]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        """Columns concatenate results of all problems, in order."""
+
+        for chunk_size in [1, 20, 2**24]:
+            for compress in [True, False]:
+                count = Future.export_many(self.futures, self.path,
+                                           chunk_size=chunk_size, compress=compress)
+                self.assertEqual(count, 5)
+
+                with ResultArchive(self.path) as archive:
+                    self.assertEqual(len(archive), 5)
+                    self.assertEqual(archive.problem_ids, ['p0', 'p1', 'p2', 'p3', 'p4'])
+                    self.assertEqual(archive.num_rows.tolist(), [3, 1, 7, 4, 5])
+                    self.assertEqual(archive.timing[2], {'total_real_time': 7})
+
+                    samples = archive.column('samples')
+                    self.assertEqual(samples.dtype, numpy.int8)
+                    self.assertEqual(samples.tolist(), sum(
+                        (numpy.asarray(f.samples).tolist() for f in self.futures), []))
+                    self.assertEqual(archive.column('energies').tolist(), sum(
+                        (list(f.energies) for f in self.futures), []))
+                    self.assertEqual(sum(len(c) for c in archive.chunks('occurrences')), 20)
+
+                    for index, future in enumerate(self.futures):
+                        problem = archive.problem(index)
+                        self.assertEqual(problem['problem_id'], future.id)
+                        self.assertEqual(problem['samples'].tolist(),
+                                         numpy.asarray(future.samples).tolist())
+                        self.assertEqual(problem['occurrences'].tolist(), list(future.occurrences))
+
+                    self.assertEqual(archive.problem(-1)['problem_id'], 'p4')
+                    with self.assertRaises(IndexError):
+                        archive.problem(5)
+                    with self.assertRaises(ValueError):
+                        list(archive.chunks('unknown'))
+
+        # one chunk per problem
+        Future.export_many(self.futures, self.path, chunk_size=1)
+        with ResultArchive(self.path) as archive:
+            self.assertEqual(archive.num_chunks, 5)
+
+    def test_empty(self):
+        self.assertEqual(Future.export_many([], self.path), 0)
+        with ResultArchive(self.path) as archive:
+            self.assertEqual(len(archive), 0)
+            self.assertEqual(archive.column('samples').shape, (0, 0))
+
+    def test_different_sizes(self):
+        future = resolved_future('other', [[1, -1]], [0.0], [1])
+        with self.assertRaises(ValueError):
+            Future.export_many(self.futures + [future], self.path)
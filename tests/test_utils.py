@@ -1,11 +1,17 @@
+import io
+import gzip
+import random
 import unittest
 from collections import OrderedDict
 from datetime import datetime
 
+import numpy
+
 from dwave.cloud.utils import (
     uniform_iterator, uniform_get, strip_head, strip_tail,
     active_qubits, generate_valid_random_problem,
-    default_text_input, utcnow)
+    default_text_input, utcnow, evaluate_ising,
+    evaluate_ising_batch, evaluate_qubo_batch, gzip_compress, gzip_decompress)
 from dwave.cloud.testing import mock
 
 
@@ -70,6 +76,48 @@ class TestUtils(unittest.TestCase):
         self.assertDictEqual(lin, {0: 2.0, 1: 2.0, 3: 2.0})
         self.assertDictEqual(quad, {(0, 1): -1.0, (1, 3): -1.0, (0, 4): -1.0})
 
+    def test_evaluate_ising_batch(self):
+        rnd = random.Random(0)
+        linear = {v: rnd.uniform(-1, 1) for v in range(0, 12, 3)}
+        quad = {(u, v): rnd.uniform(-1, 1)
+                for u in range(12) for v in range(u + 1, 12) if rnd.random() < 0.3}
+        samples = numpy.array([[rnd.choice([-1, 1]) for _ in range(12)] for _ in range(7)],
+                              dtype=numpy.int8)
+        expected = [evaluate_ising(linear, quad, state) + 2.5 for state in samples]
+
+        numpy.testing.assert_allclose(
+            evaluate_ising_batch(linear, quad, samples, offset=2.5), expected)
+        numpy.testing.assert_allclose(
+            evaluate_ising_batch(linear, quad, samples.tolist(), offset=2.5), expected)
+
+        # dense linear, COO quadratic
+        dense = [linear.get(v, 0) for v in range(12)]
+        rows, cols = zip(*quad)
+        numpy.testing.assert_allclose(
+            evaluate_ising_batch(numpy.array(dense), (rows, cols, list(quad.values())),
+                                 samples, offset=2.5), expected)
+
+        self.assertEqual(len(evaluate_ising_batch({}, {}, [])), 0)
+
+    def test_evaluate_qubo_batch(self):
+        qubo = {(0, 0): -1, (1, 1): -1, (0, 1): 2, (2, 2): 0.5}
+        samples = [[0, 0, 0], [1, 0, 0], [0, 1, 1], [1, 1, 1]]
+        numpy.testing.assert_allclose(
+            evaluate_qubo_batch(qubo, samples), [0, -1, -0.5, 0.5])
+        numpy.testing.assert_allclose(
+            evaluate_qubo_batch(qubo, samples, offset=1), [1, 0, 0.5, 1.5])
+
+        rows, cols = zip(*qubo)
+        numpy.testing.assert_allclose(
+            evaluate_qubo_batch((rows, cols, list(qubo.values())), samples), [0, -1, -0.5, 0.5])
+
+    def test_gzip_compress(self):
+        data = b'{"data": "AAAAAAAA8D8AAAAAAADwvw=="}' * 100
+        compressed = gzip_compress(data)
+        self.assertLess(len(compressed), len(data))
+        self.assertEqual(gzip.GzipFile(fileobj=io.BytesIO(compressed)).read(), data)
+        self.assertEqual(gzip_decompress(compressed), data)
+
     def test_utcnow(self):
         t = utcnow()
         now = datetime.utcnow()